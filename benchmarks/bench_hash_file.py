@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: bench_hash_file
+   :platform: Unix
+   :synopsis: Benchmark comparing hashing processors on a tree of many small files.
+
+.. moduleauthor:: František Brožka
+
+Benchmark comparing hashing processors on a tree of many small files.
+Usage: python benchmarks/bench_hash_file.py [number-of-files [file-size-bytes [hash-type]]]
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hash_file_hashlib
+import hash_file_unix
+
+def createFiles(topDir, numberOfFiles, fileSize):
+	paths = []
+	for i in range(numberOfFiles):
+		d = os.path.join(topDir, "%03d" % (i % 100))
+		if not os.path.isdir(d):
+			os.mkdir(d)
+		path = os.path.join(d, "%07d" % i)
+		with open(path, 'wb') as f:
+			f.write(os.urandom(fileSize))
+		paths.append(path)
+	return paths
+
+def measure(hashingProcessor, paths):
+	start = time.time()
+	hashes = [hashingProcessor.getFileHash(p) for p in paths]
+	return time.time() - start, hashes
+
+def main():
+	numberOfFiles = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+	fileSize = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+	hashType = sys.argv[3] if len(sys.argv) > 3 else "sha1"
+	topDir = tempfile.mkdtemp(prefix="bench_hash_file_")
+	try:
+		paths = createFiles(topDir, numberOfFiles, fileSize)
+		results = []
+		for name, processor in (("subprocess (%ssum)" % hashType, hash_file_unix.HashFileUnix(hashType)), ("hashlib", hash_file_hashlib.HashFileHashlib(hashType))):
+			elapsed, hashes = measure(processor, paths)
+			results.append(hashes)
+			print "%-20s %8d files %8.2f s %10.1f files/s" % (name, numberOfFiles, elapsed, numberOfFiles / elapsed)
+		if results[0] != results[1]:
+			print "ERROR: hash values differ"
+			sys.exit(1)
+	finally:
+		shutil.rmtree(topDir)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: bench_inode_order
+   :platform: Unix
+   :synopsis: Benchmark comparing recording of directories in name order and in inode order on a cold cache.
+
+.. moduleauthor:: František Brožka
+
+Benchmark comparing recording (with hash values) of directories in name order and in inode order (--inode-order) on a synthetic tree.
+Usage: python benchmarks/bench_inode_order.py [number-of-files [file-size [parent-dir]]]
+The files of each directory are created in a random order of names, so the inode order differs from the name order like in directories filled over time.
+The tree is created in a temporary directory in parent-dir (put it on the disk to be measured) and removed afterwards.
+The page cache is dropped before each run if the benchmark runs as root (/proc/sys/vm/drop_caches), otherwise the cache is warm and the difference is not measured.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import record_dir_info
+
+def createTree(topDir, numberOfFiles, fileSize, filesPerDirectory=1000):
+	"""Create directories with filesPerDirectory files of fileSize bytes each, the files are created in a random (but always the same) order of names."""
+	randomGenerator = random.Random(0)
+	content = os.urandom(fileSize)
+	for d in range(0, numberOfFiles, filesPerDirectory):
+		directory = os.path.join(topDir, "d%07d" % d)
+		os.mkdir(directory)
+		names = ["f%07d" % i for i in range(min(filesPerDirectory, numberOfFiles - d))]
+		randomGenerator.shuffle(names)
+		for name in names:
+			with open(os.path.join(directory, name), 'wb') as f:
+				f.write(content)
+
+def dropCaches():
+	"""Write dirty pages and drop the page cache, dentries and inodes, return False if it is not permitted."""
+	os.system("sync")
+	try:
+		with open("/proc/sys/vm/drop_caches", 'w') as f:
+			f.write("3\n")
+	except IOError:
+		return False
+	return True
+
+def measure(topDir, doUseInodeOrder, numberOfHashWorkers):
+	recorder = record_dir_info.RecordDirInfo()
+	recorder.resetChangeableAttributes(customFormat=u"%p;%i;%s;%Y;%H", numberOfHashWorkers=numberOfHashWorkers, doUseInodeOrder=doUseInodeOrder)
+	recorder.doGetCreationTime = False
+	lines = []
+	start = time.time()
+	recorder.recordTopDir(topDir, writeCallback=lines.append, formattingCallback=recorder.createRecordLineCustomFormat, doOutputAbsolutePaths=False, pathExludeRegexes=None)
+	if not recorder.hashWorkerPool is None:
+		recorder.hashWorkerPool.close()
+	return time.time() - start, lines
+
+def main():
+	numberOfFiles = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+	fileSize = int(sys.argv[2]) if len(sys.argv) > 2 else 16384
+	parentDir = sys.argv[3] if len(sys.argv) > 3 else None
+	if record_dir_info.scandir is None:
+		print "ERROR: neither os.scandir nor the scandir package is available"
+		sys.exit(1)
+	topDir = tempfile.mkdtemp(prefix="bench_inode_order_", dir=parentDir)
+	try:
+		createTree(topDir, numberOfFiles, fileSize)
+		for numberOfHashWorkers in (0, 4):
+			results = []
+			for name, doUseInodeOrder in (("name order", False), ("inode order", True)):
+				isCold = dropCaches()
+				elapsed, lines = measure(topDir, doUseInodeOrder, numberOfHashWorkers)
+				results.append(lines)
+				print "%-12s %d hash workers %-5s cache %9d entries %8.2f s %10.1f entries/s %8.1f MB/s" % (name, numberOfHashWorkers, "cold" if isCold else "warm", len(lines), elapsed, len(lines) / elapsed, numberOfFiles * fileSize / elapsed / 1048576)
+			if results[0] != results[1]:
+				print "ERROR: records differ"
+				sys.exit(1)
+	finally:
+		shutil.rmtree(topDir)
+
+if __name__ == "__main__":
+	main()
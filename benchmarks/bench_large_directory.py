@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: bench_large_directory
+   :platform: Unix
+   :synopsis: Benchmark measuring peak memory of recording one very large directory.
+
+.. moduleauthor:: František Brožka
+
+Benchmark measuring time and peak resident memory of recording one directory with many entries (every tenth of them a subdirectory)
+by the iterative os.scandir walker and by the walker with --max-directory-entries.
+Usage: python benchmarks/bench_large_directory.py [number-of-entries [max-directory-entries]]
+Every walker runs in it's own process so it's peak resident memory (ru_maxrss) is measured, the directory is created in a temporary directory and removed afterwards.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import record_dir_info
+
+def createDirectory(topDir, numberOfEntries):
+	"""Create numberOfEntries entries in the directory, every tenth of them an empty subdirectory, the others empty files."""
+	for i in xrange(numberOfEntries):
+		path = os.path.join(topDir, "e%09d" % ((i * 7919) % numberOfEntries))
+		if i % 10 == 0:
+			os.mkdir(path)
+		else:
+			open(path, 'wb').close()
+
+def measure(topDir, outputPath, maxDirectoryEntries):
+	"""Record the directory into the file and print elapsed time, number of records and peak resident memory in kilobytes, runs in the child process."""
+	recorder = record_dir_info.RecordDirInfo()
+	recorder.resetChangeableAttributes(customFormat=u"%p;%F;%s;%Y", maxDirectoryEntries=maxDirectoryEntries or None)
+	recorder.doOutputHash = False
+	recorder.doGetCreationTime = False
+	numberOfLines = [0]
+	with open(outputPath, 'wb') as f:
+		def writeLine(line):
+			f.write(line.encode('utf-8'))
+			f.write('\n')
+			numberOfLines[0] += 1
+		start = time.time()
+		recorder.recordTopDir(topDir, writeCallback=writeLine, formattingCallback=recorder.createRecordLineCustomFormat, doOutputAbsolutePaths=False, pathExludeRegexes=None)
+		elapsed = time.time() - start
+	print elapsed, numberOfLines[0], resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def main():
+	if len(sys.argv) == 5 and sys.argv[1] == "--child":
+		measure(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+		return
+	numberOfEntries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+	maxDirectoryEntries = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+	if record_dir_info.scandir is None:
+		print "ERROR: neither os.scandir nor the scandir package is available"
+		sys.exit(1)
+	tempDir = tempfile.mkdtemp(prefix="bench_large_directory_")
+	try:
+		topDir = os.path.join(tempDir, "top")
+		os.mkdir(topDir)
+		createDirectory(topDir, numberOfEntries)
+		outputPaths = []
+		for name, maxEntries in (("scandir iterative", 0), ("max entries %d" % maxDirectoryEntries, maxDirectoryEntries)):
+			outputPaths.append(os.path.join(tempDir, "%d.txt" % maxEntries))
+			output = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--child", topDir, outputPaths[-1], str(maxEntries)])
+			elapsed, numberOfLines, maxRss = output.split()
+			elapsed = float(elapsed)
+			print "%-20s %9d entries %8.2f s %10.1f entries/s %8.1f MB peak RSS" % (name, int(numberOfLines), elapsed, int(numberOfLines) / elapsed, int(maxRss) / 1024.0)
+		with open(outputPaths[0], 'rb') as f0:
+			with open(outputPaths[1], 'rb') as f1:
+				if f0.read() != f1.read():
+					print "ERROR: records differ"
+					sys.exit(1)
+	finally:
+		shutil.rmtree(tempDir)
+
+if __name__ == "__main__":
+	main()
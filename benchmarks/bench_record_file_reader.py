@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: bench_record_file_reader
+   :platform: Windows, Unix, others
+   :synopsis: Benchmark comparing reading a record file by splitting lines by the delimiter with parsing them by the regular expression.
+
+.. moduleauthor:: František Brožka
+
+Benchmark comparing RecordFileReader splitting the record lines by the field delimiter with parsing every line by the regular expression of the format.
+Usage: python benchmarks/bench_record_file_reader.py [number-of-lines]
+The record file is created in a temporary directory and removed afterwards.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import record_file_reader
+
+def createRecordFile(filePath, numberOfLines):
+	"""Create record file of the default format with numberOfLines records, every 1000th path contains the delimiter."""
+	with open(filePath, 'wb') as f:
+		f.write("# record line format: \"\"\"%p;%i;%M;%F;%s;%a;%u;%U;%g;%G;%L;%W;%Z;%Y;%X;%H;%T\"\"\"\n")
+		f.write("#--- --top-dir \"\"\"/top\"\"\":\n")
+		for i in range(numberOfLines):
+			name = "f;%07d" % i if i % 1000 == 0 else "f%07d" % i
+			f.write("\"\"\"/top/d%04d/%s\"\"\";%d;33188;f;%d;644;1000;user;1000;user;1;-;1500000000;1500000000;1500000000;da39a3ee5e6b4b0d3255bfef95601890afd80709;-\n" % (i // 1000, name, 1000000 + i, i * 7))
+
+def measure(filePath, doSplitByDelimiter, sequences):
+	reader = record_file_reader.RecordFileReader(filePath, sequences=sequences)
+	reader.doSplitByDelimiter = doSplitByDelimiter
+	records = []
+	start = time.time()
+	for block in reader.iterateRecordBlocks():
+		records.extend(block)
+	return time.time() - start, records
+
+def main():
+	numberOfLines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+	tempDir = tempfile.mkdtemp(prefix="bench_record_file_reader_")
+	try:
+		filePath = os.path.join(tempDir, "records.txt")
+		createRecordFile(filePath, numberOfLines)
+		megabytes = os.path.getsize(filePath) / 1048576.0
+		for sequences in (None, ["%p", "%s", "%Y"]):
+			results = []
+			for name, doSplitByDelimiter in (("regular expression", False), ("split by delimiter", True)):
+				elapsed, records = measure(filePath, doSplitByDelimiter, sequences)
+				results.append(records)
+				print "%-20s %-16s %9d lines %8.2f s %10.1f lines/s %8.1f MB/s" % (name, ','.join(sequences) if sequences else "all fields", len(records), elapsed, len(records) / elapsed, megabytes / elapsed)
+			if results[0] != results[1]:
+				print "ERROR: records differ"
+				sys.exit(1)
+	finally:
+		shutil.rmtree(tempDir)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: bench_suite
+   :platform: Unix
+   :synopsis: Benchmark suite measuring throughput and peak memory of recordings of a synthetic tree with different option sets.
+
+.. moduleauthor:: František Brožka
+
+Benchmark suite recording the synthetic tree of tree_generator.py by RecordDirInfo.recordDirs with different option sets (the default format, no hash values,
+a custom --format, a custom --time-format, --file-type and many --exclude-regex) and reporting entries per second, megabytes of hashed files per second and peak resident memory.
+Usage: python benchmarks/bench_suite.py [--scale SCALE] [--seed SEED] [--work-dir DIR] [--repeat N] [--option-set NAME ...] [--output RESULTS]
+       python benchmarks/bench_suite.py --compare OLD-RESULTS NEW-RESULTS
+The results are JSON lines (one per recording) written into RESULTS (stdout by default), a table is printed into stderr, --compare prints the ratios of two results of the same option sets, e.g. of two builds.
+Every recording runs in it's own process so it's peak resident memory (ru_maxrss) is measured. The tree is created in a temporary directory and removed afterwards unless --work-dir is given,
+the tree in the work dir is reused by the next runs with the same scale and seed. The tree is in the page cache (it was just written or read by the previous recording), so the results measure the cost of the recording itself,
+see bench_inode_order.py for recordings with a cold cache.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+benchmarksDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(benchmarksDir))
+
+import tree_generator
+
+# regular expressions that match no path of the tree, the cost of checking every path against them is measured
+manyExcludeRegexes = [u"/nonexistent%03d/" % i for i in xrange(50)] + [u"\\.bak%03d$" % i for i in xrange(50)]
+
+# (name, keyword arguments of RecordDirInfo.resetChangeableAttributes, regular expressions of --exclude-regex)
+optionSets = (
+	("default", {}, None),
+	("no-hash", {"customFormat": u"%p;%i;%M;%F;%s;%a;%u;%U;%g;%G;%L;%W;%Z;%Y;%X;%T"}, None),
+	("custom-format", {"customFormat": u"%F %s %Y %H %p"}, None),
+	("time-format", {"customTimeFormat": u"%Y-%m-%d %H:%M:%S"}, None),
+	("file-type", {"fileTypesToOutput": [u"f"]}, None),
+	("exclude-regex", {}, manyExcludeRegexes),
+)
+
+def getOptionSet(name):
+	for optionSet in optionSets:
+		if optionSet[0] == name:
+			return optionSet
+	raise Exception(''.join(("Error. Unknown option set '", name, "'."))) # TODO: define my own subclass of Exception ?
+
+def measure(optionSetName, topDir, outputPath):
+	"""Record the tree with the option set into the file and print JSON of elapsed time, peak resident memory in kilobytes, number of records and bytes of the regular files recorded with a hash value, runs in the child process."""
+	# imported only by the child process, ru_maxrss of the parent is inherited by the child on Linux so the parent has to stay small
+	import record_dir_info
+	import record_file_reader
+	name, attributes, pathExludeRegexes = getOptionSet(optionSetName)
+	recorder = record_dir_info.RecordDirInfo()
+	recorder.resetChangeableAttributes(**attributes)
+	start = time.time()
+	recorder.recordDirs([topDir], outputPath, pathExludeRegexes=pathExludeRegexes)
+	elapsed = time.time() - start
+	maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # before the output is read
+	numberOfRecords = 0
+	numberOfBytes = 0
+	for fileType, size, fileHash in record_file_reader.RecordFileReader(outputPath, sequences=("%F", "%s", "%H")):
+		numberOfRecords += 1
+		if fileType == "f" and not fileHash is None and not size is None:
+			numberOfBytes += size
+	print json.dumps({"seconds": elapsed, "peak_rss_kb": maxRss, "entries": numberOfRecords, "bytes_hashed": numberOfBytes})
+
+def getRevision():
+	"""Return the git commit of the measured build or None if it is not known."""
+	try:
+		with open(os.devnull, 'wb') as devnull:
+			return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(benchmarksDir), stderr=devnull).strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def prepareTree(workDir, scale, seed):
+	"""Return path of the tree in the work dir and it's manifest, the tree is created if the work dir does not contain a tree of the scale and seed."""
+	topDir = os.path.join(workDir, "tree")
+	manifestPath = os.path.join(workDir, "manifest.json")
+	if os.path.exists(manifestPath):
+		with open(manifestPath, 'rb') as f:
+			manifest = json.load(f)
+		if manifest["scale"] == scale and manifest["seed"] == seed:
+			return topDir, manifest
+		os.remove(manifestPath)
+	if os.path.exists(topDir):
+		shutil.rmtree(topDir)
+	os.mkdir(topDir)
+	start = time.time()
+	manifest = tree_generator.createTree(topDir, scale, seed)
+	sys.stderr.write("tree of %d entries and %.1f MB created in %.1f s\n" % (manifest["entries"], manifest["bytes"] / 1048576.0, time.time() - start))
+	with open(manifestPath, 'wb') as f:
+		json.dump(manifest, f, sort_keys=True)
+	return topDir, manifest
+
+def runSuite(arguments):
+	workDir = arguments.work_dir
+	if workDir is None:
+		workDir = tempfile.mkdtemp(prefix="bench_suite_")
+	elif not os.path.isdir(workDir):
+		os.mkdir(workDir)
+	names = arguments.option_set or [optionSet[0] for optionSet in optionSets]
+	for name in names:
+		getOptionSet(name) # unknown names are reported before the tree is created
+	output = sys.stdout
+	if arguments.output != "-":
+		output = open(arguments.output, 'ab')
+	try:
+		topDir, manifest = prepareTree(workDir, arguments.scale, arguments.seed)
+		revision = getRevision()
+		for name in names:
+			for repetition in xrange(arguments.repeat):
+				outputPath = os.path.join(workDir, "%s.txt" % name)
+				if os.path.exists(outputPath):
+					os.remove(outputPath)
+				result = json.loads(subprocess.check_output([sys.executable, os.path.abspath(__file__), "--child", name, topDir, outputPath]))
+				os.remove(outputPath)
+				if name == "default" and result["entries"] != manifest["entries"] + 1:
+					print "ERROR: %d records of %d entries (and the top dir)" % (result["entries"], manifest["entries"])
+					sys.exit(1)
+				result.update({
+					"option_set": name,
+					"repetition": repetition,
+					"revision": revision,
+					"python": platform.python_version(),
+					"scale": manifest["scale"],
+					"seed": manifest["seed"],
+					"tree_entries": manifest["entries"],
+					"entries_per_second": result["entries"] / result["seconds"],
+					"mb_per_second": result["bytes_hashed"] / 1048576.0 / result["seconds"],
+				})
+				output.write(json.dumps(result, sort_keys=True))
+				output.write("\n")
+				output.flush()
+				sys.stderr.write("%-15s %9d entries %8.2f s %10.1f entries/s %8.1f MB/s %8.1f MB peak RSS\n" % (name, result["entries"], result["seconds"], result["entries_per_second"], result["mb_per_second"], result["peak_rss_kb"] / 1024.0))
+	finally:
+		if output != sys.stdout:
+			output.close()
+		if arguments.work_dir is None:
+			shutil.rmtree(workDir)
+
+def readResults(path):
+	"""Return dict of lists of the results by option set."""
+	results = {}
+	with open(path, 'rb') as f:
+		for line in f:
+			if line.strip():
+				result = json.loads(line)
+				results.setdefault(result["option_set"], []).append(result)
+	return results
+
+def compareResults(oldPath, newPath):
+	"""Print the ratios (new / old) of the best entries per second, megabytes per second and peak resident memory of the option sets in both results."""
+	oldResults = readResults(oldPath)
+	newResults = readResults(newPath)
+	print "%-15s %15s %15s %15s" % ("option set", "entries/s", "MB/s", "peak RSS")
+	for name in [optionSet[0] for optionSet in optionSets]:
+		if not name in oldResults or not name in newResults:
+			continue
+		ratios = []
+		for key, choose in (("entries_per_second", max), ("mb_per_second", max), ("peak_rss_kb", min)):
+			old = choose([result[key] for result in oldResults[name]])
+			new = choose([result[key] for result in newResults[name]])
+			ratios.append("%14.3fx" % (new / float(old)) if old else "%15s" % "-")
+		print "%-15s %s" % (name, " ".join(ratios))
+
+def main():
+	if len(sys.argv) == 5 and sys.argv[1] == "--child":
+		measure(sys.argv[2], sys.argv[3], sys.argv[4])
+		return
+	parser = argparse.ArgumentParser(description="Measure recordings of a synthetic tree with different option sets.")
+	parser.add_argument('--scale', help='Scale of the tree, see tree_generator.py. Defaults to 1.', default=1.0, type=float, required=False)
+	parser.add_argument('--seed', help='Seed of the tree, see tree_generator.py. Defaults to 1.', default=1, type=int, required=False)
+	parser.add_argument('--work-dir', help='Directory keeping the tree for the next runs, a temporary directory removed afterwards by default.', metavar='DIR', required=False)
+	parser.add_argument('--repeat', help='Number of recordings of each option set. Defaults to 1.', metavar='N', default=1, type=int, required=False)
+	parser.add_argument('--option-set', help='Option set to measure, can be given multiple times. All of them by default: %s.' % ", ".join([optionSet[0] for optionSet in optionSets]), metavar='NAME', action='append', required=False)
+	parser.add_argument('--output', help='File the JSON lines of the results are appended to. Defaults to \'-\', i.e. stdout.', metavar='RESULTS', default='-', required=False)
+	parser.add_argument('--compare', help='Compare two files of results instead of measuring.', metavar=('OLD-RESULTS', 'NEW-RESULTS'), nargs=2, required=False)
+	arguments = parser.parse_args()
+	if not arguments.compare is None:
+		compareResults(*arguments.compare)
+		return
+	runSuite(arguments)
+
+if __name__ == "__main__":
+	main()
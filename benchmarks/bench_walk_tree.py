@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: bench_walk_tree
+   :platform: Unix
+   :synopsis: Benchmark comparing the recursive os.listdir walker with the iterative os.scandir walker.
+
+.. moduleauthor:: František Brožka
+
+Benchmark comparing the recursive os.listdir walker with the iterative os.scandir walker on a synthetic tree.
+Usage: python benchmarks/bench_walk_tree.py [number-of-entries [entries-per-directory]]
+The tree is created in a temporary directory and removed afterwards, e.g. 10000000 entries need about 40 GB of inodes on ext4.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import record_dir_info
+
+def createTree(topDir, numberOfEntries, entriesPerDirectory):
+	"""Create directories with entriesPerDirectory entries each, one of them being a subdirectory, until numberOfEntries entries exist."""
+	d = topDir
+	created = 0
+	while created < numberOfEntries:
+		for i in range(min(entriesPerDirectory - 1, numberOfEntries - created - 1)):
+			open(os.path.join(d, "f%07d" % i), 'wb').close()
+			created += 1
+		d = os.path.join(d, "d%07d" % created)
+		os.mkdir(d)
+		created += 1
+
+def measure(topDir, doUseScandir, customFormat):
+	recorder = record_dir_info.RecordDirInfo()
+	recorder.resetChangeableAttributes(customFormat=customFormat)
+	recorder.doUseScandir = doUseScandir
+	recorder.doOutputHash = False
+	recorder.doGetCreationTime = False
+	lines = []
+	start = time.time()
+	recorder.recordTopDir(topDir, writeCallback=lines.append, formattingCallback=recorder.createRecordLineCustomFormat, doOutputAbsolutePaths=False, pathExludeRegexes=None)
+	return time.time() - start, lines
+
+def main():
+	numberOfEntries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+	entriesPerDirectory = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+	if record_dir_info.scandir is None:
+		print "ERROR: neither os.scandir nor the scandir package is available"
+		sys.exit(1)
+	topDir = tempfile.mkdtemp(prefix="bench_walk_tree_")
+	try:
+		createTree(topDir, numberOfEntries, entriesPerDirectory)
+		for customFormat in (u"%p;%F", u"%p;%i;%M;%F;%s;%a;%u;%g;%L;%Z;%Y;%X"):
+			results = []
+			for name, doUseScandir in (("listdir recursive", False), ("scandir iterative", True)):
+				elapsed, lines = measure(topDir, doUseScandir, customFormat)
+				results.append(lines)
+				print "%-20s %-40s %9d entries %8.2f s %10.1f entries/s" % (name, customFormat, len(lines), elapsed, len(lines) / elapsed)
+			if results[0] != results[1]:
+				print "ERROR: records differ"
+				sys.exit(1)
+	finally:
+		shutil.rmtree(topDir)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: tree_generator
+   :platform: Unix
+   :synopsis: Deterministic generator of synthetic directory trees for the benchmarks.
+
+.. moduleauthor:: František Brožka
+
+Functions that create a synthetic directory tree of the shapes that make recordings slow: wide directories, a deep chain of directories, many empty files,
+a few huge files, a farm of symbolic links, files with many hard links and names that are not valid UTF-8.
+The same scale and seed always create the same names, sizes, contents, link targets and times of last modification (only inode numbers, times of last change and times of the symbolic links differ),
+entries are created in a shuffled order so the order of inode numbers differs from the order of names as on a tree that grew over time.
+Usage: python benchmarks/tree_generator.py [--scale SCALE] [--seed SEED] <top-dir>
+Scale 1 creates about 160000 entries and 225 MB of data, scale 10 creates over a million empty files.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import struct
+import sys
+
+# times of last access and last modification of all files and directories (2016-01-01 00:00:00 UTC)
+fixedTime = 1451606400
+# the deep chain is not longer than this, so the paths stay well below PATH_MAX and the recursive walker below the recursion limit
+maxDepth = 500
+
+def scaled(number, scale):
+	return max(1, int(number * scale))
+
+def createFile(path, size=0, block=None):
+	"""Create the file of the size, filled with the block (repeated, each repetition starts with it's number so the blocks differ)."""
+	with open(path, 'wb') as f:
+		written = 0
+		i = 0
+		while written < size:
+			data = ''.join((struct.pack('>Q', i), block[8:]))[:size - written]
+			f.write(data)
+			written += len(data)
+			i += 1
+	os.utime(path, (fixedTime, fixedTime))
+
+def createBlock(seed, size=1048576):
+	"""Return pseudo random block of the size, the same for the same seed."""
+	digests = []
+	for i in xrange((size + 63) // 64):
+		digests.append(hashlib.sha512("%d:%d" % (seed, i)).digest())
+	return ''.join(digests)[:size]
+
+def createWideDirectories(topDir, scale, rnd):
+	"""Two directories with 20000 * scale empty files each."""
+	numberOfEntries = 0
+	for d in ("wide1", "wide2"):
+		path = os.path.join(topDir, d)
+		os.mkdir(path)
+		numberOfEntries += 1
+		indexes = range(scaled(20000, scale))
+		rnd.shuffle(indexes)
+		for i in indexes:
+			createFile(os.path.join(path, "file%08d" % i))
+			numberOfEntries += 1
+	return numberOfEntries, 0
+
+def createDeepChain(topDir, scale, rnd):
+	"""Chain of 200 * scale (at most maxDepth) nested directories, each with one small file."""
+	numberOfEntries = 0
+	numberOfBytes = 0
+	path = os.path.join(topDir, "deep")
+	for depth in xrange(min(scaled(200, scale), maxDepth)):
+		os.mkdir(path)
+		size = rnd.randint(0, 4096)
+		createFile(os.path.join(path, "f"), size, createBlock(depth, 4096))
+		numberOfEntries += 2
+		numberOfBytes += size
+		path = os.path.join(path, "d")
+	return numberOfEntries, numberOfBytes
+
+def createEmptyFiles(topDir, scale, rnd):
+	"""100000 * scale empty files in directories of 1000 files."""
+	numberOfEntries = 0
+	numberOfFiles = scaled(100000, scale)
+	path = os.path.join(topDir, "empty")
+	os.mkdir(path)
+	numberOfEntries += 1
+	directories = range((numberOfFiles + 999) // 1000)
+	rnd.shuffle(directories)
+	for d in directories:
+		directoryPath = os.path.join(path, "dir%05d" % d)
+		os.mkdir(directoryPath)
+		numberOfEntries += 1
+		indexes = range(d * 1000, min((d + 1) * 1000, numberOfFiles))
+		rnd.shuffle(indexes)
+		for i in indexes:
+			createFile(os.path.join(directoryPath, "empty%08d" % i))
+			numberOfEntries += 1
+	return numberOfEntries, 0
+
+def createHugeFiles(topDir, scale, rnd):
+	"""Three files of 64 MB * scale each."""
+	path = os.path.join(topDir, "huge")
+	os.mkdir(path)
+	numberOfEntries = 1
+	numberOfBytes = 0
+	for i in xrange(3):
+		size = scaled(64 * 1048576, scale)
+		createFile(os.path.join(path, "huge%d.bin" % i), size, createBlock(rnd.randint(0, 1000000)))
+		numberOfEntries += 1
+		numberOfBytes += size
+	return numberOfEntries, numberOfBytes
+
+def createSymlinkFarm(topDir, scale, rnd):
+	"""10000 * scale symbolic links to the empty files, to the directories of the empty files and (every tenth) to paths that do not exist. Needs the empty files."""
+	path = os.path.join(topDir, "links")
+	os.mkdir(path)
+	numberOfEntries = 1
+	numberOfEmptyFiles = scaled(100000, scale)
+	for i in xrange(scaled(10000, scale)):
+		if i % 10 == 0:
+			target = "../empty/missing%08d" % i
+		elif i % 10 == 1:
+			target = "../empty/dir%05d" % rnd.randrange((numberOfEmptyFiles + 999) // 1000)
+		else:
+			j = rnd.randrange(numberOfEmptyFiles)
+			target = "../empty/dir%05d/empty%08d" % (j // 1000, j)
+		os.symlink(target, os.path.join(path, "link%08d" % i))
+		numberOfEntries += 1
+	return numberOfEntries, 0
+
+def createHardLinks(topDir, scale, rnd):
+	"""2000 * scale files of 4 KB each with 4 links spread over 20 directories."""
+	path = os.path.join(topDir, "hardlinks")
+	os.mkdir(path)
+	numberOfEntries = 1
+	numberOfBytes = 0
+	directories = [os.path.join(path, "dir%02d" % d) for d in xrange(20)]
+	for d in directories:
+		os.mkdir(d)
+		numberOfEntries += 1
+	for i in xrange(scaled(2000, scale)):
+		paths = [os.path.join(d, "linked%08d" % i) for d in rnd.sample(directories, 4)]
+		createFile(paths[0], 4096, createBlock(i, 4096))
+		for linkPath in paths[1:]:
+			os.link(paths[0], linkPath)
+		numberOfEntries += len(paths)
+		numberOfBytes += 4096 * len(paths)
+	return numberOfEntries, numberOfBytes
+
+def createNonUtf8Names(topDir, scale, rnd):
+	"""1000 * scale files with names in latin-1, with invalid UTF-8 bytes and with valid non-ASCII UTF-8, and a directory with a non-UTF-8 name."""
+	path = os.path.join(topDir, "names")
+	os.mkdir(path)
+	numberOfEntries = 1
+	numberOfBytes = 0
+	patterns = (u"café_%08d".encode('latin-1'), "\xff\xfe_%08d", "bad\x80\xc0_%08d", u"žluťoučký_kůň_%08d".encode('utf-8'), u"日本語_%08d".encode('utf-8'))
+	for i in xrange(scaled(1000, scale)):
+		size = rnd.randint(0, 1024)
+		createFile(os.path.join(path, patterns[i % len(patterns)] % i), size, createBlock(i, 1024))
+		numberOfEntries += 1
+		numberOfBytes += size
+	directoryPath = os.path.join(path, "dir\xe9\xff")
+	os.mkdir(directoryPath)
+	createFile(os.path.join(directoryPath, "inside\xe9"))
+	numberOfEntries += 2
+	return numberOfEntries, numberOfBytes
+
+# the shapes in the order they are created, the symbolic links point to the empty files
+shapes = (
+	("wide", createWideDirectories),
+	("deep", createDeepChain),
+	("empty", createEmptyFiles),
+	("huge", createHugeFiles),
+	("links", createSymlinkFarm),
+	("hardlinks", createHardLinks),
+	("names", createNonUtf8Names),
+)
+
+def setDirectoryTimes(topDir):
+	"""Set the fixed time to the directories, after all their entries are created."""
+	for dirPath, dirNames, fileNames in os.walk(topDir, topdown=False):
+		os.utime(dirPath, (fixedTime, fixedTime))
+
+def createTree(topDir, scale=1.0, seed=1):
+	"""
+	Create the tree in the existing empty directory topDir (a byte string, the names that are not valid UTF-8 need it).
+	Return manifest, dict with the scale, the seed, numbers of entries (without topDir) and bytes of regular files of each shape and in total.
+	"""
+	rnd = random.Random(seed)
+	manifest = {"scale": scale, "seed": seed, "shapes": {}, "entries": 0, "bytes": 0}
+	for name, createShape in shapes:
+		numberOfEntries, numberOfBytes = createShape(topDir, scale, rnd)
+		manifest["shapes"][name] = {"entries": numberOfEntries, "bytes": numberOfBytes}
+		manifest["entries"] += numberOfEntries
+		manifest["bytes"] += numberOfBytes
+	setDirectoryTimes(topDir)
+	return manifest
+
+def main():
+	parser = argparse.ArgumentParser(description="Create a synthetic directory tree for the benchmarks and print it's manifest as JSON.")
+	parser.add_argument('--scale', help='Scale of the numbers of entries and of the sizes of the huge files. Defaults to 1.', default=1.0, type=float, required=False)
+	parser.add_argument('--seed', help='Seed of the pseudo random names, sizes and contents. Defaults to 1.', default=1, type=int, required=False)
+	parser.add_argument('top_dir', help='Directory to create, it must not exist.', metavar='<top-dir>')
+	arguments = parser.parse_args()
+	if os.path.exists(arguments.top_dir):
+		print "ERROR: '%s' already exists" % arguments.top_dir
+		sys.exit(1)
+	os.mkdir(arguments.top_dir)
+	print json.dumps(createTree(arguments.top_dir, arguments.scale, arguments.seed), sort_keys=True)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: columnar_file_reader
+   :platform: Windows, Unix, others
+   :synopsis: Class that reads columns of the binary columnar recording.
+
+.. moduleauthor:: František Brožka
+
+Class that reads the binary file of column blocks written by output_writer_columnar.OutputWriterColumnar.
+The file is memory mapped and only the parts of the requested columns are decoded.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import binascii
+import itertools
+import mmap
+import struct
+
+import output_writer_columnar
+
+columnKindsByCode = dict([(code, kind) for kind, code in output_writer_columnar.columnKindCodes.iteritems()])
+
+class ColumnarFileReader():
+	"""
+	Read columns of the binary columnar recording block by block.
+	Values are int for the numeric fields, byte strings for paths, file types and text fields, hex strings for hash values and None for unset values.
+	"""
+	
+	def __init__(self, filePath):
+		self.filePath = filePath
+		self.file = open(filePath, 'rb')
+		self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+		if self.data[:len(output_writer_columnar.fileMagic)] != output_writer_columnar.fileMagic:
+			self.close()
+			raise Exception(''.join(("Error. The file '", filePath, "' is not a columnar recording."))) # TODO: define my own subclass of Exception ?
+		self.blocks = self.readBlocks()
+		self.decoders = {"int64": self.decodeInt64Column, "uint32": self.decodeUint32Column, "char": self.decodeCharColumn, "frontcoded": self.decodeFrontCodedColumn, "digest": self.decodeDigestColumn, "strings": self.decodeStringsColumn, "lines": self.decodeLinesColumn}
+	
+	def __enter__(self):
+		return self
+	
+	def __exit__(self, excType, excValue, traceback):
+		self.close()
+	
+	def readBlocks(self):
+		"""Return list of (number of records, dict of (kind, list of (offset, length) of parts in the file) by format sequence) of the blocks in the order of the file, found by their trailers from the end of the file."""
+		blocks = []
+		end = len(self.data)
+		trailerSize = output_writer_columnar.trailerStruct.size
+		while end > len(output_writer_columnar.fileMagic):
+			blockLength, footerLength, magic = output_writer_columnar.trailerStruct.unpack_from(self.data, end - trailerSize)
+			if magic != output_writer_columnar.blockMagic:
+				raise Exception(''.join(("Error. The columnar recording '", self.filePath, "' is damaged, block trailer not found at offset ", str(end - trailerSize), "."))) # TODO: define my own subclass of Exception ?
+			start = end - blockLength
+			offset = end - trailerSize - footerLength
+			numberOfRecords, numberOfColumns = output_writer_columnar.footerHeaderStruct.unpack_from(self.data, offset)
+			offset += output_writer_columnar.footerHeaderStruct.size
+			columns = {}
+			for i in range(numberOfColumns):
+				sequence, kindCode, numberOfParts = output_writer_columnar.footerColumnStruct.unpack_from(self.data, offset)
+				offset += output_writer_columnar.footerColumnStruct.size
+				parts = []
+				for j in range(numberOfParts):
+					partOffset, partLength = output_writer_columnar.footerPartStruct.unpack_from(self.data, offset)
+					offset += output_writer_columnar.footerPartStruct.size
+					parts.append((start + partOffset, partLength))
+				columns[sequence] = (columnKindsByCode[kindCode], parts)
+			blocks.append((numberOfRecords, columns))
+			end = start
+		blocks.reverse()
+		return blocks
+	
+	def getSequences(self):
+		"""Return list of format sequences of the columns of the first block with records."""
+		for numberOfRecords, columns in self.blocks:
+			if numberOfRecords > 0:
+				return sorted([sequence for sequence in columns if sequence != output_writer_columnar.infoSequence])
+		return []
+	
+	def getNumberOfRecords(self):
+		return sum([numberOfRecords for numberOfRecords, columns in self.blocks])
+	
+	def decodeInt64Column(self, numberOfRecords, parts):
+		offset, length = parts[0]
+		return [None if value == output_writer_columnar.unsetInt64 else value for value in struct.unpack_from("<%dq" % numberOfRecords, self.data, offset)]
+	
+	def decodeUint32Column(self, numberOfRecords, parts):
+		offset, length = parts[0]
+		return [None if value == output_writer_columnar.unsetUint32 else value for value in struct.unpack_from("<%dI" % numberOfRecords, self.data, offset)]
+	
+	def decodeCharColumn(self, numberOfRecords, parts):
+		offset, length = parts[0]
+		return [None if value == '-' else value for value in self.data[offset:offset + length]]
+	
+	def decodeFrontCodedColumn(self, numberOfRecords, parts):
+		offset, length = parts[0]
+		lengths = struct.unpack_from("<%dI" % (2 * numberOfRecords), self.data, offset)
+		offset, length = parts[1]
+		rests = self.data[offset:offset + length]
+		values = []
+		previous = ''
+		position = 0
+		for i in xrange(0, 2 * numberOfRecords, 2):
+			previous = ''.join((previous[:lengths[i]], rests[position:position + lengths[i + 1]]))
+			position += lengths[i + 1]
+			values.append(previous)
+		return values
+	
+	def decodeDigestColumn(self, numberOfRecords, parts):
+		offset, length = parts[0]
+		width = struct.unpack_from("<I", self.data, offset)[0]
+		offset, length = parts[1]
+		digests = self.data[offset:offset + length]
+		return [binascii.hexlify(digests[i + 1:i + 1 + width]) if digests[i] == '\x01' else None for i in xrange(0, numberOfRecords * (width + 1), width + 1)]
+	
+	def decodeStringsColumn(self, numberOfRecords, parts):
+		offset, length = parts[0]
+		lengths = struct.unpack_from("<%dI" % numberOfRecords, self.data, offset)
+		offset, length = parts[1]
+		strings = self.data[offset:offset + length]
+		values = []
+		position = 0
+		for length in lengths:
+			if length == output_writer_columnar.unsetUint32:
+				values.append(None)
+			else:
+				values.append(strings[position:position + length])
+				position += length
+		return values
+	
+	def decodeLinesColumn(self, numberOfRecords, parts):
+		"""Return list of (number of records of the block preceding the line, line)."""
+		offset, length = parts[0]
+		numbers = struct.unpack_from("<%dI" % (length // 4), self.data, offset)
+		offset, length = parts[1]
+		lines = self.data[offset:offset + length]
+		values = []
+		position = 0
+		for i in xrange(0, len(numbers), 2):
+			values.append((numbers[i], lines[position:position + numbers[i + 1]]))
+			position += numbers[i + 1]
+		return values
+	
+	def iterateColumnBlocks(self, sequence):
+		"""Yield list of values of the column of the format sequence for each block, list of None values if the block does not have the column."""
+		for numberOfRecords, columns in self.blocks:
+			if not sequence in columns:
+				yield [None] * numberOfRecords
+				continue
+			kind, parts = columns[sequence]
+			yield self.decoders[kind](numberOfRecords, parts)
+	
+	def iterateColumn(self, sequence):
+		"""Yield values of the column of the format sequence."""
+		for values in self.iterateColumnBlocks(sequence):
+			for value in values:
+				yield value
+	
+	def iterateRecords(self, sequences):
+		"""Yield tuples of values of the columns of the format sequences."""
+		for blockColumns in itertools.izip(*[self.iterateColumnBlocks(sequence) for sequence in sequences]):
+			for record in zip(*blockColumns):
+				yield record
+	
+	def iterateInfoLines(self):
+		"""Yield (index of the record in the file the line precedes, info line)."""
+		numberOfPreviousRecords = 0
+		for numberOfRecords, columns in self.blocks:
+			for numberOfRecordsInBlock, line in self.decodeLinesColumn(numberOfRecords, columns[output_writer_columnar.infoSequence][1]):
+				yield numberOfPreviousRecords + numberOfRecordsInBlock, line
+			numberOfPreviousRecords += numberOfRecords
+	
+	def close(self):
+		self.data.close()
+		self.file.close()
@@ -41,4 +41,12 @@ class CrtimeExt4Inode():
 	def getCreationTime(self, inodeNumber):
 		"""To be hidden by subclasses"""
 		pass
+	
+	def getCreationTimes(self, inodeNumbers):
+		"""Return dictionary mapping each of the inode numbers to it's creation time. Can be hidden by subclasses."""
+		return dict([(inodeNumber, self.getCreationTime(inodeNumber)) for inodeNumber in inodeNumbers])
+	
+	def close(self):
+		"""Can be hidden by subclasses"""
+		pass
 
@@ -32,6 +32,7 @@ u"""
 
 """
 
+import os
 import re
 import subprocess
 import time
@@ -48,19 +49,95 @@ class CrtimeExt4InodeUnixUtility1(crtime_ext4_inode.CrtimeExt4Inode):
 			self.CLIUtility = "/sbin/debugfs"
 			subprocess.check_output(["which", self.CLIUtility], stderr=subprocess.PIPE)
 		self.deviceName = deviceName
+		# debugfs writes to a pipe with full buffering, so a long-lived session is possible only if stdbuf can make it's output line buffered
+		try:
+			subprocess.check_output(["which", "stdbuf"], stderr=subprocess.PIPE)
+		except subprocess.CalledProcessError:
+			self.lineBufferingCommand = None
+		else:
+			self.lineBufferingCommand = ["stdbuf", "-oL"]
+		self.session = None
+		self.commandsPerRequest = 256 # keep the commands written at once well below the capacity of the pipe to debugfs's stdin
+		self.endOfRequestCommand = "recorddirinfo_end_of_request"
+		self.environment = dict(os.environ, DEBUGFS_PAGER="__none__", PAGER="__none__")
 	
 	def getCreationTime(self, inodeNumber):
-		s = "stat <" + str(inodeNumber) + ">"
-		output = subprocess.check_output([self.CLIUtility, "-R", s, self.deviceName], stderr=subprocess.PIPE)
-		crtime = None
-		for line in output.split('\n'):
-			if re.match("crtime.*", line):
-				s = line.split(' -- ')[1]
-				try:
-					t = time.strptime(s)
-				except ValueError:
-					crtime = None
-				else:
-					crtime = int(time.mktime(t))
+		return self.getCreationTimes((inodeNumber,))[inodeNumber]
+	
+	def getCreationTimes(self, inodeNumbers):
+		"""Return dictionary mapping each of the inode numbers to it's creation time (None if not available). The inodes are requested from debugfs sorted by inode number so that the inode table is read sequentially."""
+		inodeNumbers = sorted(set(inodeNumbers))
+		creationTimes = {}
+		for i in range(0, len(inodeNumbers), self.commandsPerRequest):
+			commands = ''.join(["stat <" + str(inodeNumber) + ">\n" for inodeNumber in inodeNumbers[i:i + self.commandsPerRequest]])
+			if self.lineBufferingCommand is None:
+				output = self.runCommands(commands)
+			else:
+				output = self.runCommandsInSession(commands)
+			creationTimes.update(self.parseStatOutput(output))
+		for inodeNumber in inodeNumbers:
+			if not inodeNumber in creationTimes:
+				creationTimes[inodeNumber] = None
+		return creationTimes
+	
+	def runCommands(self, commands):
+		p = subprocess.Popen([self.CLIUtility, "-f", "-", self.deviceName], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=self.environment)
+		output = p.communicate(commands)[0]
+		if p.returncode != 0:
+			raise subprocess.CalledProcessError(p.returncode, self.CLIUtility, output)
+		return output
+	
+	def runCommandsInSession(self, commands):
+		if self.session is None:
+			with open(os.devnull, 'wb') as devnull:
+				self.session = subprocess.Popen(self.lineBufferingCommand + [self.CLIUtility, "-f", "-", self.deviceName], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=devnull, env=self.environment)
+		try:
+			self.session.stdin.write(commands)
+			self.session.stdin.write(self.endOfRequestCommand + "\n")
+			self.session.stdin.flush()
+		except IOError:
+			self.close()
+			raise subprocess.CalledProcessError(1, self.CLIUtility)
+		endOfRequestLine = "debugfs: " + self.endOfRequestCommand + "\n"
+		lines = []
+		while True:
+			line = self.session.stdout.readline()
+			if line == endOfRequestLine:
 				break
-		return crtime
+			if line == "":
+				# debugfs terminated
+				self.close()
+				raise subprocess.CalledProcessError(1, self.CLIUtility, ''.join(lines))
+			lines.append(line)
+		return ''.join(lines)
+	
+	def parseStatOutput(self, output):
+		"""Split output of several "stat <inode>" commands (each one echoed by debugfs as "debugfs: stat <inode>") and return dictionary mapping inode number to creation time."""
+		creationTimes = {}
+		inodeNumber = None
+		for line in output.split('\n'):
+			if line.startswith("debugfs: stat <"):
+				inodeNumber = int(line[len("debugfs: stat <"):line.index(">")])
+				creationTimes[inodeNumber] = None
+			elif not inodeNumber is None and re.match("crtime.*", line):
+				creationTimes[inodeNumber] = self.parseCreationTime(line)
+				inodeNumber = None
+		return creationTimes
+	
+	def parseCreationTime(self, line):
+		s = line.split(' -- ')[1]
+		try:
+			t = time.strptime(s)
+		except ValueError:
+			return None
+		else:
+			return int(time.mktime(t))
+	
+	def close(self):
+		if not self.session is None:
+			try:
+				self.session.stdin.close()
+			except IOError:
+				pass
+			self.session.wait()
+			self.session = None
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: crtime_statx_unix
+   :platform: Linux
+   :synopsis: Class that provides creation time information for a file on Linux using the system call statx.
+
+.. moduleauthor:: František Brožka
+
+Class that provides creation time information for a file on Linux using the system call statx.
+Works on every filesystem that records birth time (e.g. ext4, xfs, btrfs, tmpfs) and does not need root privileges.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import ctypes
+import errno
+import os
+import platform
+import struct
+import sys
+
+class CrtimeStatxUnix():
+	
+	def __init__(self):
+		"""Raises OSError if the system call statx is not available."""
+		self.AT_FDCWD = -100
+		self.AT_SYMLINK_NOFOLLOW = 0x100
+		self.STATX_BTIME = 0x800
+		self.statxBufferSize = 256 # size of struct statx
+		self.btimeSecondsOffset = 80 # offset of stx_btime.tv_sec in struct statx
+		self.systemCallNumbers = {'x86_64': 332, 'i386': 383, 'i686': 383, 'aarch64': 291, 'armv7l': 397, 'ppc64le': 383, 's390x': 379}
+		self.filesystemEncoding = sys.getfilesystemencoding() or 'utf-8'
+		self.buffer = ctypes.create_string_buffer(self.statxBufferSize)
+		libc = ctypes.CDLL(None, use_errno=True)
+		try:
+			self._statx = libc.statx
+			self._statx.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_uint, ctypes.c_char_p)
+		except AttributeError:
+			# glibc older than 2.28 has no wrapper, call the system call directly
+			machine = platform.machine()
+			if not machine in self.systemCallNumbers:
+				raise OSError(errno.ENOSYS, "statx system call number unknown for machine " + machine)
+			syscall = libc.syscall
+			systemCallNumber = self.systemCallNumbers[machine]
+			self._statx = lambda *args: syscall(systemCallNumber, *args)
+		if self.statx(os.sep) is None:
+			raise OSError(ctypes.get_errno(), "statx system call is not available")
+	
+	def statx(self, path):
+		"""Return the raw struct statx of the path (the link itself if the path is a symbolic link) or None if the system call failed."""
+		if type(path) == unicode:
+			path = path.encode(self.filesystemEncoding)
+		if self._statx(self.AT_FDCWD, path, self.AT_SYMLINK_NOFOLLOW, self.STATX_BTIME, self.buffer) != 0:
+			return None
+		return self.buffer
+	
+	def getCreationTime(self, path):
+		"""Return birth time of the path as seconds since epoch or None if the filesystem does not report it."""
+		b = self.statx(path)
+		if b is None:
+			return None
+		mask = struct.unpack_from('=I', b, 0)[0]
+		if not mask & self.STATX_BTIME:
+			return None
+		return struct.unpack_from('=q', b, self.btimeSecondsOffset)[0]
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: duplicate_finder
+   :platform: Windows, Unix, others
+   :synopsis: Class that finds regular files with the same content.
+
+.. moduleauthor:: František Brožka
+
+Class that finds clusters of regular files with the same content in the directory trees walked by RecordDirInfo.
+Files are compared in stages so that as little data as possible is read: files are grouped by size from the stat info of the walk,
+files of the same size are grouped by a digest of their head and tail and only the files still in a group are read whole to compute their hash value.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import hashlib
+import io
+import subprocess
+
+class DuplicateFinder():
+	"""
+	Find clusters of regular files with the same size and hash value.
+	Hard links of the same file (the same device and inode number) are read only once and are listed in the cluster of the file,
+	a file whose only copies are it's hard links is not a duplicate.
+	"""
+	
+	def __init__(self, recordDirInfo, sampleSize=65536, minSize=1):
+		"""recordDirInfo is RecordDirInfo used to walk the directory trees, it is configured to output regular files only without hash values."""
+		self.recordDirInfo = recordDirInfo
+		self.recordDirInfo.resetChangeableAttributes(hashType=recordDirInfo.hashType, customFormat=u"%p;%F;%s;%i", fileTypesToOutput=[recordDirInfo.regularFileSymbol])
+		self.sampleSize = sampleSize
+		self.minSize = minSize
+		self.hashingProcessor = None
+		# paths of files by size and (device, inode number)
+		self.filesBySize = {}
+		self.statistics = {'files': 0, 'bytes': 0, 'bytesRead': 0, 'partialDigests': 0, 'fullDigests': 0, 'clusters': 0, 'duplicates': 0}
+	
+	def createFileEntry(self, info):
+		"""Formatting callback of the walk, return (size, (device, inode number), path) of the current file or None if it's stat failed."""
+		if not self.recordDirInfo.pathSetSuccessfully:
+			return None
+		fileInfoProcessor = self.recordDirInfo.fileInfoProcessor
+		osStatResult = fileInfoProcessor.osStatResult
+		return osStatResult.st_size, (osStatResult.st_dev, osStatResult.st_ino), fileInfoProcessor.path
+	
+	def addFile(self, fileEntry):
+		"""Write callback of the walk, the top dir info lines are ignored."""
+		if type(fileEntry) != tuple:
+			return
+		size, fileId, path = fileEntry
+		if size < self.minSize:
+			return
+		self.statistics['files'] += 1
+		files = self.filesBySize.setdefault(size, {})
+		if not fileId in files:
+			files[fileId] = []
+			self.statistics['bytes'] += size
+		files[fileId].append(path)
+	
+	def walkTopDirs(self, topDirs, doOutputAbsolutePaths=False, pathExludeRegexes=None):
+		"""Collect the regular files of the directory trees."""
+		for topDir in topDirs:
+			self.recordDirInfo.recordTopDir(topDir, writeCallback=self.addFile, formattingCallback=self.createFileEntry, doOutputAbsolutePaths=doOutputAbsolutePaths, pathExludeRegexes=pathExludeRegexes)
+			if self.hashingProcessor is None:
+				self.hashingProcessor = self.recordDirInfo.fileInfoProcessor.createHashingProcessor(self.recordDirInfo.hashType)
+		if self.hashingProcessor is None:
+			raise Exception(''.join(("Error. Hash values of the type '", self.recordDirInfo.hashType, "' cannot be computed on this system."))) # TODO: define my own subclass of Exception ?
+	
+	def getPartialDigest(self, path, size):
+		"""Return digest of the first and the last sampleSize bytes of the file or None if it cannot be read."""
+		h = hashlib.sha1()
+		try:
+			with io.open(path, 'rb') as f:
+				h.update(f.read(self.sampleSize))
+				f.seek(max(self.sampleSize, size - self.sampleSize))
+				h.update(f.read(self.sampleSize))
+		except (IOError, OSError):
+			return None
+		self.statistics['bytesRead'] += min(size, 2 * self.sampleSize)
+		self.statistics['partialDigests'] += 1
+		return h.digest()
+	
+	def getFullDigest(self, path, size):
+		"""Return hash value of the file or None if it cannot be read."""
+		try:
+			fileHash = self.hashingProcessor.getFileHash(path)
+		except (subprocess.CalledProcessError, IOError, OSError):
+			return None
+		self.statistics['bytesRead'] += size
+		self.statistics['fullDigests'] += 1
+		return fileHash
+	
+	def groupFiles(self, files, getDigest, size):
+		"""Return list of dicts of paths by (device, inode number) of the files with the same digest, only the groups of more than one file are returned."""
+		groups = {}
+		for fileId, paths in files.iteritems():
+			digest = getDigest(paths[0], size)
+			if not digest is None:
+				groups.setdefault(digest, {})[fileId] = paths
+		return [(digest, group) for digest, group in groups.iteritems() if len(group) > 1]
+	
+	def iterateClusters(self):
+		"""Yield (size, hash value, sorted list of paths) of the clusters of files with the same content, the largest files first."""
+		for size in sorted(self.filesBySize, reverse=True):
+			files = self.filesBySize.pop(size)
+			if len(files) < 2:
+				continue
+			candidateGroups = [(None, files)]
+			if size > 2 * self.sampleSize:
+				# for smaller files the partial digest would read the whole file, they are hashed whole right away
+				candidateGroups = self.groupFiles(files, self.getPartialDigest, size)
+			clusters = []
+			for partialDigest, candidates in candidateGroups:
+				for fileHash, group in self.groupFiles(candidates, self.getFullDigest, size):
+					clusters.append((fileHash, sorted([path for paths in group.itervalues() for path in paths], key=self.recordDirInfo.returnJustUnicodeValue)))
+			for fileHash, paths in sorted(clusters):
+				self.statistics['clusters'] += 1
+				self.statistics['duplicates'] += len(paths)
+				yield size, fileHash, paths
+	
+	def getStatistics(self):
+		"""Return dict of numbers of the files and bytes found and read and of the clusters and the files in them."""
+		return self.statistics
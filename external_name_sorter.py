@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: external_name_sorter
+   :platform: Windows, Unix, others
+   :synopsis: Classes that sort and hold names of directory entries in bounded memory.
+
+.. moduleauthor:: František Brožka
+
+Class that sorts names of entries of very large directories by external merge sort and class that holds a list of names in a temporary file when it grows too long,
+so the memory used while walking a directory does not depend on the number of it's entries.
+Names are unicode or byte strings (names that cannot be decoded), the type is kept in the temporary files, the names are separated by the null character which cannot be a part of a name.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import heapq
+import io
+import os
+import tempfile
+
+def writeNames(f, names):
+	"""Write the names into the binary file f, unicode names are utf-8 encoded and prefixed with 'u', byte string names are prefixed with 'b'."""
+	for name in names:
+		if type(name) == unicode:
+			f.write(''.join(('u', name.encode('utf-8'), '\x00')))
+		else:
+			f.write(''.join(('b', name, '\x00')))
+
+def readNames(path, blockSize=16384):
+	"""Yield the names written by writeNames() into the file, names of one block are held in memory at once."""
+	with io.open(path, 'rb', buffering=blockSize) as f:
+		rest = ''
+		while True:
+			block = f.read(blockSize)
+			if not block:
+				break
+			items = ''.join((rest, block)).split('\x00')
+			rest = items.pop()
+			for item in items:
+				if item[0] == 'u':
+					yield item[1:].decode('utf-8')
+				else:
+					yield item[1:]
+
+class ExternalNameSorter():
+	"""
+	Sort names by getSortKey(name), at most chunkSize names are held in memory.
+	Names are sorted in memory if there are at most chunkSize of them, otherwise the sorted chunks are written into temporary files and merged.
+	At most maxMergedChunks chunk files are merged at once (each with a read buffer of readBlockSize bytes), more chunk files are merged in several passes,
+	so the memory used does not grow with the number of names.
+	"""
+	
+	def __init__(self, getSortKey, chunkSize=100000, tempDir=None, maxMergedChunks=32, readBlockSize=16384):
+		self.getSortKey = getSortKey
+		self.chunkSize = chunkSize
+		self.tempDir = tempDir
+		self.maxMergedChunks = maxMergedChunks
+		self.readBlockSize = readBlockSize
+		self.numberOfChunkFiles = 0
+	
+	def writeChunk(self, chunk):
+		chunk.sort(key=self.getSortKey)
+		return self.writeChunkFile(chunk)
+	
+	def writeChunkFile(self, names):
+		fileDescriptor, path = tempfile.mkstemp(prefix="recorddirinfo_names_", dir=self.tempDir)
+		with io.open(fileDescriptor, 'wb', buffering=1048576) as f:
+			writeNames(f, names)
+		self.numberOfChunkFiles += 1
+		return path
+	
+	def readChunk(self, path, chunkIndex):
+		"""Yield (sort key, chunk index, position, name) for the names of the chunk file, the index and the position keep the merge stable and names of different types are never compared."""
+		for i, name in enumerate(readNames(path, self.readBlockSize)):
+			yield self.getSortKey(name), chunkIndex, i, name
+	
+	def removeChunkFiles(self, chunkPaths):
+		for path in chunkPaths:
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+	
+	def mergeChunks(self, chunkPaths):
+		try:
+			for item in heapq.merge(*[self.readChunk(path, i) for i, path in enumerate(chunkPaths)]):
+				yield item[3]
+		finally:
+			self.removeChunkFiles(chunkPaths)
+	
+	def sortNames(self, names):
+		"""Return iterator of the names sorted, names with the same sort key are in the order they were given. All the names are read (and the chunks written) before this method returns."""
+		chunkPaths = []
+		mergedPaths = []
+		chunk = []
+		try:
+			for name in names:
+				chunk.append(name)
+				if len(chunk) >= self.chunkSize:
+					chunkPaths.append(self.writeChunk(chunk))
+					chunk = []
+			if chunkPaths and chunk:
+				chunkPaths.append(self.writeChunk(chunk))
+				chunk = []
+			while len(chunkPaths) > self.maxMergedChunks:
+				# merge neighbouring chunks so that names with the same sort key stay in the given order
+				while chunkPaths:
+					group = chunkPaths[:self.maxMergedChunks]
+					del chunkPaths[:self.maxMergedChunks]
+					mergedPaths.append(self.writeChunkFile(self.mergeChunks(group)))
+				chunkPaths = mergedPaths
+				mergedPaths = []
+		except Exception:
+			self.removeChunkFiles(chunkPaths + mergedPaths)
+			raise
+		if not chunkPaths:
+			chunk.sort(key=self.getSortKey)
+			return iter(chunk)
+		return self.mergeChunks(chunkPaths)
+
+class SpooledNameList():
+	"""List of names that can only be appended to and iterated once, when it holds more than maxNamesInMemory names they are moved into a temporary file."""
+	
+	def __init__(self, maxNamesInMemory=100000, tempDir=None, readBlockSize=16384):
+		self.maxNamesInMemory = maxNamesInMemory
+		self.tempDir = tempDir
+		self.readBlockSize = readBlockSize
+		self.names = []
+		self.filePath = None
+		self.file = None
+	
+	def append(self, name):
+		self.names.append(name)
+		if len(self.names) > self.maxNamesInMemory:
+			if self.file is None:
+				fileDescriptor, self.filePath = tempfile.mkstemp(prefix="recorddirinfo_names_", dir=self.tempDir)
+				self.file = io.open(fileDescriptor, 'wb', buffering=1048576)
+			writeNames(self.file, self.names)
+			self.names = []
+	
+	def __iter__(self):
+		"""Yield the names in the order they were appended, the temporary file is removed when all the names are read."""
+		try:
+			if not self.file is None:
+				self.file.close()
+				self.file = None
+				for name in readNames(self.filePath, self.readBlockSize):
+					yield name
+			for name in self.names:
+				yield name
+		finally:
+			self.close()
+	
+	def close(self):
+		if not self.file is None:
+			self.file.close()
+			self.file = None
+		if not self.filePath is None:
+			try:
+				os.remove(self.filePath)
+			except OSError:
+				pass
+			self.filePath = None
+		self.names = []
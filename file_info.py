@@ -36,13 +36,24 @@ import grp
 import os
 import pwd
 import stat
+import time
+
+import hash_cache_sqlite
 
 class FileInfo():
 	#TODO: put this class into a separate my-project and git repo
 	
+	# cache of user and group names by id shared by all instances, None is cached for ids without a name so they are looked up only once
+	userNames = {}
+	groupNames = {}
+	nameCacheStatistics = {'hits': 0, 'misses': 0}
+	
 	def __init__(self, topDir, doComputeHash, hashType, doGetCreationTime=True, doGetLinkTargets=True):
 		self.topDir = topDir
 		self.doComputeHash = doComputeHash
+		self.hashType = hashType
+		self.hashCache = None
+		self.statistics = None
 		self.initHashingProcessor(doComputeHash, hashType)
 		self.doGetCreationTime = doGetCreationTime
 		self.initCreationTimeProcessor(doGetCreationTime, topDir)
@@ -57,6 +68,10 @@ class FileInfo():
 		"""Can be hidden by subclass."""
 		self.hashingProcessor = None
 	
+	def createHashingProcessor(self, hashType):
+		"""Can be hidden by subclass. Return a new hashing processor or None if hashing is not available."""
+		return None
+	
 	def initLinkProcessor(self, doGetLinkTargets):
 		self.linkTargetProcessor = None
 	
@@ -66,6 +81,53 @@ class FileInfo():
 	def getFileHashFromProcessor(self, path):
 		return self.returnUnsetValue()
 	
+	def setHashCache(self, hashCache):
+		"""Set hash_cache_sqlite.HashCacheSqlite instance (or None) that is looked into before hash value of a file is computed."""
+		self.hashCache = hashCache
+	
+	def setStatistics(self, statistics):
+		"""Set progress_statistics.ProgressStatistics instance (or None) counting the work and measuring the time of the stages."""
+		self.statistics = statistics
+	
+	def getHashCacheKey(self):
+		"""Return key of the current path in the hash cache or None if there is no hash cache."""
+		if self.hashCache is None or not self.completeStatResult():
+			return None
+		return hash_cache_sqlite.getCacheKey(self.osStatResult, self.hashType)
+	
+	def completeStatResult(self):
+		"""Lstat the current path if only the info returned by os.scandir is known. Return False if the lstat failed."""
+		try:
+			if not self.isStatResultComplete:
+				self.osStatResult = os.lstat(self.path)
+				self.isStatResultComplete = True
+		except OSError:
+			return False
+		return True
+	
+	def getDevice(self):
+		"""Return device number (st_dev) of the current path or None if the lstat failed."""
+		if not self.completeStatResult():
+			return None
+		return self.osStatResult.st_dev
+	
+	def getHardLinkKey(self):
+		"""Return (device, inode number) of the current path if it is a regular file with more than one link, None otherwise."""
+		if not self.isRegularFile() or not self.completeStatResult() or self.osStatResult.st_nlink < 2:
+			return None
+		return (self.osStatResult.st_dev, self.osStatResult.st_ino)
+	
+	def setFileHashInCache(self, path, cacheKey, fileHash):
+		"""Remember the hash value computed for the file in the hash cache if the file did not change while it was being read."""
+		if cacheKey is None or fileHash is None:
+			return
+		try:
+			if hash_cache_sqlite.getCacheKey(os.lstat(path), self.hashType) != cacheKey:
+				return
+		except OSError:
+			return
+		self.hashCache.setFileHash(cacheKey, fileHash)
+	
 	def setPathAndAllInfo(self, path):
 		self.setPathAndOnlyStat(path)
 		self.setAddinionalInfo()
@@ -74,14 +136,51 @@ class FileInfo():
 		self.path = path
 		self.osStatResult = os.lstat(path)
 		self.st_mode = self.osStatResult.st_mode
+		self.isStatResultComplete = True
 		self.creationTime = None
 		self.fileHash = None
 		self.linkTarget = None
 	
-	def setAddinionalInfo(self):
+	def setPathFromDirEntry(self, path, dirEntry):
+		"""Set the path using file type and inode number of the entry returned by os.scandir, without lstat if possible. Only file type and inode number are available then, isStatResultComplete is False."""
+		try:
+			if dirEntry.is_symlink():
+				fileType = stat.S_IFLNK
+			elif dirEntry.is_dir(follow_symlinks=False):
+				fileType = stat.S_IFDIR
+			elif dirEntry.is_file(follow_symlinks=False):
+				fileType = stat.S_IFREG
+			else:
+				# the entry does not tell other file types apart
+				return self.setPathAndOnlyStat(path)
+			inodeNumber = dirEntry.inode()
+		except OSError:
+			return self.setPathAndOnlyStat(path)
+		self.path = path
+		self.osStatResult = (fileType, inodeNumber, None, None, None, None, None, None, None, None)
+		self.st_mode = fileType
+		self.isStatResultComplete = False
+		self.creationTime = None
+		self.fileHash = None
+		self.linkTarget = None
+	
+	def setAddinionalInfo(self, fileHash=None):
+		"""Set creation time, hash value and link target of the path. If fileHash is given, it is used instead of computing the hash value."""
+		statistics = self.statistics
+		if not statistics is None:
+			startTime = time.time()
 		self.creationTime = self.getCreationTimeFromProcessor()
-		self.fileHash = self.getFileHashFromProcessor(self.path)
+		if not statistics is None:
+			startTime = statistics.addStageTime("crtime", startTime)
+		if fileHash is None:
+			self.fileHash = self.getFileHashFromProcessor(self.path)
+			if not statistics is None:
+				startTime = statistics.addStageTime("hash", startTime)
+		else:
+			self.fileHash = fileHash
 		self.linkTarget = self.getLinkTargetFromProcessor(self.path)
+		if not statistics is None:
+			statistics.addStageTime("link_target", startTime)
 	
 	def getFileHash(self):
 		return self.fileHash
@@ -128,10 +227,19 @@ class FileInfo():
 	def getUserName(self):
 		uid = self.getUserID()
 		try:
-			userInfo = pwd.getpwuid(uid)
+			name = self.userNames[uid]
 		except KeyError:
+			self.nameCacheStatistics['misses'] += 1
+			try:
+				name = pwd.getpwuid(uid)[0]
+			except KeyError:
+				name = None
+			self.userNames[uid] = name
+		else:
+			self.nameCacheStatistics['hits'] += 1
+		if name is None:
 			return self.returnUnsetValue()
-		return userInfo[0]
+		return name
 	
 	def getGroupID(self):
 		return self.osStatResult[stat.ST_GID]
@@ -139,10 +247,26 @@ class FileInfo():
 	def getGroupName(self):
 		gid = self.getGroupID()
 		try:
-			groupInfo = grp.getgrgid(gid)
+			name = self.groupNames[gid]
 		except KeyError:
+			self.nameCacheStatistics['misses'] += 1
+			try:
+				name = grp.getgrgid(gid)[0]
+			except KeyError:
+				name = None
+			self.groupNames[gid] = name
+		else:
+			self.nameCacheStatistics['hits'] += 1
+		if name is None:
 			return self.returnUnsetValue()
-		return groupInfo[0]
+		return name
+	
+	def preloadNames(self):
+		"""Fill the cache of user and group names with all the users and groups the system can enumerate, so most lookups need no request to the name service."""
+		for userInfo in pwd.getpwall():
+			self.userNames.setdefault(userInfo[2], userInfo[0])
+		for groupInfo in grp.getgrall():
+			self.groupNames.setdefault(groupInfo[2], groupInfo[0])
 	
 	def getNumberOfLinks(self):
 		return self.osStatResult[stat.ST_NLINK]
@@ -156,6 +280,14 @@ class FileInfo():
 	def getCreationTimeFromProcessor(self):
 		return self.returnUnsetValue()
 	
+	def prefetchCreationTimes(self, paths):
+		"""Can be hidden by subclass. Obtain creation times of all the paths at once, e.g. for all the entries of a directory, before the paths are set one by one."""
+		pass
+	
+	def close(self):
+		"""Can be hidden by subclass. Release resources held by the processors, e.g. running external processes."""
+		pass
+	
 	def getAccessTime(self):
 		return self.osStatResult[stat.ST_ATIME]
 	
@@ -37,24 +37,41 @@ import subprocess
 import stat
 
 import crtime_ext4_inode_unix_utility1
+import crtime_statx_unix
 import file_info
+import hash_file_hashlib
 import hash_file_unix
+import link_target_os
 import link_target_unix_utility1
+import mount_table
 
 class FileInfoUnix(file_info.FileInfo):
 	
 	def initCreationTimeProcessor(self, doGetCreationTime, topDir):
-		# now find out what filesystem the top directory is in so we can decide if we can obtain creation time, if top dir is on ext4 filesystem then we can obtain crtime
+		# creation times are obtained by statx, files on ext4 filesystems statx reports no birth time for get their "crtime" by debugfs,
+		# the filesystem of a device is looked up in the mount table when the first path of the device statx reports no birth time for is seen
 		self.creationTimeProcessor = None
-		self._getCreationTime = self.returnUnsetValue
+		self.creationTimeProcessors = {}
+		self.mountTable = mount_table.getMountTable()
+		self.prefetchedCreationTimes = {}
+		self.birthTimeProcessor = None
 		if not doGetCreationTime:
 			return
-		filesystemType = self.getFilesystemType(topDir)
-		if filesystemType == 'ext4': # TODO: find out other (unix and other) filesystems that have "crtime" and that is obtainable by my script that is using debugfs
+		try:
+			self.birthTimeProcessor = crtime_statx_unix.CrtimeStatxUnix()
+		except OSError:
+			self.birthTimeProcessor = None
+	
+	def getCreationTimeProcessorOfDevice(self, device, path):
+		"""Return debugfs creation time processor of the device or None, it is created when the first path of the device creation time is not obtained by statx for is seen."""
+		if device in self.creationTimeProcessors:
+			return self.creationTimeProcessors[device]
+		processor = None
+		mount = self.mountTable.getMount(device, path)
+		if not mount is None and mount.filesystemType == 'ext4': # TODO: find out other (unix and other) filesystems that have "crtime" and that is obtainable by my script that is using debugfs
 			if os.getenv("USER") == 'root':
 				try:
-					self.creationTimeProcessor = crtime_ext4_inode_unix_utility1.CrtimeExt4InodeUnixUtility1(self.getDeviceName(topDir))
-					self._getCreationTime = self.creationTimeProcessor.getCreationTime
+					processor = crtime_ext4_inode_unix_utility1.CrtimeExt4InodeUnixUtility1(mount.source)
 				except subprocess.CalledProcessError:
 					# TODO: log warning "either debugfs or interpreter ruby/python.....  was not found on your system, therefore creation time will not be outputed/recorded for any file"  or raise an Exception and terminate application
 					pass
@@ -62,63 +79,164 @@ class FileInfoUnix(file_info.FileInfo):
 				pass # TODO: log warning "script is not executed with root privileges for dir topDir therefore creation time will not be outputed"
 		else:
 			pass # TODO: log warning "getting creation time for filesystem type the directory topDir is on is not implemented or the filesystem type does not support creation time therefore creation time will not be outputed"
+		self.creationTimeProcessors[device] = processor
+		return processor
 	
 	def initHashingProcessor(self, doComputeHash, hashType):
 		if doComputeHash and not hashType is None:
+			self.hashingProcessor = self.createHashingProcessor(hashType)
+		else:
+			self.hashingProcessor = None
+	
+	def createHashingProcessor(self, hashType):
+		try:
+			return hash_file_hashlib.HashFileHashlib(hashType)
+		except ValueError:
+			# hashlib does not know this hash type, try the external <hashType>sum utility
 			try:
-				self.hashingProcessor = hash_file_unix.HashFileUnix(hashType)
+				return hash_file_unix.HashFileUnix(hashType)
 			except subprocess.CalledProcessError:
-				self.hashingProcessor = None
 				# TODO: log warning "hashing utility ..... was not found on your system, therefore hash will not be computed and outputed/recorded for any file"  or raise an Exception and terminate application
-		else:
-			self.hashingProcessor = None
+				return None
 	
 	def initLinkProcessor(self, doGetLinkTargets):
 		self.linkTargetProcessor = None
 		self._getLinkTarget = self.returnUnsetValue
 		if doGetLinkTargets:
 			try:
-				self.linkTargetProcessor = link_target_unix_utility1.LinkTargetUnixUtility1()
-			except subprocess.CalledProcessError:
-				self.linkTargetProcessor = None
-				# TODO: log warning 
-			else:
+				self.linkTargetProcessor = link_target_os.LinkTargetOs()
+			except OSError:
+				try:
+					self.linkTargetProcessor = link_target_unix_utility1.LinkTargetUnixUtility1()
+				except subprocess.CalledProcessError:
+					self.linkTargetProcessor = None
+					# TODO: log warning 
+			if not self.linkTargetProcessor is None:
 				self._getLinkTarget = self.linkTargetProcessor.getLinkTarget
 	
 	def getCreationTimeFromProcessor(self):
+		# statx is called only for paths debugfs has not obtained the creation time for already, so each path costs one system call besides the lstat
+		if not self.doGetCreationTime or not self.completeStatResult():
+			return self.returnUnsetValue()
+		key = (self.osStatResult.st_dev, self.osStatResult.st_ino)
+		if key in self.prefetchedCreationTimes:
+			return self.prefetchedCreationTimes.pop(key)
+		if not self.birthTimeProcessor is None:
+			creationTime = self.birthTimeProcessor.getCreationTime(self.path)
+			if not creationTime is None:
+				return creationTime
+		processor = self.getCreationTimeProcessorOfDevice(self.osStatResult.st_dev, self.path)
+		if processor is None:
+			return self.returnUnsetValue()
+		if not self.statistics is None:
+			self.statistics.count("subprocess_calls")
 		try:
-			return self._getCreationTime(self.getInodeNumber())
+			return processor.getCreationTime(self.osStatResult.st_ino)
 		except subprocess.CalledProcessError as e:
+			if not self.statistics is None:
+				self.statistics.count("errors")
 			return self.returnUnsetValue()
 	
+	def prefetchCreationTimes(self, paths):
+		"""Obtain creation times of the paths (the entries of a directory) by debugfs at once if the directory is on a device creation times are obtained by debugfs for."""
+		self.prefetchedCreationTimes = {}
+		if not self.doGetCreationTime or not paths:
+			return
+		directory = os.path.dirname(paths[0])
+		try:
+			device = os.lstat(directory).st_dev
+		except OSError:
+			return
+		if not self.birthTimeProcessor is None and not device in self.creationTimeProcessors:
+			# statx has obtained creation times of all paths of the device seen so far, debugfs is not started for the device
+			return
+		processor = self.getCreationTimeProcessorOfDevice(device, directory)
+		if processor is None:
+			return
+		inodeNumbers = []
+		for path in paths:
+			try:
+				osStatResult = os.lstat(path)
+			except OSError:
+				continue
+			if osStatResult.st_dev == device:
+				inodeNumbers.append(osStatResult.st_ino)
+		if not self.statistics is None:
+			self.statistics.count("subprocess_calls")
+		try:
+			creationTimes = processor.getCreationTimes(inodeNumbers)
+		except subprocess.CalledProcessError:
+			if not self.statistics is None:
+				self.statistics.count("errors")
+			return
+		for inodeNumber, creationTime in creationTimes.iteritems():
+			self.prefetchedCreationTimes[(device, inodeNumber)] = creationTime
+	
+	def close(self):
+		for processor in self.creationTimeProcessors.itervalues():
+			if not processor is None:
+				processor.close()
+		self.creationTimeProcessors = {}
+	
 	def getFilesystemType(self, path):
-		filesystemType = None
-		p = subprocess.Popen(["df", "-T", path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-		if p.wait() == 0:
-			filesystemType = p.stdout.read().split('\n')[1].split()[1]
-		return filesystemType
+		"""Return type of the filesystem the path is on or None if it is not known."""
+		try:
+			mount = self.mountTable.getMount(os.lstat(path).st_dev, path)
+		except OSError:
+			return None
+		if mount is None:
+			return None
+		return mount.filesystemType
 	
 	def getDeviceName(self, path):
-		deviceName = None
-		p = subprocess.Popen(["df", path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-		if p.wait() == 0:
-			deviceName = p.stdout.read().split('\n')[1].split()[0]
-		return deviceName
-
+		"""Return the device (source of the mount) the path is on or None if it is not known."""
+		try:
+			mount = self.mountTable.getMount(os.lstat(path).st_dev, path)
+		except OSError:
+			return None
+		if mount is None:
+			return None
+		return mount.source
+	
 	def getChangedTime(self):
 		return self.osStatResult[stat.ST_CTIME]
 	
 	def getFileHashFromProcessor(self, path):
-		if self.doComputeHash and self.isRegularFile():
+		if self.doComputeHash and self.isRegularFile() and not self.hashingProcessor is None:
+			cacheKey = self.getHashCacheKey()
+			if not cacheKey is None:
+				fileHash = self.hashCache.getFileHash(cacheKey)
+				if not fileHash is None:
+					return fileHash
 			try:
-				return self.hashingProcessor.getFileHash(path)
-			except subprocess.CalledProcessError:
+				fileHash = self.hashingProcessor.getFileHash(path)
+			except (subprocess.CalledProcessError, IOError, OSError):
+				if not self.statistics is None:
+					self.statistics.count("errors")
 				return self.returnUnsetValue()
+			if not self.statistics is None:
+				self.countHashedFile()
+			self.setFileHashInCache(path, cacheKey, fileHash)
+			return fileHash
 		else:
 			return self.returnUnsetValue()
 	
+	def countHashedFile(self):
+		"""Count the current path as a file hashed by the hashing processor (and the call of the hashing utility if it is used)."""
+		self.statistics.count("files_hashed")
+		if self.completeStatResult():
+			self.statistics.count("bytes_hashed", self.osStatResult.st_size)
+		if isinstance(self.hashingProcessor, hash_file_unix.HashFileUnix):
+			self.statistics.count("subprocess_calls")
+	
 	def getLinkTargetFromProcessor(self, path):
+		if not self.isSymbolicLink():
+			return self.returnUnsetValue()
+		if not self.statistics is None and isinstance(self.linkTargetProcessor, link_target_unix_utility1.LinkTargetUnixUtility1):
+			self.statistics.count("subprocess_calls")
 		try:
 			return self._getLinkTarget(path)
-		except subprocess.CalledProcessError:
+		except (subprocess.CalledProcessError, OSError):
+			if not self.statistics is None:
+				self.statistics.count("errors")
 			return self.returnUnsetValue()
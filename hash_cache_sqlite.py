@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: hash_cache_sqlite
+   :platform: Windows, Unix, others
+   :synopsis: Class that remembers hash values of files in a SQLite database.
+
+.. moduleauthor:: František Brožka
+
+Class that remembers hash values of files in a SQLite database shared by all runs of the script on the host.
+A hash value is identified by device and inode number of the file and hash type and it is valid while size, time of last modification and time of last change of the file are the same.
+The database is in WAL mode so concurrent runs read it without waiting, writes are batched into transactions.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import sqlite3
+import time
+
+def getTimeNs(osStatResult, attributeName):
+	"""Return time of the stat result in nanoseconds, st_mtime_ns etc. is not available on python 2.7 so it is computed from the float time."""
+	timeNs = getattr(osStatResult, ''.join((attributeName, '_ns')), None)
+	if timeNs is None:
+		timeNs = int(getattr(osStatResult, attributeName) * 1000000000)
+	return timeNs
+
+def getCacheKey(osStatResult, hashType):
+	"""Return tuple (device, inode, size, mtime_ns, ctime_ns, hash type) identifying the content of the file of the stat result."""
+	return (osStatResult.st_dev, osStatResult.st_ino, osStatResult.st_size, getTimeNs(osStatResult, 'st_mtime'), getTimeNs(osStatResult, 'st_ctime'), hashType)
+
+class HashCacheSqlite():
+	
+	def __init__(self, databasePath, maxEntries=None, batchSize=1000, timeout=60.0):
+		self.databasePath = databasePath
+		self.maxEntries = maxEntries
+		self.batchSize = batchSize
+		# entries used by this run are marked with the start time of the run, the entries not seen for the longest time are evicted first
+		self.scanTime = int(time.time())
+		self.statistics = {'hits': 0, 'misses': 0}
+		self.pendingEntries = {}
+		self.pendingSeenKeys = []
+		self.connection = sqlite3.connect(databasePath, timeout=timeout, isolation_level=None)
+		self.connection.text_factory = str
+		self.connection.execute("PRAGMA journal_mode=WAL")
+		self.connection.execute("PRAGMA synchronous=NORMAL")
+		self.connection.execute("CREATE TABLE IF NOT EXISTS hashes (device INTEGER NOT NULL, inode INTEGER NOT NULL, hash_type TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, ctime_ns INTEGER NOT NULL, hash TEXT NOT NULL, last_seen INTEGER NOT NULL, PRIMARY KEY (device, inode, hash_type))")
+		self.connection.execute("CREATE INDEX IF NOT EXISTS hashes_last_seen ON hashes (last_seen)")
+	
+	def getFileHash(self, cacheKey):
+		"""Return the remembered hash value of the file identified by cacheKey (see getCacheKey()) or None if it is not known or the file changed since."""
+		device, inode, size, mtimeNs, ctimeNs, hashType = cacheKey
+		entry = self.pendingEntries.get((device, inode, hashType))
+		if entry is None:
+			entry = self.connection.execute("SELECT size, mtime_ns, ctime_ns, hash FROM hashes WHERE device = ? AND inode = ? AND hash_type = ?", (device, inode, hashType)).fetchone()
+			if not entry is None and entry[:3] == (size, mtimeNs, ctimeNs):
+				self.pendingSeenKeys.append((self.scanTime, device, inode, hashType))
+		if entry is None or entry[:3] != (size, mtimeNs, ctimeNs):
+			self.statistics['misses'] += 1
+			return None
+		self.statistics['hits'] += 1
+		if len(self.pendingSeenKeys) >= self.batchSize:
+			self.commit()
+		return entry[3]
+	
+	def setFileHash(self, cacheKey, fileHash):
+		"""Remember the hash value of the file identified by cacheKey, it is written into the database with the next batch."""
+		device, inode, size, mtimeNs, ctimeNs, hashType = cacheKey
+		self.pendingEntries[(device, inode, hashType)] = (size, mtimeNs, ctimeNs, fileHash)
+		if len(self.pendingEntries) >= self.batchSize:
+			self.commit()
+	
+	def commit(self):
+		"""Write the remembered hash values and the times the entries were seen in one transaction."""
+		if not self.pendingEntries and not self.pendingSeenKeys:
+			return
+		entries = [(device, inode, hashType, size, mtimeNs, ctimeNs, fileHash, self.scanTime) for (device, inode, hashType), (size, mtimeNs, ctimeNs, fileHash) in self.pendingEntries.iteritems()]
+		seenKeys = self.pendingSeenKeys
+		self.pendingEntries = {}
+		self.pendingSeenKeys = []
+		try:
+			self.connection.execute("BEGIN IMMEDIATE")
+			try:
+				self.connection.executemany("INSERT OR REPLACE INTO hashes (device, inode, hash_type, size, mtime_ns, ctime_ns, hash, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", entries)
+				self.connection.executemany("UPDATE hashes SET last_seen = ? WHERE device = ? AND inode = ? AND hash_type = ?", seenKeys)
+			except sqlite3.Error:
+				self.connection.execute("ROLLBACK")
+				raise
+			self.connection.execute("COMMIT")
+		except sqlite3.OperationalError:
+			# the database stayed locked by another run for longer than the timeout, the cache is only an optimization so the batch is dropped
+			pass
+	
+	def evict(self, maxEntries=None):
+		"""Delete the entries not seen for the longest time so that at most maxEntries (defaults to the maxEntries given to the constructor) entries remain. Return number of deleted entries."""
+		if maxEntries is None:
+			maxEntries = self.maxEntries
+		if maxEntries is None:
+			return 0
+		self.commit()
+		self.connection.execute("BEGIN IMMEDIATE")
+		numberOfEntries = self.connection.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+		numberOfEvicted = max(0, numberOfEntries - maxEntries)
+		if numberOfEvicted > 0:
+			self.connection.execute("DELETE FROM hashes WHERE rowid IN (SELECT rowid FROM hashes ORDER BY last_seen LIMIT ?)", (numberOfEvicted,))
+		self.connection.execute("COMMIT")
+		return numberOfEvicted
+	
+	def compact(self, maxEntries=None):
+		"""Evict the entries over maxEntries, then rebuild the database file so it does not contain free pages and truncate the write-ahead log. Return number of deleted entries."""
+		numberOfEvicted = self.evict(maxEntries)
+		self.connection.execute("VACUUM")
+		self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+		return numberOfEvicted
+	
+	def getStatistics(self):
+		"""Return tuple (hits, misses) of the lookups of this run."""
+		return self.statistics['hits'], self.statistics['misses']
+	
+	def close(self):
+		try:
+			self.commit()
+			try:
+				self.evict()
+			except sqlite3.OperationalError:
+				pass # the database is locked by another run, it will be evicted by a later run
+		finally:
+			self.connection.close()
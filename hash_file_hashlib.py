@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: hash_file_hashlib
+   :platform: Windows, Unix, others
+   :synopsis: Class that provides hash sum for a file using python module hashlib.
+
+.. moduleauthor:: František Brožka
+
+Class that provides hash sum for a file using python module hashlib.
+The file is read in place into one preallocated buffer that is reused for every file, so no external process is started per file.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import hashlib
+import io
+
+import hash_file
+
+class HashFileHashlib(hash_file.HashFile):
+	
+	def __init__(self, hashType="sha1", bufferSize=1048576):
+		self.bufferSize = bufferSize
+		hash_file.HashFile.__init__(self, hashType)
+	
+	def setAttributes(self, hashType="sha1"):
+		# raises ValueError if the hash type is not supported by hashlib
+		hashlib.new(hashType)
+		self.hashType = hashType
+		self.buffer = bytearray(self.bufferSize)
+		self.bufferView = memoryview(self.buffer)
+	
+	def getFileHash(self, path):
+		"""Return hexadecimal digest of the file, the same string as printed by the <hashType>sum utility. Raises IOError if the file cannot be read."""
+		h = hashlib.new(self.hashType)
+		view = self.bufferView
+		with io.open(path, 'rb', buffering=0) as f:
+			readinto = f.readinto
+			update = h.update
+			n = readinto(view)
+			while n:
+				update(view[:n])
+				n = readinto(view)
+		return h.hexdigest()
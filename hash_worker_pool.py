@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: hash_worker_pool
+   :platform: Windows, Unix, others
+   :synopsis: Classes that compute hash sums of files in a pool of worker threads.
+
+.. moduleauthor:: František Brožka
+
+Classes that compute hash sums of files in a pool of worker threads.
+Reading files and computing hashes with hashlib releases the interpreter lock, so several files can be read at the same time.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import Queue
+import subprocess
+import threading
+import time
+
+class HashJob():
+	
+	def __init__(self, path, cacheKey=None, size=0):
+		self.path = path
+		self.cacheKey = cacheKey # key of the file in the hash cache, not used by the pool
+		self.size = size # counted as bytes hashed by the statistics of the pool
+		self.isInCache = False # the job can be shared by hard links of the file, the hash value is put into the hash cache once
+		self.fileHash = None
+		self.doneEvent = threading.Event()
+	
+	def isDone(self):
+		return self.doneEvent.is_set()
+	
+	def getFileHash(self):
+		"""Wait until the hash is computed and return it, None is returned if the hash could not be computed."""
+		self.doneEvent.wait()
+		return self.fileHash
+
+class HashWorkerPool():
+	
+	def __init__(self, numberOfWorkers, createHashingProcessor, statistics=None):
+		"""createHashingProcessor is called once for each worker thread, so every thread has it's own hashing processor (and it's own read buffer). Hashed files are counted by statistics (progress_statistics.ProgressStatistics) if given."""
+		self.jobs = Queue.Queue()
+		self.statistics = statistics
+		self.workers = []
+		for i in range(numberOfWorkers):
+			worker = threading.Thread(target=self.work, args=(createHashingProcessor(),))
+			worker.daemon = True
+			worker.start()
+			self.workers.append(worker)
+	
+	def work(self, hashingProcessor):
+		while True:
+			job = self.jobs.get()
+			if job is None:
+				return
+			startTime = time.time()
+			try:
+				job.fileHash = hashingProcessor.getFileHash(job.path)
+			except (subprocess.CalledProcessError, IOError, OSError):
+				job.fileHash = None
+			if not self.statistics is None:
+				self.statistics.addHashedFile(job.size, time.time() - startTime, isError=job.fileHash is None)
+			job.doneEvent.set()
+	
+	def submit(self, path, cacheKey=None, size=0):
+		job = HashJob(path, cacheKey, size)
+		self.jobs.put(job)
+		return job
+	
+	def close(self):
+		for worker in self.workers:
+			self.jobs.put(None)
+		for worker in self.workers:
+			worker.join()
+		self.workers = []
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: link_target_os
+   :platform: Unix, others
+   :synopsis: Class that provides information on a target file path for link file using the system call readlink, without starting an external process.
+
+.. moduleauthor:: František Brožka
+
+Class that provides information on a target file path for link file using the system call readlink, without starting an external process.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import sys
+
+import link_target
+
+class LinkTargetOs(link_target.LinkTarget):
+	
+	def __init__(self):
+		if not hasattr(os, "readlink"):
+			raise OSError("os.readlink is not available on this platform")
+		self.filesystemEncoding = sys.getfilesystemencoding() or 'utf-8'
+	
+	def getLinkTarget(self, path):
+		"""Return the target of the symbolic link as a byte string, so targets that are not valid in the filesystem encoding are kept as they are. Raises OSError if the path is not a symbolic link."""
+		if type(path) == unicode:
+			path = path.encode(self.filesystemEncoding)
+		return os.readlink(path)
@@ -32,17 +32,110 @@ u"""
 
 """
 
+import argparse
+import os
 import sys
 
+import duplicate_finder
+import hash_cache_sqlite
+import output_writer
 import record_dir_info
+import record_file_diff
+
+def compactHashCache(arguments):
+	"""Compact the hash cache given by the command line arguments following the command name compact-hash-cache."""
+	parser = argparse.ArgumentParser(prog=' '.join((sys.argv[0], 'compact-hash-cache')), description="Delete hash values not seen for the longest time from the hash cache (see --hash-cache) and rebuild the database file so it takes as little space as possible.")
+	parser.add_argument('--max-entries', help='Maximal number of hash values kept in the hash cache. By default no hash values are deleted.', metavar='N', type=int, required=False)
+	parser.add_argument('hash_cache_path', help='Path to the hash cache.', metavar='<hash-cache>', type=unicode)
+	arguments = parser.parse_args(arguments)
+	hashCache = hash_cache_sqlite.HashCacheSqlite(arguments.hash_cache_path)
+	try:
+		print "deleted %d hash values" % hashCache.compact(arguments.max_entries)
+	finally:
+		hashCache.close()
+
+def diffRecordFiles(arguments):
+	"""Write differences between two record files given by the command line arguments following the command name diff."""
+	recordfs = record_dir_info.RecordDirInfo()
+	parser = argparse.ArgumentParser(prog=' '.join((sys.argv[0], 'diff')), description="Write paths added, removed, modified and moved between the old and the new record file (possibly compressed). Each difference is written as line '<change>;<info>;<record line>'. <change> is one of: added (info is '-' and the record line is from the new record file), removed (info is '-' and the record line is from the old record file), modified (info is the comma separated format sequences of the fields that differ and the record line is from the new record file), moved (info is the quoted old path and the record line is from the new record file, moved paths are the removed and added paths with the same inode number and hash value). Record files not recorded in the order of paths the application records them (e.g. with top dirs not given in the alphabetical order) are sorted first. Record files recorded with --hard-link-references cannot be compared.")
+	parser.add_argument('-g', '--ignore', help='Format sequence of a field that is not compared. Can be given multiple times. Defaults to %%X (time of last access).', metavar='SEQUENCE', action='append', choices=[sequence for sequence, position in recordfs.formattingSequencesAndPositions if sequence != recordfs.formatSequencePath], required=False)
+	parser.add_argument('--chunk-size', help='Number of record lines sorted in memory when a record file has to be sorted. Defaults to 200000.', metavar='N', default=200000, type=int, required=False)
+	parser.add_argument('old_file_path', help='Path to the old record file.', metavar='<old-record-file>', type=unicode)
+	parser.add_argument('new_file_path', help='Path to the new record file.', metavar='<new-record-file>', type=unicode)
+	parser.add_argument('output_file_path', help='Path to output file, defaults to \'-\' i.e. stdout. The output is compressed if the file name ends with .gz, .bz2 or .xz.', metavar='<output-file>', nargs='?', default=u'-', type=unicode)
+	arguments = parser.parse_args(arguments)
+	if arguments.ignore is None:
+		arguments.ignore = [recordfs.formatSequenceLastAccessTime]
+	if arguments.chunk_size < 1:
+		raise Exception(''.join(("Error. The chunk size has to be a positive number, '", str(arguments.chunk_size), "' given."))) # TODO: define my own subclass of Exception ?
+	for filePath in (arguments.old_file_path, arguments.new_file_path):
+		if not os.path.isfile(filePath):
+			raise Exception(''.join(("Error. The record file '", filePath, "' does not exist."))) # TODO: define my own subclass of Exception ?
+	if arguments.output_file_path != "-" and os.path.exists(arguments.output_file_path):
+		raise Exception(''.join(("Error. The output file '", arguments.output_file_path, "' already exists."))) # TODO: define my own subclass of Exception ?
+	recordFileDiff = record_file_diff.RecordFileDiff(recordfs.createRecordLineParser, recordfs.formattingSequencesAndPositions, ignoredSequences=arguments.ignore, fieldDelimiter=recordfs.fieldDelimiter, commentChars=recordfs.commentChars, quoteChars=recordfs.quoteChars, unsetValueSymbol=recordfs.unsetValueSymbol, encoding=recordfs.defaultEncoding, chunkSize=arguments.chunk_size)
+	if arguments.output_file_path == "-":
+		output = output_writer.OutputWriter(sys.stdout, encoding=sys.stdout.encoding or recordfs.defaultEncoding, lineSeparator=os.linesep, doCloseStream=False)
+	else:
+		output = output_writer.OutputWriter(open(arguments.output_file_path, 'wb'), encoding=recordfs.defaultEncoding, compressionType=output_writer.getCompressionTypeByExtension(arguments.output_file_path))
+	with output:
+		output.writeLine(''.join((recordfs.commentChars, " differences between \"\"\"", arguments.old_file_path, "\"\"\" and \"\"\"", arguments.new_file_path, "\"\"\"")))
+		recordFileDiff.diff(arguments.old_file_path, arguments.new_file_path, output.writeLine)
+	sys.stderr.write("%(added)d added, %(removed)d removed, %(modified)d modified, %(moved)d moved, %(unparsable)d lines not matching the record line format skipped\n" % recordFileDiff.getStatistics())
+
+def findDuplicates(arguments):
+	"""Write clusters of duplicate files of the top dirs given by the command line arguments following the command name dupes."""
+	recordfs = record_dir_info.RecordDirInfo()
+	parser = argparse.ArgumentParser(prog=' '.join((sys.argv[0], 'dupes')), description="Write clusters of regular files with the same content. Files are grouped by size, files of the same size by a digest of their first and last bytes and only the files still in a group are read whole and grouped by their hash value, so usually only a small part of the data is read. Each file of a cluster is written as line '<cluster>;<size>;<hash value>;<quoted path>' where <cluster> is the number of the cluster, the clusters of the largest files are written first. Hard links of a file are listed in it's cluster but a file is not a duplicate of it's own hard links.")
+	parser.add_argument('-a', '--absolute-paths', help='Top dirs command line arguments will be converted to absolute paths.', action='store_true', required=False)
+	parser.add_argument('-e', '--exclude-regex', help='Regular expression to exclude paths from being searched, see the same option of the recording. Can be given multiple times.', metavar='REGEX', type=unicode, action='append', required=False)
+	parser.add_argument('-s', '--hash-type', help='Hash algorithm used to compare the whole files, see the same option of the recording. Defaults to \'sha1\'.', default=u'sha1', type=unicode, required=False)
+	parser.add_argument('--sample-size', help='Number of bytes read from the start and from the end of a file for the partial digest. Files of at most twice this size are compared by the hash value right away. Defaults to 65536.', metavar='BYTES', default=65536, type=int, required=False)
+	parser.add_argument('--min-size', help='Files smaller than this many bytes are not searched. Defaults to 1, i.e. empty files are skipped.', metavar='BYTES', default=1, type=int, required=False)
+	parser.add_argument('-d', '--top-dir', help='Path to top directory that will be searched. Can be given multiple times.', type=str, action='append', required=True)
+	parser.add_argument('output_file_path', help='Path to output file, defaults to \'-\' i.e. stdout. The output is compressed if the file name ends with .gz, .bz2 or .xz.', metavar='<output-file>', nargs='?', default=u'-', type=unicode)
+	arguments = parser.parse_args(arguments)
+	if arguments.sample_size < 1:
+		raise Exception(''.join(("Error. The sample size has to be a positive number, '", str(arguments.sample_size), "' given."))) # TODO: define my own subclass of Exception ?
+	if arguments.output_file_path != "-" and os.path.exists(arguments.output_file_path):
+		raise Exception(''.join(("Error. The output file '", arguments.output_file_path, "' already exists."))) # TODO: define my own subclass of Exception ?
+	recordfs.hashType = arguments.hash_type
+	finder = duplicate_finder.DuplicateFinder(recordfs, sampleSize=arguments.sample_size, minSize=arguments.min_size)
+	finder.walkTopDirs([recordfs.stripTrailingSlash(topDir) for topDir in arguments.top_dir], doOutputAbsolutePaths=arguments.absolute_paths, pathExludeRegexes=arguments.exclude_regex)
+	if arguments.output_file_path == "-":
+		output = output_writer.OutputWriter(sys.stdout, encoding=sys.stdout.encoding or recordfs.defaultEncoding, lineSeparator=os.linesep, doCloseStream=False)
+	else:
+		output = output_writer.OutputWriter(open(arguments.output_file_path, 'wb'), encoding=recordfs.defaultEncoding, compressionType=output_writer.getCompressionTypeByExtension(arguments.output_file_path))
+	with output:
+		output.writeLine(''.join((recordfs.commentChars, " duplicate files in \"\"\"", "\"\"\", \"\"\"".join(arguments.top_dir), "\"\"\"")))
+		for cluster, (size, fileHash, paths) in enumerate(finder.iterateClusters()):
+			for path in paths:
+				output.writeLine(recordfs.fieldDelimiter.join((unicode(cluster + 1), unicode(size), fileHash, recordfs.quotePath(recordfs.returnJustUnicodeValue(path)))))
+	sys.stderr.write("%(clusters)d clusters of %(duplicates)d files, %(bytesRead)d of %(bytes)d bytes of %(files)d files read\n" % finder.getStatistics())
 
 def main():
 	"""Main function of the script. Parse command line arguments, check them, read input csv file correct it and write the corrected csv rows into output csv file."""
+	if len(sys.argv) > 1 and sys.argv[1] == "compact-hash-cache":
+		compactHashCache(sys.argv[2:])
+		sys.exit(0)
+	if len(sys.argv) > 1 and sys.argv[1] == "diff":
+		diffRecordFiles(sys.argv[2:])
+		sys.exit(0)
+	if len(sys.argv) > 1 and sys.argv[1] == "dupes":
+		findDuplicates(sys.argv[2:])
+		sys.exit(0)
 	print "initializing application RecordDirInfo"
 	recordfs = record_dir_info.RecordDirInfo()
 	print "recording is in progress ... this may take a long time, hours or even days, you can terminate the process e.g. by closing the terminal window"
 	recordfs.run()
 	print "success, recording finished succesfully"
+	if not recordfs.arguments.reference is None:
+		print "hash values taken from the reference record file: %d" % recordfs.getNumberOfReusedHashes()
+	if recordfs.getNumberOfHardLinkHashes() > 0:
+		print "hash values taken from previous hard links: %d" % recordfs.getNumberOfHardLinkHashes()
+	if not recordfs.getHashCacheStatistics() is None:
+		print "hash cache: %d hash values found, %d not found" % recordfs.getHashCacheStatistics()
+	print "user and group name lookups: %d cached, %d looked up in the name service" % recordfs.getNameCacheStatistics()
 	sys.exit(0)
 
 
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: mount_table
+   :platform: Linux
+   :synopsis: Class that looks up mounted filesystems by device number.
+
+.. moduleauthor:: František Brožka
+
+Class that reads the mount table of the process from /proc/self/mountinfo once and looks up the mounted filesystems by device number (st_dev of the stat result),
+so the filesystem type and the device of any path can be found without running df.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import collections
+import os
+import re
+
+Mount = collections.namedtuple('Mount', ('device', 'mountPoint', 'filesystemType', 'source'))
+
+# the mount table read by getMountTable()
+mountTable = None
+
+def getMountTable():
+	"""Return MountTable of the process, it is read only once."""
+	global mountTable
+	if mountTable is None:
+		mountTable = MountTable()
+	return mountTable
+
+def unescapeMountInfoField(field):
+	"""Replace the octal escapes (e.g. \\040 for space) of the field of /proc/self/mountinfo by the characters."""
+	return re.sub(r'\\([0-7]{3})', lambda match: chr(int(match.group(1), 8)), field)
+
+class MountTable():
+	
+	def __init__(self, mountInfoPath="/proc/self/mountinfo"):
+		self.mounts = []
+		self.mountsByDevice = {}
+		try:
+			with open(mountInfoPath, 'rb') as f:
+				for line in f:
+					mount = self.parseMountInfoLine(line)
+					if not mount is None:
+						self.mounts.append(mount)
+						# a device mounted more than once (e.g. bind mounts) has the same filesystem, the last mount is kept
+						self.mountsByDevice[mount.device] = mount
+		except IOError:
+			pass # not Linux, no mounts are known
+	
+	def parseMountInfoLine(self, line):
+		"""Return Mount of the line '<mount id> <parent id> <major>:<minor> <root> <mount point> <options> [<optional fields>] - <filesystem type> <source> <super options>' or None if it cannot be parsed."""
+		fields = line.split()
+		try:
+			separator = fields.index('-', 6)
+			major, minor = fields[2].split(':')
+			return Mount(os.makedev(int(major), int(minor)), unescapeMountInfoField(fields[4]), fields[separator + 1], unescapeMountInfoField(fields[separator + 2]))
+		except (ValueError, IndexError):
+			return None
+	
+	def getMount(self, device, path=None):
+		"""
+		Return Mount of the device (st_dev of the stat result) or None if it is not known.
+		Some filesystems (e.g. btrfs subvolumes) report a device number different from the mount table, then the mount with the longest mount point containing the path is returned and remembered for the device.
+		"""
+		mount = self.mountsByDevice.get(device)
+		if mount is None and not path is None:
+			mount = self.getMountOfPath(path)
+			if not mount is None:
+				self.mountsByDevice[device] = mount
+		return mount
+	
+	def getMountOfPath(self, path):
+		"""Return Mount with the longest mount point containing the path or None."""
+		if type(path) == unicode:
+			path = path.encode('utf-8')
+		path = os.path.abspath(path)
+		mount = None
+		for m in self.mounts:
+			if path == m.mountPoint or path.startswith(m.mountPoint.rstrip(os.sep) + os.sep):
+				if mount is None or len(m.mountPoint) >= len(mount.mountPoint):
+					mount = m
+		return mount
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: ordered_shard_writer
+   :platform: Windows, Unix, others
+   :synopsis: Class that writes record lines and shards recorded by worker processes in the order they were added.
+
+.. moduleauthor:: František Brožka
+
+Class that writes record lines and shards recorded by worker processes in the order they were added.
+A shard is a temporary file with record lines of a subtree, it is copied to the output and deleted as soon as all the lines before it are written.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import collections
+import os
+
+class OrderedShardWriter():
+	
+	def __init__(self, writeCallback, maxPendingShards, encoding='utf-8'):
+		self.writeCallback = writeCallback
+		self.maxPendingShards = maxPendingShards
+		self.encoding = encoding
+		self.pending = collections.deque() # items are (isShard, line or asynchronous result returning shard path)
+		self.numberOfPendingShards = 0
+	
+	def writeLine(self, line):
+		if self.pending:
+			self.pending.append((False, line))
+		else:
+			self.writeCallback(line)
+	
+	def addShard(self, asyncResult):
+		self.pending.append((True, asyncResult))
+		self.numberOfPendingShards += 1
+		self.flush(self.maxPendingShards)
+	
+	def flush(self, maxPendingShards=0):
+		"""Write lines and finished shards from the beginning of the queue, wait for unfinished shards while more than maxPendingShards shards are waiting."""
+		while self.pending:
+			isShard, item = self.pending[0]
+			if isShard:
+				if self.numberOfPendingShards <= maxPendingShards and not item.ready():
+					break
+				self.copyShard(item.get())
+				self.numberOfPendingShards -= 1
+			else:
+				self.writeCallback(item)
+			self.pending.popleft()
+	
+	def copyShard(self, shardPath):
+		with open(shardPath, 'rb') as f:
+			for line in f:
+				self.writeCallback(line[:-1].decode(self.encoding))
+		os.remove(shardPath)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: output_writer
+   :platform: Windows, Unix, others
+   :synopsis: Class that writes record lines into a file or terminal through a large buffer, optionally compressed.
+
+.. moduleauthor:: František Brožka
+
+Class that writes record lines into a file or terminal through a large buffer, optionally compressed.
+The buffer is written when it is full or when it was not written for a given time, so a reader of the output still sees the recording progress.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import bz2
+import os
+import time
+import zlib
+
+try:
+	import lzma
+except ImportError:
+	try:
+		from backports import lzma # the backports.lzma package from PyPI for python 2.7
+	except ImportError:
+		lzma = None
+
+compressionTypes = ("gzip", "bz2", "xz")
+compressionTypesByExtension = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz"}
+
+def getCompressionTypeByExtension(path):
+	"""Return compression type for the extension of the file name or None if the file should not be compressed."""
+	return compressionTypesByExtension.get(os.path.splitext(path)[1].lower())
+
+def createCompressor(compressionType):
+	"""Return object with methods compress(data) and flush() producing a complete file of the compression type, files of the same type can be concatenated."""
+	if compressionType == "gzip":
+		return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+	elif compressionType == "bz2":
+		return bz2.BZ2Compressor(9)
+	elif compressionType == "xz":
+		if lzma is None:
+			raise Exception("Error. Compression type 'xz' needs python module lzma (on python 2.7 install the package backports.lzma).") # TODO: define my own subclass of Exception ?
+		return lzma.LZMACompressor()
+	raise Exception(''.join(("Error. Unknown compression type '", compressionType, "'."))) # TODO: define my own subclass of Exception ?
+
+class OutputWriter():
+	
+	def __init__(self, stream, encoding='utf-8', lineSeparator='\n', compressionType=None, bufferSize=1048576, flushInterval=1.0, syncEveryBytes=None, doSyncAtEnd=False, doCloseStream=True):
+		self.stream = stream
+		self.encoding = encoding
+		self.lineSeparator = lineSeparator
+		self.compressor = None
+		if not compressionType is None:
+			self.compressor = createCompressor(compressionType)
+		self.bufferSize = bufferSize
+		self.flushInterval = flushInterval
+		self.syncEveryBytes = syncEveryBytes
+		self.doSyncAtEnd = doSyncAtEnd
+		self.doCloseStream = doCloseStream
+		self.lines = []
+		self.bufferedBytes = 0
+		self.bytesSinceSync = 0
+		self.lastFlushTime = time.time()
+	
+	def __enter__(self):
+		return self
+	
+	def __exit__(self, excType, excValue, traceback):
+		self.close()
+	
+	def writeLine(self, line):
+		if type(line) == unicode:
+			line = line.encode(self.encoding)
+		self.lines.append(line)
+		self.bufferedBytes += len(line)
+		if self.bufferedBytes >= self.bufferSize:
+			self.flush()
+		elif time.time() - self.lastFlushTime >= self.flushInterval:
+			self.flush()
+	
+	def flush(self):
+		"""Write the buffered lines to the stream."""
+		self.lastFlushTime = time.time()
+		if not self.lines:
+			return
+		self.lines.append('')
+		data = self.lineSeparator.join(self.lines)
+		self.lines = []
+		self.bufferedBytes = 0
+		if not self.compressor is None:
+			data = self.compressor.compress(data)
+		self.stream.write(data)
+		self.stream.flush()
+		self.bytesSinceSync += len(data)
+		if not self.syncEveryBytes is None and self.bytesSinceSync >= self.syncEveryBytes:
+			self.sync()
+	
+	def sync(self):
+		os.fsync(self.stream.fileno())
+		self.bytesSinceSync = 0
+	
+	def close(self):
+		self.flush()
+		if not self.compressor is None:
+			self.stream.write(self.compressor.flush())
+			self.compressor = None
+		self.stream.flush()
+		if self.doSyncAtEnd:
+			self.sync()
+		if self.doCloseStream:
+			self.stream.close()
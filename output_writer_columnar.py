@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: output_writer_columnar
+   :platform: Windows, Unix, others
+   :synopsis: Class that writes the recording into a binary file of column blocks.
+
+.. moduleauthor:: František Brožka
+
+Class that writes the recording into a compact binary file of blocks of records stored by columns, see columnar_file_reader for reading it.
+
+The file starts with the magic bytes 'RDICOLS1' followed by blocks, each block holds up to blockSize records. All numbers are little-endian.
+A block consists of the data of the columns followed by the footer and the trailer:
+	data .. the parts of the columns, one after another ;
+	footer .. number of records (uint32), number of columns (uint32), for each column it's format sequence (2 bytes), kind (1 byte), number of parts (uint8) and offset and length in the block of each part (uint64, uint64),
+		the info lines are stored as the column '#' ;
+	trailer .. length of the block including the trailer (uint64), length of the footer (uint32) and the magic bytes 'RDIB'.
+The blocks are found from the end of the file by the trailers, so a reader can memory map the file and read any column of any block without decoding the others.
+
+Kinds of columns and their parts:
+	int64 .. inode number, size and times, one int64 per record, unset value is -2**63 ;
+	uint32 .. file mode, user id, group id and number of links, one uint32 per record, unset value is 2**32 - 1 ;
+	char .. file type, one byte per record, unset value is '-' ;
+	frontcoded .. paths, two uint32 per record (length of the prefix shared with the previous path of the block and length of the rest) and the concatenated rests ;
+	digest .. hash values, width of a digest (uint32) and for each record a flag byte (1 if set) followed by the digest in binary ;
+	strings .. other text fields, one uint32 length per record (unset value is 2**32 - 1) and the concatenated strings ;
+	lines .. info lines, one uint32 (number of records preceding the line in the block) and one uint32 length per line and the concatenated lines.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import binascii
+import os
+import struct
+
+fileMagic = "RDICOLS1"
+blockMagic = "RDIB"
+trailerStruct = struct.Struct("<QI4s")
+footerHeaderStruct = struct.Struct("<II")
+footerColumnStruct = struct.Struct("<2scB")
+footerPartStruct = struct.Struct("<QQ")
+unsetInt64 = -2 ** 63
+unsetUint32 = 2 ** 32 - 1
+infoSequence = "# "
+
+# kind of column of each format sequence, see RecordDirInfo.formattingSequencesAndPositions
+columnKindsBySequence = {
+	"%p": "frontcoded",
+	"%i": "int64",
+	"%M": "uint32",
+	"%F": "char",
+	"%s": "int64",
+	"%a": "strings",
+	"%u": "uint32",
+	"%U": "strings",
+	"%g": "uint32",
+	"%G": "strings",
+	"%L": "uint32",
+	"%W": "int64",
+	"%Z": "int64",
+	"%Y": "int64",
+	"%X": "int64",
+	"%H": "digest",
+	"%T": "strings",
+}
+columnKindCodes = {"int64": "q", "uint32": "I", "char": "c", "frontcoded": "p", "digest": "h", "strings": "s", "lines": "l"}
+
+class OutputWriterColumnar():
+	"""Write the records of the given fields into blocks of columns, see the module documentation for the file format."""
+	
+	def __init__(self, stream, sequencesAndPositions, unsetValueSymbol="-", encoding='utf-8', blockSize=65536, syncEveryBytes=None, doSyncAtEnd=False):
+		self.stream = stream
+		self.sequences = [sequence for sequence, position in sequencesAndPositions]
+		self.positions = [position for sequence, position in sequencesAndPositions]
+		self.unsetValueSymbol = unsetValueSymbol
+		self.encoding = encoding
+		self.blockSize = blockSize
+		self.syncEveryBytes = syncEveryBytes
+		self.doSyncAtEnd = doSyncAtEnd
+		self.bytesSinceSync = 0
+		self.rows = []
+		self.infoLines = []
+		self.encoders = {"int64": self.encodeInt64Column, "uint32": self.encodeUint32Column, "char": self.encodeCharColumn, "frontcoded": self.encodeFrontCodedColumn, "digest": self.encodeDigestColumn, "strings": self.encodeStringsColumn}
+		self.stream.seek(0, os.SEEK_END)
+		if self.stream.tell() == 0:
+			self.stream.write(fileMagic)
+	
+	def __enter__(self):
+		return self
+	
+	def __exit__(self, excType, excValue, traceback):
+		self.close()
+	
+	def createRow(self, info):
+		"""Return row of the record from the list of fields info (see RecordDirInfo.createInfo())."""
+		return tuple([info[position] for position in self.positions])
+	
+	def writeLine(self, line):
+		"""Add the row created by createRow() to the block or remember the info line if line is a string."""
+		if type(line) != tuple:
+			if type(line) == unicode:
+				line = line.encode(self.encoding)
+			self.infoLines.append((len(self.rows), line))
+			return
+		self.rows.append(line)
+		if len(self.rows) >= self.blockSize:
+			self.flush()
+	
+	def encodeString(self, value):
+		if type(value) == unicode:
+			return value.encode(self.encoding)
+		return value
+	
+	def encodeInt64Column(self, values):
+		unsetValueSymbol = self.unsetValueSymbol
+		return [struct.pack("<%dq" % len(values), *[unsetInt64 if value == unsetValueSymbol else int(value) for value in values])]
+	
+	def encodeUint32Column(self, values):
+		unsetValueSymbol = self.unsetValueSymbol
+		return [struct.pack("<%dI" % len(values), *[unsetUint32 if value == unsetValueSymbol else int(value) for value in values])]
+	
+	def encodeCharColumn(self, values):
+		return [''.join([self.encodeString(value)[:1] for value in values])]
+	
+	def encodeFrontCodedColumn(self, values):
+		lengths = []
+		rests = []
+		previous = ''
+		for value in values:
+			value = self.encodeString(value)
+			prefixLength = len(os.path.commonprefix((previous, value)))
+			lengths.append(prefixLength)
+			lengths.append(len(value) - prefixLength)
+			rests.append(value[prefixLength:])
+			previous = value
+		return [struct.pack("<%dI" % len(lengths), *lengths), ''.join(rests)]
+	
+	def encodeDigestColumn(self, values):
+		digests = [None if value == self.unsetValueSymbol else binascii.unhexlify(value) for value in values]
+		width = max([len(digest) for digest in digests if not digest is None] or [0])
+		empty = '\x00' * (width + 1)
+		return [struct.pack("<I", width), ''.join([empty if digest is None else ''.join(('\x01', digest)) for digest in digests])]
+	
+	def encodeStringsColumn(self, values):
+		values = [None if value == self.unsetValueSymbol else self.encodeString(value) for value in values]
+		return [struct.pack("<%dI" % len(values), *[unsetUint32 if value is None else len(value) for value in values]), ''.join([value for value in values if not value is None])]
+	
+	def encodeLinesColumn(self, infoLines):
+		numbers = []
+		for numberOfRecords, line in infoLines:
+			numbers.append(numberOfRecords)
+			numbers.append(len(line))
+		return [struct.pack("<%dI" % len(numbers), *numbers), ''.join([line for numberOfRecords, line in infoLines])]
+	
+	def flush(self):
+		"""Write the rows and the info lines collected so far as a block."""
+		if not self.rows and not self.infoLines:
+			return
+		columns = []
+		if self.rows:
+			for i, values in enumerate(zip(*self.rows)):
+				kind = columnKindsBySequence[self.sequences[i]]
+				columns.append((self.sequences[i], kind, self.encoders[kind](values)))
+		columns.append((infoSequence, "lines", self.encodeLinesColumn(self.infoLines)))
+		data = []
+		footer = [footerHeaderStruct.pack(len(self.rows), len(columns))]
+		offset = 0
+		for sequence, kind, parts in columns:
+			footer.append(footerColumnStruct.pack(sequence, columnKindCodes[kind], len(parts)))
+			for part in parts:
+				footer.append(footerPartStruct.pack(offset, len(part)))
+				data.append(part)
+				offset += len(part)
+		footer = ''.join(footer)
+		data.append(footer)
+		data.append(trailerStruct.pack(offset + len(footer) + trailerStruct.size, len(footer), blockMagic))
+		data = ''.join(data)
+		self.rows = []
+		self.infoLines = []
+		self.stream.write(data)
+		self.stream.flush()
+		self.bytesSinceSync += len(data)
+		if not self.syncEveryBytes is None and self.bytesSinceSync >= self.syncEveryBytes:
+			self.sync()
+	
+	def sync(self):
+		os.fsync(self.stream.fileno())
+		self.bytesSinceSync = 0
+	
+	def close(self):
+		self.flush()
+		if self.doSyncAtEnd:
+			self.sync()
+		self.stream.close()
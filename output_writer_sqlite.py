@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: output_writer_sqlite
+   :platform: Windows, Unix, others
+   :synopsis: Class that writes the recording into a SQLite database.
+
+.. moduleauthor:: František Brožka
+
+Class that writes the recording into a SQLite database instead of a text file, each recording into it's own table.
+Records are inserted in batches by executemany inside large transactions and the indexes are created after all records are inserted,
+which is much faster than importing the text recording into a database afterwards.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import sqlite3
+
+# column name and type of the field of each format sequence, see RecordDirInfo.formattingSequencesAndPositions
+columnsBySequence = {
+	"%p": ("path", "TEXT"),
+	"%i": ("inode", "INTEGER"),
+	"%M": ("mode", "INTEGER"),
+	"%F": ("file_type", "TEXT"),
+	"%s": ("size", "INTEGER"),
+	"%a": ("access_rights", "TEXT"),
+	"%u": ("user_id", "INTEGER"),
+	"%U": ("user_name", "TEXT"),
+	"%g": ("group_id", "INTEGER"),
+	"%G": ("group_name", "TEXT"),
+	"%L": ("number_of_links", "INTEGER"),
+	"%W": ("birth_time", "INTEGER"), # times recorded with --time-format are stored as text
+	"%Z": ("change_time", "INTEGER"),
+	"%Y": ("modification_time", "INTEGER"),
+	"%X": ("access_time", "INTEGER"),
+	"%H": ("hash", "TEXT"),
+	"%T": ("link_target", "TEXT"),
+}
+# columns indexed after all records are inserted
+indexedSequences = ("%p", "%i", "%s", "%H")
+
+class OutputWriterSqlite():
+	"""
+	Write the recording into a new table recording_<id> of the SQLite database, the table has a column for each of the given fields.
+	The table recordings lists the recordings in the database with their info lines (the comment lines of a text recording).
+	"""
+	
+	def __init__(self, databasePath, sequencesAndPositions, unsetValueSymbol="-", encoding='utf-8', batchSize=10000, transactionSize=1000000):
+		self.databasePath = databasePath
+		self.positions = [position for sequence, position in sequencesAndPositions]
+		self.columns = [columnsBySequence[sequence] for sequence, position in sequencesAndPositions]
+		self.indexedColumns = [columnsBySequence[sequence][0] for sequence, position in sequencesAndPositions if sequence in indexedSequences]
+		self.unsetValueSymbol = unsetValueSymbol
+		self.encoding = encoding
+		self.batchSize = batchSize
+		self.transactionSize = transactionSize
+		self.rows = []
+		self.numberOfRowsInTransaction = 0
+		self.infoLines = []
+		self.connection = sqlite3.connect(databasePath, isolation_level=None)
+		self.connection.text_factory = str # paths that are not valid utf-8 are stored as they are
+		self.connection.execute("PRAGMA cache_size=-65536") # 64 MB, speeds up creating the indexes
+		self.connection.execute("CREATE TABLE IF NOT EXISTS recordings (id INTEGER PRIMARY KEY, table_name TEXT, info TEXT)")
+		self.recordingId = self.connection.execute("INSERT INTO recordings (info) VALUES ('')").lastrowid
+		self.tableName = "recording_%d" % self.recordingId
+		self.connection.execute("UPDATE recordings SET table_name = ? WHERE id = ?", (self.tableName, self.recordingId))
+		self.connection.execute(''.join(("CREATE TABLE ", self.tableName, " (", ', '.join([' '.join(column) for column in self.columns]), ")")))
+		self.insertStatement = ''.join(("INSERT INTO ", self.tableName, " VALUES (", ', '.join(['?'] * len(self.columns)), ")"))
+		self.connection.execute("BEGIN")
+	
+	def __enter__(self):
+		return self
+	
+	def __exit__(self, excType, excValue, traceback):
+		self.close()
+	
+	def createRow(self, info):
+		"""Return row of the record from the list of fields info (see RecordDirInfo.createInfo()), unset fields are NULL."""
+		unsetValueSymbol = self.unsetValueSymbol
+		return tuple([None if info[position] == unsetValueSymbol else info[position] for position in self.positions])
+	
+	def writeLine(self, line):
+		"""Insert the row created by createRow() or remember the info line if line is a string."""
+		if type(line) != tuple:
+			if type(line) == unicode:
+				line = line.encode(self.encoding)
+			self.infoLines.append(line)
+			return
+		self.rows.append(line)
+		if len(self.rows) >= self.batchSize:
+			self.flush()
+	
+	def flush(self):
+		"""Insert the batch of rows, commit the transaction if it contains transactionSize rows."""
+		if not self.rows:
+			return
+		self.connection.executemany(self.insertStatement, self.rows)
+		self.numberOfRowsInTransaction += len(self.rows)
+		self.rows = []
+		if self.numberOfRowsInTransaction >= self.transactionSize:
+			self.connection.execute("COMMIT")
+			self.connection.execute("BEGIN")
+			self.numberOfRowsInTransaction = 0
+	
+	def createIndexes(self):
+		for column in self.indexedColumns:
+			self.connection.execute(''.join(("CREATE INDEX ", self.tableName, "_", column, " ON ", self.tableName, " (", column, ")")))
+	
+	def close(self):
+		"""Insert the remaining rows and the info lines, then create the indexes."""
+		try:
+			self.flush()
+			self.connection.execute("UPDATE recordings SET info = ? WHERE id = ?", ('\n'.join(self.infoLines), self.recordingId))
+			self.connection.execute("COMMIT")
+			self.connection.execute("BEGIN")
+			self.createIndexes()
+			self.connection.execute("COMMIT")
+		finally:
+			self.connection.close()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: path_exclude_matcher
+   :platform: Windows, Unix, others
+   :synopsis: Class that decides if a path is excluded by any of the regular expressions given by --exclude-regex.
+
+.. moduleauthor:: František Brožka
+
+Class that decides if a path is excluded by any of the regular expressions given by --exclude-regex.
+The patterns are compiled once. Patterns that are just literal text (e.g. '^/home/fanda/\.cache', 'foo/bar$') are checked with string operations,
+prefixes of anchored literal patterns are indexed by their length so a path is checked against all of them with one dictionary lookup per length.
+The other patterns are joined into one regular expression.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import re
+
+class PathExcludeMatcher():
+	
+	def __init__(self, regexes):
+		self.regexes = regexes
+		self.specialCharacters = ".^$*+?{}[]\\|()"
+		self.prefixes = {} # length -> set of literal prefixes of this length
+		self.exactPaths = set()
+		self.suffixes = []
+		self.substrings = []
+		self.subtreePatterns = [] # compiled patterns that exclude every path under a directory if they match the beginning of "<directory>/"
+		otherRegexes = []
+		for r in regexes:
+			re.compile(r) # raise re.error for an invalid pattern
+			self.addSubtreePattern(r)
+			if not self.addLiteralPattern(r):
+				otherRegexes.append(r)
+		self.allRegex = self.compileAlternatives(regexes)
+		self.otherRegex = self.compileAlternatives(otherRegexes)
+	
+	def compileAlternatives(self, regexes):
+		"""Return one object with method search() matching if any of the regexes matches."""
+		if not regexes:
+			return None
+		for r in regexes:
+			if re.search(r"\\[1-9]|\(\?P=", r):
+				# group references would refer to wrong groups in the joined pattern
+				return AnyOfPatterns([re.compile(r) for r in regexes])
+			if re.search(r"\(\?[aiLmsux]", r):
+				# inline flags (e.g. '(?i)') would apply to the whole joined pattern, i.e. to the other patterns too
+				return AnyOfPatterns([re.compile(r) for r in regexes])
+		try:
+			return re.compile('|'.join(['(?:' + r + ')' for r in regexes]))
+		except re.error:
+			return AnyOfPatterns([re.compile(r) for r in regexes])
+	
+	def parseLiteral(self, pattern):
+		"""Return the text the pattern matches literally or None if the pattern is not just literal text."""
+		chars = []
+		i = 0
+		while i < len(pattern):
+			c = pattern[i]
+			if c == '\\':
+				if i + 1 >= len(pattern) or pattern[i + 1].isalnum() or pattern[i + 1] == '_':
+					return None
+				chars.append(pattern[i + 1])
+				i += 2
+			elif c in self.specialCharacters:
+				return None
+			else:
+				chars.append(c)
+				i += 1
+		return ''.join(chars)
+	
+	def addLiteralPattern(self, r):
+		"""Index the pattern if it is a literal text, optionally anchored with '^' and/or '$' or followed by '.*'. Return False if it is not."""
+		isAnchoredAtStart = r.startswith('^')
+		if isAnchoredAtStart:
+			r = r[1:]
+		isAnchoredAtEnd = r.endswith('$') and not r.endswith('\\$')
+		if isAnchoredAtEnd:
+			r = r[:-1]
+		elif r.endswith('.*') and not r.endswith('\\.*'):
+			# '.*' at the end of the pattern matches also empty text, so it does not change what re.search() matches
+			r = r[:-2]
+		literal = self.parseLiteral(r)
+		if literal is None or literal == '':
+			return False
+		if isAnchoredAtStart and isAnchoredAtEnd:
+			self.exactPaths.add(literal)
+			self.exactPaths.add(literal + '\n') # '$' matches also before a newline at the end
+		elif isAnchoredAtStart:
+			self.prefixes.setdefault(len(literal), set()).add(literal)
+		elif isAnchoredAtEnd:
+			self.suffixes.append(literal)
+		else:
+			self.substrings.append(literal)
+		return True
+	
+	def addSubtreePattern(self, r):
+		"""Remember patterns anchored at the start that cannot depend on what follows the matched beginning of a path."""
+		if not r.startswith('^') or re.search(r"\$|\\Z|\\b|\\B|\(\?[=!]", r):
+			return
+		r = r[1:]
+		if r.endswith('.*') and not r.endswith('\\.*'):
+			r = r[:-2]
+		try:
+			self.subtreePatterns.append(re.compile(r))
+		except re.error:
+			pass
+	
+	def isExcluded(self, path):
+		if type(path) != unicode:
+			# paths with names that are not in utf-8 are byte strings, check them only with regular expressions
+			return not self.allRegex is None and not self.allRegex.search(path) is None
+		if path in self.exactPaths:
+			return True
+		for length, prefixes in self.prefixes.iteritems():
+			if path[:length] in prefixes:
+				return True
+		for suffix in self.suffixes:
+			if path.endswith(suffix) or path.endswith(suffix + '\n'):
+				return True
+		for substring in self.substrings:
+			if substring in path:
+				return True
+		return not self.otherRegex is None and not self.otherRegex.search(path) is None
+	
+	def isSubtreeExcluded(self, directory):
+		"""Return True if every path under the directory is excluded, so the directory does not need to be listed at all."""
+		if not self.subtreePatterns:
+			return False
+		if type(directory) == unicode:
+			d = directory.rstrip(os.sep) + os.sep
+		else:
+			d = directory.rstrip(os.sep.encode('ascii')) + os.sep.encode('ascii')
+		for pattern in self.subtreePatterns:
+			if pattern.match(d):
+				return True
+		return False
+
+class AnyOfPatterns():
+	
+	def __init__(self, patterns):
+		self.patterns = patterns
+	
+	def search(self, path):
+		for pattern in self.patterns:
+			m = pattern.search(path)
+			if not m is None:
+				return m
+		return None
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: progress_statistics
+   :platform: Windows, Unix, others
+   :synopsis: Class that counts the work of a recording and publishes it periodically.
+
+.. moduleauthor:: František Brožka
+
+Class that counts entries walked, lstat calls, bytes hashed, subprocess calls and errors of a recording and measures the time spent in it's stages
+(listing directories, lstat, hashing, creation times, link targets, formatting and writing of records).
+The statistics are published periodically by a background thread as a line of a log (stderr) or as a JSON file, together with the estimated time to the end of the recording,
+so it can be told whether a running recording waits for the disk, the name service or debugfs.
+The times of the stages can also be summed for each path, the slowest paths are kept in a heap and published with the final statistics.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import datetime
+import heapq
+import json
+import os
+import threading
+import time
+
+counterNames = ("entries", "directories", "stats", "bytes_seen", "files_hashed", "bytes_hashed", "subprocess_calls", "errors")
+stageNames = ("listdir", "lstat", "hash", "crtime", "link_target", "format", "write")
+
+def getFilesystemUsage(paths):
+	"""
+	Return (number of used inodes, number of used bytes) of the filesystems the paths are on, each filesystem is counted once.
+	It is the estimate of the number of entries and bytes of a recording of the paths only if the paths are mount points, i.e. the recording covers the whole filesystems,
+	(None, None) is returned if any of the paths is not a mount point or if os.statvfs is not available.
+	"""
+	if not hasattr(os, 'statvfs'):
+		return None, None
+	devices = set()
+	numberOfInodes = 0
+	numberOfBytes = 0
+	for path in paths:
+		if not os.path.ismount(path):
+			return None, None
+		try:
+			device = os.stat(path).st_dev
+			if device in devices:
+				continue
+			devices.add(device)
+			statvfsResult = os.statvfs(path)
+		except OSError:
+			continue
+		numberOfInodes += statvfsResult.f_files - statvfsResult.f_ffree
+		numberOfBytes += (statvfsResult.f_blocks - statvfsResult.f_bfree) * statvfsResult.f_frsize
+	return numberOfInodes, numberOfBytes
+
+def decodePath(path):
+	if path is None or type(path) == unicode:
+		return path
+	return path.decode('utf-8', 'replace')
+
+def formatDuration(seconds):
+	if seconds is None:
+		return "unknown"
+	return str(datetime.timedelta(seconds=int(seconds)))
+
+class ProgressStatistics():
+	"""
+	Counters (see counterNames) and times of stages (see stageNames) of a recording.
+	After start() the statistics are published every interval seconds (only when stopped if interval is None), into the JSON file filePath (replaced atomically) if it is given, otherwise as lines passed to writeReport.
+	Counters may be increased from the hash worker threads, so count() holds a lock, the times of stages are summed over all threads.
+	If numberOfSlowestPaths is given, the times of the stages are also summed for each path given to startPath() (the stages measured until the next path is started)
+	and the slowest paths are published with the final statistics. The hashing done by the hash worker threads is not counted to the paths.
+	"""
+	
+	def __init__(self, interval=10.0, filePath=None, writeReport=None, numberOfSlowestPaths=0):
+		self.interval = interval
+		self.filePath = filePath
+		self.writeReport = writeReport
+		self.counters = dict.fromkeys(counterNames, 0)
+		self.stageTimes = dict.fromkeys(stageNames, 0.0)
+		self.currentPath = None
+		self.numberOfSlowestPaths = numberOfSlowestPaths
+		self.slowestPaths = [] # heap of (seconds, number of the path, path, dict of seconds by stage) of the slowest paths, the fastest of them first
+		self.pathStageTimes = None # seconds by stage of the current path
+		self.numberOfTimedPaths = 0
+		self.expectedEntries = None
+		self.expectedBytes = None
+		self.startTime = None
+		self.isRunning = False
+		self.lock = threading.Lock()
+		self.stopEvent = threading.Event()
+		self.thread = None
+	
+	def count(self, name, n=1):
+		with self.lock:
+			self.counters[name] += n
+	
+	def startPath(self, path):
+		"""Set the path being processed, with numberOfSlowestPaths the previous path is compared with the slowest paths."""
+		if self.numberOfSlowestPaths > 0:
+			self.finishPath()
+			self.pathStageTimes = {}
+		self.currentPath = path
+	
+	def finishPath(self):
+		"""Keep the current path if it is one of the slowest paths."""
+		pathStageTimes = self.pathStageTimes
+		self.pathStageTimes = None
+		if not pathStageTimes:
+			return
+		seconds = sum(pathStageTimes.itervalues())
+		if len(self.slowestPaths) < self.numberOfSlowestPaths:
+			heapq.heappush(self.slowestPaths, (seconds, self.numberOfTimedPaths, self.currentPath, pathStageTimes))
+		elif seconds > self.slowestPaths[0][0]:
+			heapq.heapreplace(self.slowestPaths, (seconds, self.numberOfTimedPaths, self.currentPath, pathStageTimes))
+		self.numberOfTimedPaths += 1
+	
+	def addStageTime(self, stage, startTime):
+		"""Add the time from startTime to now to the stage (and to the stage of the current path) and return now, so it can be the start time of the next stage."""
+		now = time.time()
+		self.stageTimes[stage] += now - startTime
+		if not self.pathStageTimes is None:
+			self.pathStageTimes[stage] = self.pathStageTimes.get(stage, 0.0) + now - startTime
+		return now
+	
+	def addHashedFile(self, size, seconds, isError=False):
+		"""Count a file hashed by a hash worker thread."""
+		with self.lock:
+			self.stageTimes["hash"] += seconds
+			if isError:
+				self.counters["errors"] += 1
+			else:
+				self.counters["files_hashed"] += 1
+				self.counters["bytes_hashed"] += size
+	
+	def createTimedCallback(self, stage, callback):
+		"""Return function calling the callback and adding the time of the call to the stage."""
+		if self.numberOfSlowestPaths > 0:
+			def timedCallback(*args):
+				startTime = time.time()
+				result = callback(*args)
+				self.addStageTime(stage, startTime)
+				return result
+			return timedCallback
+		stageTimes = self.stageTimes
+		def timedCallback(*args):
+			startTime = time.time()
+			result = callback(*args)
+			stageTimes[stage] += time.time() - startTime
+			return result
+		return timedCallback
+	
+	def start(self, expectedEntries=None, expectedBytes=None):
+		"""Start measuring the time of the recording and publishing the statistics, the expected totals are used to estimate the time to the end."""
+		self.expectedEntries = expectedEntries
+		self.expectedBytes = expectedBytes
+		self.startTime = time.time()
+		self.isRunning = True
+		if self.interval is None:
+			return
+		self.stopEvent.clear()
+		self.thread = threading.Thread(target=self.publishPeriodically)
+		self.thread.daemon = True
+		self.thread.start()
+	
+	def stop(self):
+		"""Stop publishing the statistics periodically and publish the final statistics."""
+		if not self.isRunning:
+			return
+		self.isRunning = False
+		if not self.thread is None:
+			self.stopEvent.set()
+			self.thread.join()
+			self.thread = None
+		self.finishPath()
+		self.publish(isFinished=True)
+	
+	def publishPeriodically(self):
+		while not self.stopEvent.wait(self.interval):
+			self.publish()
+	
+	def getEstimatedRemainingTime(self, elapsed):
+		"""Return estimated number of seconds to the end of the recording or None if it cannot be estimated. The progress is the lower of the fractions of the expected entries and the expected bytes seen so far."""
+		fractions = []
+		if self.expectedEntries:
+			fractions.append(self.counters["entries"] / float(self.expectedEntries))
+		if self.expectedBytes and self.counters["bytes_seen"] > 0:
+			fractions.append(self.counters["bytes_seen"] / float(self.expectedBytes))
+		if not fractions:
+			return None
+		fraction = min(fractions)
+		if fraction <= 0 or fraction >= 1:
+			return None
+		return elapsed * (1 - fraction) / fraction
+	
+	def getSnapshot(self, isFinished=False):
+		"""Return dict of the current statistics."""
+		now = time.time()
+		elapsed = now - self.startTime
+		counters = dict(self.counters)
+		rates = {
+			"entries_per_second": counters["entries"] / elapsed if elapsed > 0 else 0.0,
+			"bytes_hashed_per_second": counters["bytes_hashed"] / elapsed if elapsed > 0 else 0.0,
+		}
+		snapshot = {
+			"time": now,
+			"elapsed_seconds": elapsed,
+			"finished": isFinished,
+			"counters": counters,
+			"stage_seconds": dict(self.stageTimes),
+			"rates": rates,
+			"expected_entries": self.expectedEntries,
+			"expected_bytes": self.expectedBytes,
+			"eta_seconds": None if isFinished else self.getEstimatedRemainingTime(elapsed),
+			"current_path": None if isFinished else decodePath(self.currentPath),
+		}
+		if self.numberOfSlowestPaths > 0:
+			snapshot["slowest_paths"] = [{"path": decodePath(path), "seconds": seconds, "stage_seconds": stageTimes} for seconds, i, path, stageTimes in sorted(list(self.slowestPaths), reverse=True)]
+		return snapshot
+	
+	def formatReport(self, snapshot):
+		"""Return the snapshot as one line of text."""
+		counters = snapshot["counters"]
+		return ''.join((
+			"finished" if snapshot["finished"] else "progress", ": ", formatDuration(snapshot["elapsed_seconds"]), " elapsed, ",
+			"%d entries (%.1f/s), %d directories, %d stats, " % (counters["entries"], snapshot["rates"]["entries_per_second"], counters["directories"], counters["stats"]),
+			"%d files hashed (%.1f MB, %.1f MB/s), " % (counters["files_hashed"], counters["bytes_hashed"] / 1048576.0, snapshot["rates"]["bytes_hashed_per_second"] / 1048576.0),
+			"%d subprocess calls, %d errors" % (counters["subprocess_calls"], counters["errors"]),
+			"" if snapshot["finished"] else ''.join((", ETA ", formatDuration(snapshot["eta_seconds"]))),
+			"; seconds in stages: ", ", ".join(["%s %.1f" % (stage, snapshot["stage_seconds"][stage]) for stage in stageNames]),
+		))
+	
+	def formatSlowestPaths(self, snapshot):
+		"""Return lines of the slowest paths of the snapshot, the slowest first."""
+		lines = []
+		for i, slowPath in enumerate(snapshot.get("slowest_paths", ())):
+			stages = sorted(slowPath["stage_seconds"].iteritems(), key=lambda item: item[1], reverse=True)
+			lines.append(''.join(("slowest path %d: %.3f s (" % (i + 1, slowPath["seconds"]), ", ".join(["%s %.3f" % item for item in stages]), ") ", slowPath["path"])))
+		return lines
+	
+	def publish(self, isFinished=False):
+		snapshot = self.getSnapshot(isFinished)
+		if self.filePath is None:
+			if not self.writeReport is None:
+				self.writeReport(self.formatReport(snapshot))
+				for line in self.formatSlowestPaths(snapshot):
+					self.writeReport(line)
+			return
+		temporaryPath = ''.join((self.filePath, ".tmp"))
+		with open(temporaryPath, 'wb') as f:
+			json.dump(snapshot, f, indent=1, sort_keys=True, separators=(',', ': '))
+			f.write("\n")
+		if os.name == 'nt' and os.path.exists(self.filePath):
+			os.remove(self.filePath) # os.rename does not replace an existing file on Windows
+		os.rename(temporaryPath, self.filePath)
@@ -34,18 +34,52 @@ u"""
 """
 
 import argparse
-import codecs
+import collections
+import hashlib
+import itertools
 import logging
+import multiprocessing
 import os
 import re
+import shutil
 import socket
 import sys
 import string
+import tempfile
 import time
 
+import external_name_sorter
 import file_info
 import file_info_unix
 import file_info_windows
+import hash_cache_sqlite
+import hash_worker_pool
+import ordered_shard_writer
+import output_writer
+import output_writer_columnar
+import output_writer_sqlite
+import path_exclude_matcher
+import progress_statistics
+import record_profiler
+import reference_record_reader
+
+try:
+	from os import scandir
+except ImportError:
+	try:
+		from scandir import scandir # the scandir package from PyPI for python 2.7
+	except ImportError:
+		scandir = None
+
+logger = logging.getLogger("record_dir_info")
+logger.addHandler(logging.NullHandler()) # nothing is logged unless the application configures logging, see RecordDirInfo.run()
+
+# instance of RecordDirInfo used by the worker processes of --jobs, set before the worker processes are forked
+shardingRecordDirInfo = None
+
+def recordShard(subtreeDir, shardPath, pathExludeRegexes):
+	"""Called in a worker process of --jobs, module level function so it can be passed to the process pool."""
+	return shardingRecordDirInfo.recordShard(subtreeDir, shardPath, pathExludeRegexes)
 
 class RecordDirInfo():
 	
@@ -71,6 +105,11 @@ class RecordDirInfo():
 		self.formatSequenceHash = "%H"
 		self.formatSequenceLinkTarget = "%T"
 		self.formattingSequencesAndPositions = ((self.formatSequencePath, 0), (self.formatSequenceInodeNumber, 1), (self.formatSequenceFileModeNumber, 2), (self.formatSequenceFileType, 3), (self.formatSequenceSizeInBytes, 4), (self.formatSequenceAccessRightsOctal, 5), (self.formatSequenceUserId, 6), (self.formatSequenceUserName, 7), (self.formatSequenceGroupId, 8), (self.formatSequenceGroupName, 9), (self.formatSequenceNumberLinks, 10), (self.formatSequenceCreationTime, 11), (self.formatSequenceLastChangeTime, 12), (self.formatSequenceLastModificationTime, 13), (self.formatSequenceLastAccessTime, 14), (self.formatSequenceHash, 15), (self.formatSequenceLinkTarget, 16))
+		self.hashPosition = dict(self.formattingSequencesAndPositions)[self.formatSequenceHash]
+		# methods returning the fields of record line, in the order of positions in formattingSequencesAndPositions
+		self.fieldGetters = (self.getPathField, self.getInodeNumberField, self.getFileModeNumberField, self.getFileTypeField, self.getSizeBytesField, self.getAccessRightsOctalField, self.getUserIDField, self.getUserNameField, self.getGroupIDField, self.getGroupNameField, self.getNumberOfLinksField, self.getCreationTimeField, self.getChangedTimeField, self.getModificationTimeField, self.getAccessTimeField, self.getFileHashField, self.getLinkTargetField)
+		# these format sequences can be outputed using just the information returned by os.scandir, the other ones need lstat
+		self.formatSequencesWithoutStat = (self.formatSequencePath, self.formatSequenceInodeNumber, self.formatSequenceFileType, self.formatSequenceHash, self.formatSequenceLinkTarget)
 		self.defaultTimeFormatSequence = '%s'
 		self.regularFileSymbol = "f"
 		self.directorySymbol = "d"
@@ -83,7 +122,7 @@ class RecordDirInfo():
 		self.defaultEncoding = 'utf-8'
 		self.doLog = True
 		self.loggingLevel = logging.DEBUG
-		self.loggingFormat = '%(asctime)s:%(levelname)s:%(message)s', 
+		self.loggingFormat = '%(asctime)s:%(levelname)s:%(message)s'
 		# set default values, these values can be changed with setAttributes() or setAttribute()
 		self.setChangeableDefaultAttributes()
 		# set values derived from previous attributes
@@ -111,23 +150,97 @@ class RecordDirInfo():
 		self.doGetCreationTime = True
 		self.doGetLinkTargets = True
 		self.fileTypesToOutput = None
+		self.numberOfHashWorkers = 0
+		self.hashWorkerPool = None
+		self.pendingRecords = collections.deque()
+		self.doUseScandir = not scandir is None
+		self.doStatPaths = True
+		self.numberOfJobs = 1
+		self.shardDepth = 1
+		self.shardPool = None
+		self.pathExcludeMatcher = None
+		self.doStayOnFileSystem = False
+		self.topDirDevice = None
+		self.doUseInodeOrder = False
+		self.maxDirectoryEntries = None
+		self.nameSorter = None
+		self.statistics = None
+		self.compressionType = None
+		self.outputBufferSize = 1048576
+		self.outputFlushInterval = 1.0
+		self.doSyncOutputAtEnd = False
+		self.syncOutputEveryBytes = None
+		self.outputFormat = "text"
+		self.referenceFilePath = None
+		self.referenceReader = None
+		self.referenceHashLength = None
+		self.referenceRecords = None # records of the reference record file looked up for a directory walked in inode order
+		self.numberOfReusedHashes = 0
+		# regular files with more than one link by (device, inode number), see getHardLinkFile()
+		self.hardLinkFiles = {}
+		self.hardLinkFile = None
+		self.numberOfHardLinkHashes = 0
+		self.doWriteHardLinkReferences = False
+		self.hashCachePath = None
+		self.hashCacheSize = None
+		self.hashCache = None
+		self.usedFieldPositions = [i for symbol, i in self.formattingSequencesAndPositions]
+		self.formatPieces = None
+		self.formatFields = None
+		self.doGetUserNames = True
+		self.doGetGroupNames = True
+		self.doPreloadNames = False
+		self.namesPreloaded = False
 		
 	def setTopDir(self, topDir):
 		self.topDir = topDir
-		self.fileInfoProcessor = self.fileInfoProcessorClass(topDir, doComputeHash=self.doOutputHash, hashType=self.hashType, doGetCreationTime=self.doGetCreationTime, doGetLinkTargets=self.doGetLinkTargets)
+		if self.numberOfHashWorkers > 0 and self.doOutputHash:
+			# hashes of regular files are computed by the worker pool, not by the file info processor
+			self.fileInfoProcessor = self.fileInfoProcessorClass(topDir, doComputeHash=False, hashType=self.hashType, doGetCreationTime=self.doGetCreationTime, doGetLinkTargets=self.doGetLinkTargets)
+			if self.hashWorkerPool is None and not self.fileInfoProcessor.createHashingProcessor(self.hashType) is None:
+				self.hashWorkerPool = hash_worker_pool.HashWorkerPool(self.numberOfHashWorkers, lambda: self.fileInfoProcessor.createHashingProcessor(self.hashType), statistics=self.statistics)
+				self.hashWindowSize = 64 * self.numberOfHashWorkers
+		else:
+			self.fileInfoProcessor = self.fileInfoProcessorClass(topDir, doComputeHash=self.doOutputHash, hashType=self.hashType, doGetCreationTime=self.doGetCreationTime, doGetLinkTargets=self.doGetLinkTargets)
+		self.fileInfoProcessor.setHashCache(self.hashCache)
+		self.fileInfoProcessor.setStatistics(self.statistics)
+		if self.doPreloadNames and not self.namesPreloaded and (self.doGetUserNames or self.doGetGroupNames):
+			self.fileInfoProcessor.preloadNames()
+			self.namesPreloaded = True
 	
-	def resetChangeableAttributes(self, doOutputAbsolutePaths=None, doQuotePaths=None, hashType=None, fieldDelimiter=None, commentChars=None, quoteChars=None , customFormat=None, customTimeFormat=None, fileTypesToOutput=None):
+	def resetChangeableAttributes(self, doOutputAbsolutePaths=None, doQuotePaths=None, hashType=None, fieldDelimiter=None, commentChars=None, quoteChars=None , customFormat=None, customTimeFormat=None, fileTypesToOutput=None, numberOfHashWorkers=None, numberOfJobs=None, shardDepth=None, doPreloadNames=None, compressionType=None, outputBufferSize=None, outputFlushInterval=None, doSyncOutputAtEnd=None, syncOutputEveryBytes=None, outputFormat=None, referenceFilePath=None, hashCachePath=None, hashCacheSize=None, doWriteHardLinkReferences=None, doStayOnFileSystem=None, doUseInodeOrder=None, maxDirectoryEntries=None, statsInterval=None, statsFilePath=None, numberOfSlowestPaths=None):
 		self.setChangeableDefaultAttributes()
 		if not hashType is None:
 			self.hashType = hashType
+		if not numberOfHashWorkers is None:
+			self.numberOfHashWorkers = numberOfHashWorkers
+		if not numberOfJobs is None:
+			self.numberOfJobs = numberOfJobs
+		if not shardDepth is None:
+			self.shardDepth = shardDepth
+		if not doPreloadNames is None:
+			self.doPreloadNames = doPreloadNames
+		if not compressionType is None:
+			self.compressionType = compressionType
+		if not outputBufferSize is None:
+			self.outputBufferSize = outputBufferSize
+		if not outputFlushInterval is None:
+			self.outputFlushInterval = outputFlushInterval
+		if not doSyncOutputAtEnd is None:
+			self.doSyncOutputAtEnd = doSyncOutputAtEnd
+		if not syncOutputEveryBytes is None:
+			self.syncOutputEveryBytes = syncOutputEveryBytes
+		if not outputFormat is None:
+			self.outputFormat = outputFormat
 		if not commentChars is None:
 			self.commentChars = commentChars
 		if not quoteChars is None:
 			self.quoteChars = quoteChars
 		if not fieldDelimiter is None:
 			self.fieldDelimiter = fieldDelimiter
+		self.defaultFormat = self.fieldDelimiter.join([s[0] for s in self.formattingSequencesAndPositions]) # the format info of the recording has to contain the real delimiter
 		self.quotePathCallback = self.returnValueUnchanged
-		if not doQuotePaths is None and doQuotePaths is True:
+		if not doQuotePaths is None and doQuotePaths is True and self.outputFormat == "text":
 			self.quotePathCallback = self.quotePath
 		if not customFormat is None:
 			self.customFormat = customFormat
@@ -138,6 +251,17 @@ class RecordDirInfo():
 				self.doGetCreationTime = False
 			if not re.search(self.formatSequenceLinkTarget, self.customFormat):
 				self.doGetLinkTargets = False
+			if not re.search(self.formatSequenceUserName, self.customFormat):
+				self.doGetUserNames = False
+			if not re.search(self.formatSequenceGroupName, self.customFormat):
+				self.doGetGroupNames = False
+			self.formatPieces, self.formatFields = self.compileFormat(self.customFormat)
+			self.usedFieldPositions = sorted(set([position for i, position in self.formatFields]))
+			self.doStatPaths = False
+			for symbol, i in self.formattingSequencesAndPositions:
+				if not symbol in self.formatSequencesWithoutStat and i in self.usedFieldPositions:
+					self.doStatPaths = True
+					break
 		if not customTimeFormat is None:
 			self.customTimeFormat = customTimeFormat
 			self._formatTime = self.formatTimeCustom
@@ -149,6 +273,31 @@ class RecordDirInfo():
 				self.doOutputHash = False
 			if not self.symbolicLinkSymbol in fileTypesToOutput:
 				self.doGetLinkTargets = False
+		if not doStayOnFileSystem is None:
+			self.doStayOnFileSystem = doStayOnFileSystem
+		if not doUseInodeOrder is None:
+			self.doUseInodeOrder = doUseInodeOrder
+		if not maxDirectoryEntries is None:
+			self.maxDirectoryEntries = maxDirectoryEntries
+			self.nameSorter = external_name_sorter.ExternalNameSorter(self.returnJustUnicodeValue, chunkSize=maxDirectoryEntries)
+		if not statsInterval is None or not statsFilePath is None:
+			self.statistics = progress_statistics.ProgressStatistics(interval=statsInterval or 10.0, filePath=statsFilePath, writeReport=self.log, numberOfSlowestPaths=numberOfSlowestPaths or 0)
+		elif numberOfSlowestPaths:
+			# the statistics with the slowest paths are published only at the end of the recording
+			self.statistics = progress_statistics.ProgressStatistics(interval=None, writeReport=self.log, numberOfSlowestPaths=numberOfSlowestPaths)
+		if not doWriteHardLinkReferences is None:
+			self.doWriteHardLinkReferences = doWriteHardLinkReferences
+		if not hashCachePath is None and self.doOutputHash:
+			self.hashCachePath = hashCachePath
+			self.hashCacheSize = hashCacheSize
+		if not referenceFilePath is None and self.doOutputHash:
+			self.referenceFilePath = referenceFilePath
+			# inode number, size and times compared with the reference need the whole stat result
+			self.doStatPaths = True
+			try:
+				self.referenceHashLength = len(hashlib.new(self.hashType).hexdigest())
+			except ValueError:
+				self.referenceHashLength = None
 	
 	def setAttribute(self, attributeName, attributeValue):
 		if not hasattr(self, attributeName):
@@ -162,8 +311,29 @@ class RecordDirInfo():
 		parser.add_argument('-u', '--quoted-paths', help=string.replace(''.join(('If given the paths in the output file will be quoted, i.e. surrounded with  \'', self.quoteChars, '\'.')), '%', '%%'), action='store_true', required=False)
 		parser.add_argument('-i', '--field-delimiter', help='Delimiter that will delimit fields in the output, output file. Defaults to \';\'. If --format is given this option is ignored.', default=u';', type=unicode, required=False)
 		parser.add_argument('-e', '--exclude-regex', help='Regular expression to exclude paths from being processed and outputed. Can be given multiple times. E.g. to exclude of directory foo/bar/ (and all it\'s content) but not foo/barbar/ give --exclude-regex \'foo/bar$\'. Recognized regular expression patterns info can be found on https://docs.python.org/2.7/library/re.html. If --absolute-paths is given the regex is checked against absolute paths.', metavar='REGEX', type=unicode, action='append', required=False)
-		parser.add_argument('-s', '--hash-type', help='Specify hash algorithm to be used for computing hash value of regular files. Defaults to \'sha1\'.', default=u'sha1', type=unicode, required=False)
-		parser.add_argument('-f', '--format', help=string.replace(''.join(('Specify custom format to be used as outputed record line for each path under top directory. Default format is \'', self.defaultFormat, '\'. Format sequences are similar to the ones specified for the option --format of the GNU stat utility. The valid format sequences are: %p .. path, quoted if --quoted-paths given ; %i .. inode number ; %M .. file mode integer number (missing in GNU stat) ; %F .. file type (one of f (regular file), d (directory), l (symbolic link), c (character special device), b (block special device), i (FIFO), s (socket)), %s .. total size (in bytes) ; %a .. access rights in octal ; %u .. user ID of owner ; %U .. user name of owner, this may be an incorrect name e.g. if top dir is on a mounted device originally comming from another computer while the user id exists on both computers etc. ; %g .. group ID of owner ; %G .. group name of owner, this may be an incorrect name e.g. if top dir is on a mounted device originally comming from another computer while the group id exists on both computers etc. ; %L .. number of links (missing in GNU stat) ; %W .. time  of  file birth, seconds since Epoch ; %Z .. time of last change, seconds since Epoch ; %Y .. time of last modification, seconds since Epoch ; %X .. time of last access, seconds since Epoch ; %H .. hash value as computed by an external hashing utility')), '%', '%%'), type=unicode, required=False)
+		parser.add_argument('-s', '--hash-type', help='Specify hash algorithm to be used for computing hash value of regular files. Defaults to \'sha1\'. Any algorithm provided by the python module hashlib can be given (e.g. md5, sha1, sha224, sha256, sha384, sha512), other algorithms are computed by the external utility <hash-type>sum if it is found on your system.', default=u'sha1', type=unicode, required=False)
+		parser.add_argument('-w', '--hash-workers', help='Number of threads that compute hash values of regular files while the directory tree is being walked. Records are still outputed in the same order as without this option. Defaults to 0, i.e. hash values are computed one by one by the main thread.', metavar='N', default=0, type=int, required=False)
+		parser.add_argument('-j', '--jobs', help='Number of worker processes that record subtrees of top dir in parallel. The subtrees are recorded into temporary files that are merged into the output in the same order as if recorded by one process. Defaults to 1, i.e. no worker processes. Cannot be combined with --continue-from.', metavar='N', default=1, type=int, required=False)
+		parser.add_argument('-k', '--split-depth', help='With --jobs, each directory this many levels below top dir is recorded (with it\'s whole subtree) by a worker process. Defaults to 1.', metavar='DEPTH', default=1, type=int, required=False)
+		parser.add_argument('-n', '--preload-names', help='Load all users and groups the system can enumerate at start, so that user and group names (%%U, %%G) are not looked up one by one in the name service (e.g. LDAP). Names of ids that are not found are looked up and remembered anyway.', action='store_true', required=False)
+		parser.add_argument('-x', '--one-file-system', help='Do not descend into directories on other filesystems than the top dir is on, the mount points are recorded but not their content.', action='store_true', required=False)
+		parser.add_argument('--inode-order', help='Stat and hash the entries of each directory in the order of their inode numbers to reduce disk seeks (useful on rotational disks), the records are still written in the order of names. Needs os.scandir (or the scandir package on python 2.7).', action='store_true', required=False)
+		parser.add_argument('--stats-interval', help='Publish statistics of the recording every SECONDS seconds (10 by default if --stats-file is given): numbers of entries, stats, bytes hashed, subprocess calls and errors, time spent in the stages of the recording (listdir, lstat, hash, crtime, link_target, format, write; hash times of --hash-workers are summed over the workers) and the estimated time to the end. The statistics are logged into stderr unless --stats-file is given. The estimate is based on the number of records of the top dirs in the --reference file if it is given, otherwise on the used inodes and bytes of the filesystems if all top dirs are mount points, otherwise the time to the end is not estimated.', metavar='SECONDS', type=float, required=False)
+		parser.add_argument('--stats-file', help='Publish the statistics (see --stats-interval) into the JSON file, the file is replaced each time.', metavar='PATH', type=unicode, required=False)
+		parser.add_argument('--slowest-paths', help='Measure the time each path spends in the stages of the recording (see --stats-interval) and publish the N slowest paths with the times of their stages in the final statistics (logged into stderr unless --stats-file is given). The overhead is a few clock readings per path, so it can be left on for production recordings. Listing a directory (and obtaining creation times of it\'s entries at once) is measured separately from it\'s record, so a directory can be listed twice. Hashing done by --hash-workers is not counted to the paths.', metavar='N', type=int, required=False)
+		parser.add_argument('--profile', help='Run the recording under cProfile, dump the profile into the file (readable by the python module pstats) and log into stderr a table of the cumulative time spent in the file info accessors, in the providers of hash values, creation times and link targets, in the record creation and in the formatting and writing callbacks. Only the main thread is profiled, the hashing done by --hash-workers shows as waiting for the hash values. The profiler slows the recording down, see --slowest-paths for a measurement with a low overhead.', metavar='PATH', type=unicode, required=False)
+		parser.add_argument('--max-directory-entries', help='Record directories with more than N entries without listing them into memory, their names are sorted in chunks of N names in temporary files and merged and names of subdirectories waiting to be walked are kept in temporary files when there are more than N of them, so the memory used does not depend on the number of entries of a directory. Needs os.scandir (or the scandir package on python 2.7).', type=int, metavar='N', required=False)
+		parser.add_argument('-z', '--compress', help='Compress the output with the given compression type. By default the output file is compressed if it\'s name ends with .gz, .bz2 or .xz.', choices=output_writer.compressionTypes, required=False)
+		parser.add_argument('--buffer-size', help='Size of the output buffer in bytes. Defaults to 1048576.', metavar='BYTES', default=1048576, type=int, required=False)
+		parser.add_argument('--flush-interval', help='The output buffer is written at least once per this many seconds even if not full, so the progress of the recording can be watched in the output. Defaults to 1.', metavar='SECONDS', default=1.0, type=float, required=False)
+		parser.add_argument('--fsync', help='Synchronize the output file to disk (fsync) when the recording finishes.', action='store_true', required=False)
+		parser.add_argument('--fsync-every', help='Synchronize the output file to disk (fsync) every time this many megabytes (of possibly compressed data) are written.', metavar='MB', type=int, required=False)
+		parser.add_argument('--output-format', help='Format of the output file. text .. record lines (see --format) ; sqlite .. SQLite database, the recording is inserted into a new table recording_<id> with a column for each format sequence of --format (the unset fields are NULL and --quoted-paths is ignored), the table recordings lists the recordings with their info and the path, inode number, size and hash value columns are indexed. Give --file-append to add the recording into an existing database ; columnar .. compact binary file of blocks of records stored by columns (numbers packed in fixed width, paths front coded, hash values in binary) that can be read by columnar_file_reader.ColumnarFileReader, --quoted-paths is ignored and --time-format cannot be given. Defaults to text.', choices=("text", "sqlite", "columnar"), default="text", required=False)
+		parser.add_argument('--hard-link-references', help='Record the second and later hard links of a regular file as line \'<path>;same as;<path of the first link>\' (with the field delimiter and quoting of the paths of the recording) instead of the full record. Note that such lines do not match the record line format. Only with the text output format and cannot be combined with --jobs.', action='store_true', required=False)
+		parser.add_argument('-r', '--reference', help='Previous record file (possibly compressed) of the same top dirs given the same way (relative or absolute, see --absolute-paths). Hash values of regular files whose inode number, size, time of last change and time of last modification are the same as recorded in the reference are taken from the reference instead of being computed. The reference has to contain the format sequences %%p, %%i, %%s, %%Z, %%Y and %%H with the same --hash-type, and the times have to be recorded as seconds since epoch (the default --time-format), otherwise no hash value is reused. The first recording of each top dir in the reference is used. Cannot be combined with --jobs.', metavar='PATH', type=unicode, required=False)
+		parser.add_argument('--hash-cache', help='SQLite database remembering hash values of files by device, inode number, size, time of last modification and time of last change. Hash values of files that did not change are taken from it instead of being computed. The database can be shared by runs of the script in parallel. It is created if it does not exist. The database can be compacted by running: main.py compact-hash-cache PATH', metavar='PATH', type=unicode, required=False)
+		parser.add_argument('--hash-cache-size', help='Maximal number of hash values in the hash cache, the ones not seen for the longest time are deleted at the end of the recording. Defaults to 10000000.', metavar='N', default=10000000, type=int, required=False)
+		parser.add_argument('-f', '--format', help=string.replace(''.join(('Specify custom format to be used as outputed record line for each path under top directory. Default format is \'', self.defaultFormat, '\'. Format sequences are similar to the ones specified for the option --format of the GNU stat utility. The valid format sequences are: %p .. path, quoted if --quoted-paths given ; %i .. inode number ; %M .. file mode integer number (missing in GNU stat) ; %F .. file type (one of f (regular file), d (directory), l (symbolic link), c (character special device), b (block special device), i (FIFO), s (socket)), %s .. total size (in bytes) ; %a .. access rights in octal ; %u .. user ID of owner ; %U .. user name of owner, this may be an incorrect name e.g. if top dir is on a mounted device originally comming from another computer while the user id exists on both computers etc. ; %g .. group ID of owner ; %G .. group name of owner, this may be an incorrect name e.g. if top dir is on a mounted device originally comming from another computer while the group id exists on both computers etc. ; %L .. number of links (missing in GNU stat) ; %W .. time  of  file birth, seconds since Epoch ; %Z .. time of last change, seconds since Epoch ; %Y .. time of last modification, seconds since Epoch ; %X .. time of last access, seconds since Epoch ; %H .. hash value of regular file as printed by the GNU utility <hash-type>sum (e.g. sha1sum)')), '%', '%%'), type=unicode, required=False)
 		parser.add_argument('-t', '--time-format', help=string.replace(''.join(('Specify custom time format to be used as outputed timestamps in record lines for each time information. Default format is \'', self.defaultTimeFormatSequence, '\'. Format sequences are similar to the ones specified for the option --format of the GNU date utility. The valid format sequences can be found in python manual for the module time on https://docs.python.org/2.7/library/time.html#time.strftime and additionally also the sequene \'', self.defaultTimeFormatSequence, '\' can be given as seconds since epoch (on Unix it is seconds since 1970-01-01 00:00:00 UTC)')), '%', '%%'), type=unicode, required=False)
 		parser.add_argument('-y', '--file-type', help='If given, only info for paths of the given type will be outputed. Can be given multiple times (of course with different values). If given with value already given, then the repetition is ignored.', type=unicode, action='append', choices=self.fileTypesSymbols, required=False)
 		parser.add_argument('-c', '--continue-from', help='Continue from path. If --absolute-paths is given it is converted to absolute paths and then checked against absolute paths of top dir(s). (TODO-?: currently not: ?If --absolute-paths is given, this should be absolute path?). Can be combined with --file-append.', metavar='PATH', type=unicode, required=False)
@@ -188,6 +358,68 @@ class RecordDirInfo():
 			self.arguments.top_dir[i] = self.stripTrailingSlash(topDir)
 		if not self.arguments.continue_from is None:
 			self.arguments.continue_from = self.stripTrailingSlash(self.arguments.continue_from)
+		if self.arguments.hash_workers < 0:
+			raise Exception(''.join(("Error. The number of hash workers has to be 0 or a positive number, '", str(self.arguments.hash_workers), "' given."))) # TODO: define my own subclass of Exception ?
+		if self.arguments.jobs < 1:
+			raise Exception(''.join(("Error. The number of jobs has to be a positive number, '", str(self.arguments.jobs), "' given."))) # TODO: define my own subclass of Exception ?
+		if self.arguments.split_depth < 1:
+			raise Exception(''.join(("Error. The split depth has to be a positive number, '", str(self.arguments.split_depth), "' given."))) # TODO: define my own subclass of Exception ?
+		compressionType = self.arguments.compress
+		if compressionType is None and self.arguments.output_file_path != "-":
+			compressionType = output_writer.getCompressionTypeByExtension(self.arguments.output_file_path)
+		if not compressionType is None:
+			output_writer.createCompressor(compressionType) # raises an exception if the compression type is not available, before the output file is created
+		if self.arguments.buffer_size < 1:
+			raise Exception(''.join(("Error. The output buffer size has to be a positive number, '", str(self.arguments.buffer_size), "' given."))) # TODO: define my own subclass of Exception ?
+		if not self.arguments.fsync_every is None and self.arguments.fsync_every < 1:
+			raise Exception(''.join(("Error. The number of megabytes for --fsync-every has to be a positive number, '", str(self.arguments.fsync_every), "' given."))) # TODO: define my own subclass of Exception ?
+		if not self.arguments.max_directory_entries is None:
+			if self.arguments.max_directory_entries < 1:
+				raise Exception(''.join(("Error. The maximum number of directory entries has to be a positive number, '", str(self.arguments.max_directory_entries), "' given."))) # TODO: define my own subclass of Exception ?
+			if scandir is None:
+				raise Exception("Error. The argument --max-directory-entries needs os.scandir or the scandir package.") # TODO: define my own subclass of Exception ?
+		if self.arguments.inode_order and scandir is None:
+			raise Exception("Error. The argument --inode-order needs os.scandir or the scandir package.") # TODO: define my own subclass of Exception ?
+		if not self.arguments.stats_interval is None and self.arguments.stats_interval <= 0:
+			raise Exception(''.join(("Error. The statistics interval has to be a positive number, '", str(self.arguments.stats_interval), "' given."))) # TODO: define my own subclass of Exception ?
+		if self.arguments.jobs > 1 and (not self.arguments.stats_interval is None or not self.arguments.stats_file is None):
+			raise Exception("Error. The arguments --jobs and --stats-interval or --stats-file cannot be combined.") # TODO: define my own subclass of Exception ?
+		if not self.arguments.slowest_paths is None:
+			if self.arguments.slowest_paths < 1:
+				raise Exception(''.join(("Error. The number of slowest paths has to be a positive number, '", str(self.arguments.slowest_paths), "' given."))) # TODO: define my own subclass of Exception ?
+			if self.arguments.jobs > 1:
+				raise Exception("Error. The arguments --jobs and --slowest-paths cannot be combined.") # TODO: define my own subclass of Exception ?
+		if not self.arguments.profile is None:
+			if self.arguments.jobs > 1:
+				raise Exception("Error. The arguments --jobs and --profile cannot be combined, the worker processes are not profiled.") # TODO: define my own subclass of Exception ?
+			if os.path.exists(self.arguments.profile):
+				raise Exception(''.join(("Error. The profile file '", self.arguments.profile, "' already exists."))) # TODO: define my own subclass of Exception ?
+		if self.arguments.jobs > 1 and not self.arguments.continue_from is None:
+			raise Exception("Error. The arguments --jobs and --continue-from cannot be combined.") # TODO: define my own subclass of Exception ?
+		if self.arguments.jobs > 1 and self.arguments.hard_link_references:
+			raise Exception("Error. The arguments --jobs and --hard-link-references cannot be combined.") # TODO: define my own subclass of Exception ?
+		if self.arguments.output_format != "text":
+			if self.arguments.output_file_path == "-":
+				raise Exception(''.join(("Error. The ", self.arguments.output_format, " output format cannot be written to stdout."))) # TODO: define my own subclass of Exception ?
+			if not self.arguments.compress is None:
+				raise Exception(''.join(("Error. The arguments --compress and --output-format ", self.arguments.output_format, " cannot be combined."))) # TODO: define my own subclass of Exception ?
+			if self.arguments.jobs > 1:
+				raise Exception(''.join(("Error. The arguments --jobs and --output-format ", self.arguments.output_format, " cannot be combined."))) # TODO: define my own subclass of Exception ?
+		if self.arguments.output_format != "text" and self.arguments.hard_link_references:
+			raise Exception(''.join(("Error. The arguments --hard-link-references and --output-format ", self.arguments.output_format, " cannot be combined."))) # TODO: define my own subclass of Exception ?
+		if self.arguments.output_format == "columnar" and not self.arguments.time_format is None:
+			raise Exception("Error. The arguments --time-format and --output-format columnar cannot be combined, times are stored as seconds since epoch.") # TODO: define my own subclass of Exception ?
+		if self.arguments.hash_cache_size < 1:
+			raise Exception(''.join(("Error. The hash cache size has to be a positive number, '", str(self.arguments.hash_cache_size), "' given."))) # TODO: define my own subclass of Exception ?
+		if not self.arguments.reference is None:
+			if self.arguments.jobs > 1:
+				raise Exception("Error. The arguments --jobs and --reference cannot be combined.") # TODO: define my own subclass of Exception ?
+			if not os.path.isfile(self.arguments.reference):
+				raise Exception(''.join(("Error. The reference record file '", self.arguments.reference, "' does not exist."))) # TODO: define my own subclass of Exception ?
+			referenceFormat = reference_record_reader.readRecordFormat(self.arguments.reference, self.commentChars, self.defaultEncoding)
+			for sequence in (self.formatSequencePath, self.formatSequenceInodeNumber, self.formatSequenceSizeInBytes, self.formatSequenceLastChangeTime, self.formatSequenceLastModificationTime, self.formatSequenceHash):
+				if referenceFormat is None or not sequence in referenceFormat:
+					raise Exception(''.join(("Error. The reference record file '", self.arguments.reference, "' has to be recorded with a format containing ", sequence, "."))) # TODO: define my own subclass of Exception ?
 		# make the list file_type filled with unique values and in particular order
 		if not self.arguments.file_type is None:
 			l = list(self.fileTypesSymbols)
@@ -196,6 +428,11 @@ class RecordDirInfo():
 					l.remove(t)
 			self.arguments.file_type = l
 	
+	def getSyncOutputEveryBytes(self):
+		if self.arguments.fsync_every is None:
+			return None
+		return self.arguments.fsync_every * 1048576
+	
 	def recordingCreationInfo(self):
 		loggedUserName = os.getenv("USER")
 		if not os.getenv("SUDO_USER") is None:
@@ -204,7 +441,7 @@ class RecordDirInfo():
 	
 	def recordingFieldsInfo(self):
 		if self.doUseCustomFormat:
-			f = self.arguments.format
+			f = self.customFormat
 		else:
 			f = self.defaultFormat
 		return ''.join((self.commentChars, " record line format: \"\"\"", f, "\"\"\""))
@@ -259,6 +496,11 @@ class RecordDirInfo():
 			path = u''.join((pathSplitted[0], pathSplitted[1]))
 		return path
 	
+	def joinPath(self, topDir, name):
+		if not type(name) == unicode and type(topDir) == unicode:
+			topDir = topDir.encode(self.defaultEncoding)
+		return os.path.join(topDir, name)
+	
 	def getFileTypeSymbol(self):
 		if self.fileInfoProcessor.isRegularFile():
 			return self.regularFileSymbol
@@ -278,6 +520,8 @@ class RecordDirInfo():
 			return self.returnUnsetValueSymbol()
 	
 	def getUserName(self):
+		if not self.doGetUserNames:
+			return self.returnUnsetValueSymbol()
 		name = self.fileInfoProcessor.getUserName()
 		if name is None:
 			return self.returnUnsetValueSymbol()
@@ -285,6 +529,8 @@ class RecordDirInfo():
 			return name
 	
 	def getGroupName(self):
+		if not self.doGetGroupNames:
+			return self.returnUnsetValueSymbol()
 		name = self.fileInfoProcessor.getGroupName()
 		if name is None:
 			return self.returnUnsetValueSymbol()
@@ -315,29 +561,146 @@ class RecordDirInfo():
 		else:
 			return self.quotePathCallback(self.returnJustUnicodeValue(linkTarget))
 	
+	def getReferenceFileHash(self, path):
+		"""
+		Return hash value of the regular file recorded in the reference record file if inode number, size and times of the file are the same as recorded, None otherwise.
+		The recorded values are compared with the values of the stat result, so times recorded in a --time-format other than seconds since epoch never match.
+		"""
+		if not self.pathSetSuccessfully or not type(path) == unicode or not self.fileInfoProcessor.isRegularFile():
+			return None
+		if self.referenceRecords is None:
+			record = self.referenceReader.getRecord(path)
+		else:
+			record = self.referenceRecords.get(path)
+		if record is None:
+			return None
+		h = record.get(self.hashPosition)
+		if h is None or h == self.unsetValueSymbol or (not self.referenceHashLength is None and len(h) != self.referenceHashLength):
+			return None
+		values = (self.fileInfoProcessor.getInodeNumber(), self.fileInfoProcessor.getSizeBytes(), self.fileInfoProcessor.getChangedTime(), self.fileInfoProcessor.getModificationTime())
+		for position, value in zip(self.referenceKeyPositions, values):
+			recordedValue = record.get(position)
+			if value is None:
+				# e.g. time of last change on Windows
+				if recordedValue != self.unsetValueSymbol:
+					return None
+			elif recordedValue is None or not recordedValue.isdigit() or int(recordedValue) != value:
+				return None
+		self.numberOfReusedHashes += 1
+		return h
+	
+	def getHardLinkFile(self, path):
+		"""
+		Return [path of the first link, hash value or hash_worker_pool.HashJob computing it or None, number of links not seen yet] of the current path
+		if it is a regular file with more than one link, None otherwise.
+		The list is created when the first link is seen and it is forgotten when all the links were seen, so only the files with some links not walked yet are remembered.
+		"""
+		key = self.fileInfoProcessor.getHardLinkKey()
+		if key is None:
+			return None
+		hardLinkFile = self.hardLinkFiles.get(key)
+		if hardLinkFile is None:
+			hardLinkFile = [path, None, self.fileInfoProcessor.getNumberOfLinks()]
+			self.hardLinkFiles[key] = hardLinkFile
+		hardLinkFile[2] -= 1
+		if hardLinkFile[2] <= 0:
+			del self.hardLinkFiles[key]
+		return hardLinkFile
+	
+	def getHardLinkFileHash(self, path):
+		"""Return hash value of the file computed for it's previous hard link or None."""
+		if self.hardLinkFile is None or self.hardLinkFile[0] == path or not isinstance(self.hardLinkFile[1], basestring):
+			return None
+		self.numberOfHardLinkHashes += 1
+		return self.hardLinkFile[1]
+	
+	def getNumberOfHardLinkHashes(self):
+		"""Return number of hash values taken from the previous hard link of the file instead of being computed."""
+		return self.numberOfHardLinkHashes
+	
+	def isHardLinkReference(self, path):
+		"""Return True if the path is to be recorded as a reference to the first hard link of the file (see --hard-link-references)."""
+		return self.doWriteHardLinkReferences and not self.hardLinkFile is None and self.hardLinkFile[0] != path
+	
+	def createHardLinkReference(self, path):
+		return self.fieldDelimiter.join((self.getPathField(path), u"same as", self.getPathField(self.hardLinkFile[0])))
+	
+	def getNumberOfReusedHashes(self):
+		"""Return number of hash values taken from the reference record file."""
+		return self.numberOfReusedHashes
+	
+	def getHashCacheStatistics(self):
+		"""Return tuple (hits, misses) of the lookups into the hash cache or None if no hash cache is used."""
+		if self.hashCache is None:
+			return None
+		return self.hashCache.getStatistics()
+	
+	def getNameCacheStatistics(self):
+		"""Return tuple (hits, misses) of the cache of user and group names."""
+		return self.fileInfoProcessorClass.nameCacheStatistics['hits'], self.fileInfoProcessorClass.nameCacheStatistics['misses']
+	
 	def log(self, message):
-		# TODO: use module logging to output into terminal and log file, see logging HOWTO
-		pass
+		if self.doLog:
+			logger.info(message)
+	
+	def getPathField(self, path):
+		return self.quotePathCallback(self.returnJustUnicodeValue(path))
+	
+	def getInodeNumberField(self, path):
+		return unicode(self.fileInfoProcessor.getInodeNumber())
+	
+	def getFileModeNumberField(self, path):
+		return unicode(self.fileInfoProcessor.getFileModeNumber())
+	
+	def getFileTypeField(self, path):
+		return self.getFileTypeSymbol()
+	
+	def getSizeBytesField(self, path):
+		return unicode(self.fileInfoProcessor.getSizeBytes())
+	
+	def getAccessRightsOctalField(self, path):
+		return self.fileInfoProcessor.getAccessRightsOctal()
+	
+	def getUserIDField(self, path):
+		return unicode(self.fileInfoProcessor.getUserID())
+	
+	def getUserNameField(self, path):
+		return self.getUserName()
+	
+	def getGroupIDField(self, path):
+		return unicode(self.fileInfoProcessor.getGroupID())
+	
+	def getGroupNameField(self, path):
+		return self.getGroupName()
+	
+	def getNumberOfLinksField(self, path):
+		return unicode(self.fileInfoProcessor.getNumberOfLinks())
+	
+	def getCreationTimeField(self, path):
+		return self._formatTime(self.getCreationTime())
+	
+	def getChangedTimeField(self, path):
+		return self._formatTime(self.fileInfoProcessor.getChangedTime())
+	
+	def getModificationTimeField(self, path):
+		return self._formatTime(self.fileInfoProcessor.getModificationTime())
+	
+	def getAccessTimeField(self, path):
+		return self._formatTime(self.fileInfoProcessor.getAccessTime())
+	
+	def getFileHashField(self, path):
+		return self.getFileHash()
+	
+	def getLinkTargetField(self, path):
+		return self.getLinkTarget()
 	
 	def createInfo(self, path):
+		"""Return list of the fields of the path, the fields not used by the format are not computed and are set to the unset value symbol."""
 		if self.pathSetSuccessfully:
-			return (self.quotePathCallback(self.returnJustUnicodeValue(path)), 
-				unicode(self.fileInfoProcessor.getInodeNumber()), 
-				unicode(self.fileInfoProcessor.getFileModeNumber()), 
-				self.getFileTypeSymbol(), 
-				unicode(self.fileInfoProcessor.getSizeBytes()), 
-				self.fileInfoProcessor.getAccessRightsOctal(), 
-				unicode(self.fileInfoProcessor.getUserID()), 
-				self.getUserName(), 
-				unicode(self.fileInfoProcessor.getGroupID()), 
-				self.getGroupName(), 
-				unicode(self.fileInfoProcessor.getNumberOfLinks()), 
-				self._formatTime(self.getCreationTime()), 
-				self._formatTime(self.fileInfoProcessor.getChangedTime()), 
-				self._formatTime(self.fileInfoProcessor.getModificationTime()), 
-				self._formatTime(self.fileInfoProcessor.getAccessTime()), 
-				self.getFileHash(), 
-				self.getLinkTarget())
+			info = [self.unsetValueSymbol] * len(self.fieldGetters)
+			for i in self.usedFieldPositions:
+				info[i] = self.fieldGetters[i](path)
+			return info
 		else:
 			return self.createEmptyInfo(path)
 	
@@ -360,40 +723,205 @@ class RecordDirInfo():
 			self.returnUnsetValueSymbol(), 
 			self.returnUnsetValueSymbol())
 	
+	def createRecordLineParser(self):
+		"""Return reference_record_reader.RecordLineParser parsing record lines written by this class."""
+		positions = dict(self.formattingSequencesAndPositions)
+		integerPositions = [positions[sequence] for sequence in (self.formatSequenceInodeNumber, self.formatSequenceFileModeNumber, self.formatSequenceSizeInBytes, self.formatSequenceAccessRightsOctal, self.formatSequenceUserId, self.formatSequenceGroupId, self.formatSequenceNumberLinks)]
+		return reference_record_reader.RecordLineParser(self.formattingSequencesAndPositions, pathPosition=positions[self.formatSequencePath], linkTargetPosition=positions[self.formatSequenceLinkTarget], integerPositions=integerPositions, quoteChars=self.quoteChars)
+	
 	def createRecordLine(self, info):
 		return self.fieldDelimiter.join(info)
 	
+	def compileFormat(self, customFormat):
+		"""Split the format into literal pieces and format sequences. Return list of the pieces (format sequences are replaced with None) and list of (index of piece, position of field in info) pairs."""
+		sequences = dict(self.formattingSequencesAndPositions)
+		pieces = []
+		fields = []
+		literal = []
+		i = 0
+		while i < len(customFormat):
+			sequence = customFormat[i:i + 2]
+			if sequence in sequences:
+				if literal:
+					pieces.append(''.join(literal))
+					literal = []
+				fields.append((len(pieces), sequences[sequence]))
+				pieces.append(None)
+				i += 2
+			else:
+				literal.append(customFormat[i])
+				i += 1
+		if literal:
+			pieces.append(''.join(literal))
+		return pieces, fields
+	
 	def createRecordLineCustomFormat(self, info):
-		f = self.customFormat
-		for symbol, i in self.formattingSequencesAndPositions:
-			f = string.replace(f, symbol, info[i])
-		return f
+		pieces = list(self.formatPieces)
+		for i, position in self.formatFields:
+			pieces[i] = info[position]
+		return ''.join(pieces)
+	
+	def writeRecord(self, path, writeCallback, formattingCallback):
+		self.writePreparedRecord(self.prepareRecord(path), writeCallback, formattingCallback)
+	
+	def prepareRecord(self, path):
+		"""Return (info or hard link reference line, hash job or None) of the current path, the hash job is submitted to the hash worker pool if the hash value is not known yet."""
+		if self.isHardLinkReference(path):
+			return self.createHardLinkReference(path), None
+		info = self.createInfo(path)
+		if self.hashWorkerPool is None:
+			return info, None
+		job = None
+		if self.pathSetSuccessfully and self.doOutputHash and self.fileInfoProcessor.isRegularFile() and self.fileInfoProcessor.getFileHash() is None:
+			# hash value not taken from the reference record file nor from a previous hard link
+			if not self.hardLinkFile is None and isinstance(self.hardLinkFile[1], hash_worker_pool.HashJob):
+				# the hash value of the previous hard link of the file is still being computed
+				job = self.hardLinkFile[1]
+				self.numberOfHardLinkHashes += 1
+			else:
+				cacheKey = self.fileInfoProcessor.getHashCacheKey()
+				h = None
+				if not cacheKey is None:
+					h = self.hashCache.getFileHash(cacheKey)
+				if h is None:
+					size = 0
+					if not self.statistics is None and self.fileInfoProcessor.completeStatResult():
+						size = self.fileInfoProcessor.getSizeBytes()
+					job = self.hashWorkerPool.submit(path, cacheKey, size)
+				else:
+					info[self.hashPosition] = h
+				if not self.hardLinkFile is None:
+					self.hardLinkFile[1] = job or h
+		return info, job
+	
+	def writePreparedRecord(self, record, writeCallback, formattingCallback):
+		"""Write the record returned by prepareRecord(), with the hash worker pool it is written after the records prepared before it once it's hash value is computed."""
+		if self.hashWorkerPool is None:
+			info, job = record
+			if isinstance(info, basestring):
+				writeCallback(info)
+			else:
+				writeCallback(formattingCallback(info))
+			return
+		self.pendingRecords.append(record)
+		self.writePendingRecords(writeCallback, formattingCallback, maxPendingRecords=self.hashWindowSize)
+	
+	def writePendingRecords(self, writeCallback, formattingCallback, maxPendingRecords=0):
+		"""Write records waiting for their hash in the order they were created. Records whose hash is already computed are written, then it is waited for the oldest hash until at most maxPendingRecords records are waiting."""
+		pendingRecords = self.pendingRecords
+		while pendingRecords:
+			info, job = pendingRecords[0]
+			if isinstance(info, basestring):
+				# hard link reference line
+				pendingRecords.popleft()
+				writeCallback(info)
+				continue
+			if not job is None:
+				if len(pendingRecords) <= maxPendingRecords and not job.isDone():
+					break
+				h = job.getFileHash()
+				if h is None:
+					info[self.hashPosition] = self.returnUnsetValueSymbol()
+				else:
+					info[self.hashPosition] = h
+					if not job.isInCache:
+						self.fileInfoProcessor.setFileHashInCache(job.path, job.cacheKey, h)
+						job.isInCache = True
+			pendingRecords.popleft()
+			writeCallback(formattingCallback(info))
 	
 	def writeLineToTerminal(self, line):
-		sys.stdout.write(line)
-		sys.stdout.write(os.linesep)
-		sys.stdout.flush()
+		self.outputFile.writeLine(line) # the line separator of the terminal is os.linesep, see openOutput()
 	
 	def writeLineToFile(self, line):
-		self.outputFile.write(''.join((line, '\n'))) # don't use os.linesep, see http://stackoverflow.com/questions/6159900/correct-way-to-write-line-to-file-in-python
+		self.outputFile.writeLine(line) # don't use os.linesep, see http://stackoverflow.com/questions/6159900/correct-way-to-write-line-to-file-in-python
 	
-	def setPath(self, topDir, continueFromPath=None):
+	def openOutput(self, outputFilePath, mode='wb'):
+		"""Return output_writer.OutputWriter writing into the file or into stdout if outputFilePath is '-'."""
+		if outputFilePath == "-":
+			return output_writer.OutputWriter(sys.stdout, encoding=sys.stdout.encoding or self.defaultEncoding, lineSeparator=os.linesep, compressionType=self.compressionType, bufferSize=self.outputBufferSize, flushInterval=self.outputFlushInterval, doCloseStream=False)
+		compressionType = self.compressionType
+		if compressionType is None:
+			compressionType = output_writer.getCompressionTypeByExtension(outputFilePath)
+		return output_writer.OutputWriter(open(outputFilePath, mode), encoding=self.defaultEncoding, compressionType=compressionType, bufferSize=self.outputBufferSize, flushInterval=self.outputFlushInterval, syncEveryBytes=self.syncOutputEveryBytes, doSyncAtEnd=self.doSyncOutputAtEnd)
+	
+	def openDatabaseOutput(self, outputFilePath):
+		"""Return output_writer_sqlite.OutputWriterSqlite writing the fields of the format into a new table of the database."""
+		return output_writer_sqlite.OutputWriterSqlite(outputFilePath, [(sequence, i) for sequence, i in self.formattingSequencesAndPositions if i in self.usedFieldPositions], unsetValueSymbol=self.unsetValueSymbol, encoding=self.defaultEncoding)
+	
+	def openColumnarOutput(self, outputFilePath, mode='wb'):
+		"""Return output_writer_columnar.OutputWriterColumnar writing the fields of the format into the file."""
+		return output_writer_columnar.OutputWriterColumnar(open(outputFilePath, mode), [(sequence, i) for sequence, i in self.formattingSequencesAndPositions if i in self.usedFieldPositions], unsetValueSymbol=self.unsetValueSymbol, encoding=self.defaultEncoding, syncEveryBytes=self.syncOutputEveryBytes, doSyncAtEnd=self.doSyncOutputAtEnd)
+	
+	def createOutputRow(self, info):
+		"""Return row of the fields for the sqlite or columnar output."""
+		return self.outputFile.createRow(info)
+	
+	def setPath(self, topDir, continueFromPath=None, dirEntry=None):
 		"""Returns True if the path and it's info should be outputed, False otherwise"""
+		if not self.statistics is None:
+			self.statistics.startPath(topDir)
+			startTime = time.time()
 		try:
-			self.fileInfoProcessor.setPathAndOnlyStat(topDir)
+			if dirEntry is None or self.doStatPaths:
+				self.fileInfoProcessor.setPathAndOnlyStat(topDir)
+			else:
+				self.fileInfoProcessor.setPathFromDirEntry(topDir, dirEntry)
 		except OSError:
 			self.pathSetSuccessfully = False
 		else:
 			self.pathSetSuccessfully = True
+		if not self.statistics is None:
+			self.statistics.addStageTime("lstat", startTime)
+			self.countEntry()
 		if not self.fileTypesToOutput is None:
 			symbol = self.getFileTypeSymbol()
 			if not symbol in self.fileTypesToOutput:
 				return False
 		if continueFromPath:
 			return False
-		else:
-			self.fileInfoProcessor.setAddinionalInfo()
-			return True
+		self.hardLinkFile = None
+		if self.pathSetSuccessfully and (self.doOutputHash or self.doWriteHardLinkReferences):
+			self.hardLinkFile = self.getHardLinkFile(topDir)
+		if self.isHardLinkReference(topDir):
+			return True # recorded as a reference to the first link, no additional info is needed
+		fileHash = None
+		if not self.referenceReader is None:
+			fileHash = self.getReferenceFileHash(topDir)
+		if fileHash is None and self.doOutputHash:
+			fileHash = self.getHardLinkFileHash(topDir)
+		self.fileInfoProcessor.setAddinionalInfo(fileHash=fileHash)
+		if not self.hardLinkFile is None and self.hardLinkFile[1] is None:
+			self.hardLinkFile[1] = self.fileInfoProcessor.getFileHash()
+		return True
+	
+	def countEntry(self):
+		"""Count the current path in the statistics."""
+		statistics = self.statistics
+		statistics.count("entries")
+		if not self.pathSetSuccessfully:
+			statistics.count("errors")
+			return
+		if self.fileInfoProcessor.isStatResultComplete:
+			statistics.count("stats")
+			if self.fileInfoProcessor.isRegularFile():
+				statistics.count("bytes_seen", self.fileInfoProcessor.getSizeBytes())
+		if self.fileInfoProcessor.isDirectory():
+			statistics.count("directories")
+	
+	def listDirectoryTimed(self, listDirectory, topDir):
+		"""Return listDirectory(topDir), the time is counted as the listdir stage and a failure as an error."""
+		if self.statistics is None:
+			return listDirectory(topDir)
+		self.statistics.startPath(topDir)
+		startTime = time.time()
+		try:
+			return listDirectory(topDir)
+		except OSError:
+			self.statistics.count("errors")
+			raise
+		finally:
+			self.statistics.addStageTime("listdir", startTime)
 	
 	def recordTopDir(self, topDir, writeCallback, formattingCallback, doOutputAbsolutePaths, pathExludeRegexes, continueFromPath=None):
 		writeCallback(self.recordingTopDirInfo(topDir))
@@ -407,6 +935,9 @@ class RecordDirInfo():
 			except UnicodeDecodeError:
 				topDir = d
 		self.setTopDir(topDir)
+		self.setTopDirDevice(topDir)
+		if not self.referenceReader is None:
+			self.referenceReader.startTopDir(self.recordingTopDirInfo(topDir))
 		if not continueFromPath is None:
 			if not type(continueFromPath) == unicode:
 				p = continueFromPath
@@ -447,57 +978,300 @@ class RecordDirInfo():
 				if i < lengthT:
 					continueFromPath[0] = os.sep.join((continueFromPath[0], continueFromPath.pop(1)))
 		if self.setPath(topDir, continueFromPath):
-			writeCallback(formattingCallback(self.createInfo(topDir)))
-		self.walkTree(topDir, writeCallback, formattingCallback, pathExludeRegexes=pathExludeRegexes, continueFromPath=continueFromPath)
+			self.writeRecord(topDir, writeCallback, formattingCallback)
+		if not self.shardPool is None:
+			shardWriter = ordered_shard_writer.OrderedShardWriter(writeCallback, maxPendingShards=4 * self.numberOfJobs, encoding=self.defaultEncoding)
+			self.walkTreeSharded(topDir, shardWriter, formattingCallback, pathExludeRegexes=pathExludeRegexes, depth=self.shardDepth)
+			self.writePendingRecords(shardWriter.writeLine, formattingCallback)
+			shardWriter.flush()
+		elif not self.maxDirectoryEntries is None:
+			self.walkTreeBounded(topDir, writeCallback, formattingCallback, pathExludeRegexes=pathExludeRegexes, continueFromPath=continueFromPath)
+		elif self.doUseScandir:
+			self.walkTreeIterative(topDir, writeCallback, formattingCallback, pathExludeRegexes=pathExludeRegexes, continueFromPath=continueFromPath)
+		else:
+			self.walkTree(topDir, writeCallback, formattingCallback, pathExludeRegexes=pathExludeRegexes, continueFromPath=continueFromPath)
+		self.writePendingRecords(writeCallback, formattingCallback)
+		self.fileInfoProcessor.close()
 	
-	def walkTree(self, topDir, writeCallback, formattingCallback, pathExludeRegexes, continueFromPath=None):
+	def setTopDirDevice(self, topDir):
+		"""Remember the device of the top dir if the walk should not leave it's filesystem (see --one-file-system)."""
+		self.topDirDevice = None
+		if self.doStayOnFileSystem:
+			try:
+				self.topDirDevice = os.stat(topDir).st_dev
+			except OSError:
+				pass
+	
+	def isOnTopDirFileSystem(self):
+		"""Return True if the current path is on the filesystem of the top dir or if the walk is not restricted to it."""
+		return self.topDirDevice is None or self.fileInfoProcessor.getDevice() == self.topDirDevice
+	
+	def listDirectory(self, topDir):
+		"""Return list of (name, entry) pairs of the directory sorted by name, entry is the os.scandir entry or None if os.scandir is not used."""
+		if self.doUseScandir:
+			return self.listDirEntries(topDir)
+		return [(f, None) for f in sorted(os.listdir(topDir), key=self.returnJustUnicodeValue)]
+	
+	def iterateDirEntries(self, topDir):
+		"""Yield (name, entry) pairs of the directory in the order of os.scandir. Names are the same as os.listdir(topDir) returns, i.e. unicode if topDir is unicode and the name can be decoded, byte string otherwise."""
+		if type(topDir) == unicode:
+			encoding = sys.getfilesystemencoding() or self.defaultEncoding
+			for entry in scandir(topDir.encode(encoding)):
+				try:
+					yield entry.name.decode(encoding), entry
+				except UnicodeDecodeError:
+					yield entry.name, entry
+		else:
+			for entry in scandir(topDir):
+				yield entry.name, entry
+	
+	def listDirEntries(self, topDir):
+		"""Return list of (name, entry) pairs of the directory sorted by name, see iterateDirEntries()."""
+		entries = list(self.iterateDirEntries(topDir))
+		entries.sort(key=lambda e: self.returnJustUnicodeValue(e[0]))
+		return entries
+	
+	def listDirectoryBounded(self, topDir):
 		"""
-		recursively descend the directory tree rooted at top,
-		calling the callback function for each file
-		
-		based on "example" on https://docs.python.org/2/library/stat.html
-		based on "example" on https://docs.python.org/2/library/os.html#os.walk
+		Return (list of (name, entry) pairs sorted by name, None) if the directory has at most maxDirectoryEntries entries,
+		(None, iterator of names sorted by name) otherwise, the names are sorted by the external merge sort and the entries are not kept.
 		"""
+		entries = []
+		dirEntries = self.iterateDirEntries(topDir)
+		for nameAndEntry in dirEntries:
+			entries.append(nameAndEntry)
+			if len(entries) > self.maxDirectoryEntries:
+				break
+		else:
+			entries.sort(key=lambda e: self.returnJustUnicodeValue(e[0]))
+			return entries, None
+		names = [f for f, entry in entries]
+		entries = None
+		return None, self.nameSorter.sortNames(itertools.chain(names, (f for f, entry in dirEntries)))
+	
+	def getPathExcludeMatcher(self, pathExludeRegexes):
+		"""Return matcher compiled from the list of regular expressions, the matcher is compiled only once for the same list."""
+		if not pathExludeRegexes:
+			return None
+		if self.pathExcludeMatcher is None or not self.pathExcludeMatcher.regexes is pathExludeRegexes:
+			self.pathExcludeMatcher = path_exclude_matcher.PathExcludeMatcher(pathExludeRegexes)
+		return self.pathExcludeMatcher
+	
+	def recordDirectory(self, topDir, writeCallback, formattingCallback, pathExludeRegexes, continueFromPath=None):
+		"""Record the entries of the directory topDir and return list of paths of it's subdirectories in the order they are to be descended into."""
 		# TODO: implement sorting functions that will e.g. sort names alphabetically and descend into directories before recording files in the parent directory etc.
 		dirs = []
+		pathExcludeMatcher = self.getPathExcludeMatcher(pathExludeRegexes)
+		if not pathExcludeMatcher is None and pathExcludeMatcher.isSubtreeExcluded(topDir):
+			return dirs
 		try:
-			names = sorted(os.listdir(topDir), key=self.returnJustUnicodeValue)
+			entries = self.listDirectoryTimed(self.listDirectory, topDir)
 		except OSError:
-			return
+			return dirs
+		return self.recordEntries(topDir, entries, writeCallback, formattingCallback, pathExcludeMatcher, continueFromPath)
+	
+	def recordEntries(self, topDir, entries, writeCallback, formattingCallback, pathExcludeMatcher, continueFromPath):
+		"""Record the entries (list of (name, entry) pairs sorted by name) of the directory topDir and return list of paths of it's subdirectories, see recordDirectory()."""
+		dirs = []
 		if continueFromPath:
-			for f in names:
+			for i, (f, entry) in enumerate(entries):
 				if f == continueFromPath[1]:
-					names = names[names.index(f):]
+					entries = entries[i:]
 					continueFromPath[0] = os.path.join(continueFromPath[0], continueFromPath[1])
 					continueFromPath.pop(1)
 					if len(continueFromPath) == 1:
 						# found final path to be continued-from
 						continueFromPath.pop(0)
-						names = names[1:]
+						entries = entries[1:]
 					break
-		for f in names:
+		if self.doGetCreationTime:
+			if not self.statistics is None:
+				startTime = time.time()
+			self.fileInfoProcessor.prefetchCreationTimes([self.joinPath(topDir, f) for f, entry in entries])
+			if not self.statistics is None:
+				self.statistics.addStageTime("crtime", startTime)
+		if self.doUseInodeOrder and self.doUseScandir:
+			return self.recordEntriesInInodeOrder(topDir, entries, writeCallback, formattingCallback, pathExcludeMatcher, continueFromPath)
+		for f, entry in entries:
 			if not type(f) == unicode:
 				# if this value returned by os.listdir is not unicode then non utf-8 characters are in the name
 				# so we cannot stat or further process the path so just write it without any stat info and don't recurse into it if directory
 				if type(topDir) == unicode:
 					topDir = topDir.encode(self.defaultEncoding)
 			path = os.path.join(topDir, f)
-			doExcludePath = False
-			if not pathExludeRegexes is None:
-				for r in pathExludeRegexes:
-					if re.search(r, path):
-						doExcludePath = True
-						break
-			if doExcludePath:
+			if not pathExcludeMatcher is None and pathExcludeMatcher.isExcluded(path):
 				continue
-			if self.setPath(path, continueFromPath):
-				writeCallback(formattingCallback(self.createInfo(path)))
-			if self.fileInfoProcessor.isDirectory():
+			if self.recordEntry(path, entry, writeCallback, formattingCallback, continueFromPath):
 				dirs.append(path)
-		for d in dirs:
+		return dirs
+	
+	def recordEntry(self, path, entry, writeCallback, formattingCallback, continueFromPath):
+		"""Record the path and return True if it is a subdirectory to be descended into."""
+		if self.setPath(path, continueFromPath, dirEntry=entry):
+			self.writeRecord(path, writeCallback, formattingCallback)
+		return self.fileInfoProcessor.isDirectory() and self.isOnTopDirFileSystem()
+	
+	def recordDirectoryBounded(self, topDir, writeCallback, formattingCallback, pathExludeRegexes, continueFromPath=None):
+		"""
+		Record the entries of the directory topDir like recordDirectory() does and return iterable of names of it's subdirectories in the order they are to be descended into,
+		the names are joined to topDir by joinPath(). A directory with more than maxDirectoryEntries entries is recorded from the names sorted by the external merge sort,
+		it's entries are stat-ed one by one (creation times are not prefetched and --inode-order does not apply) and the names of it's subdirectories are held in a SpooledNameList.
+		"""
+		pathExcludeMatcher = self.getPathExcludeMatcher(pathExludeRegexes)
+		if not pathExcludeMatcher is None and pathExcludeMatcher.isSubtreeExcluded(topDir):
+			return []
+		try:
+			entries, names = self.listDirectoryTimed(self.listDirectoryBounded, topDir)
+		except OSError:
+			return []
+		if names is None:
+			return [os.path.basename(path) for path in self.recordEntries(topDir, entries, writeCallback, formattingCallback, pathExcludeMatcher, continueFromPath)]
+		subdirectoryNames = external_name_sorter.SpooledNameList(self.maxDirectoryEntries)
+		# like recordEntries() the entries before the path to be continued from are skipped only if the path exists
+		doSkipEntries = bool(continueFromPath) and os.path.lexists(self.joinPath(topDir, continueFromPath[1]))
+		for f in names:
+			if doSkipEntries:
+				if f != continueFromPath[1]:
+					continue
+				doSkipEntries = False
+				continueFromPath[0] = os.path.join(continueFromPath[0], continueFromPath[1])
+				continueFromPath.pop(1)
+				if len(continueFromPath) == 1:
+					# found final path to be continued-from
+					continueFromPath.pop(0)
+					continue
+			if not type(f) == unicode:
+				# see recordEntries()
+				if type(topDir) == unicode:
+					topDir = topDir.encode(self.defaultEncoding)
+			path = os.path.join(topDir, f)
+			if not pathExcludeMatcher is None and pathExcludeMatcher.isExcluded(path):
+				continue
+			if self.recordEntry(path, None, writeCallback, formattingCallback, continueFromPath):
+				subdirectoryNames.append(os.path.basename(path))
+		return subdirectoryNames
+	
+	def getEntryInode(self, entry):
+		try:
+			return entry.inode()
+		except OSError:
+			return 0
+	
+	def recordEntriesInInodeOrder(self, topDir, entries, writeCallback, formattingCallback, pathExcludeMatcher, continueFromPath):
+		"""
+		Record the entries (sorted by name) of the directory topDir like recordDirectory() does, but stat and hash them in the order of their inode numbers.
+		The inode number is returned by os.scandir without a stat and inodes of files created together are usually near each other on the disk (and so is their data),
+		so the disk head moves in one direction instead of seeking back and forth. The prepared records are held until the whole directory is processed and written in the order of names.
+		"""
+		paths = []
+		for f, entry in entries:
+			if not type(f) == unicode:
+				# see recordDirectory()
+				if type(topDir) == unicode:
+					topDir = topDir.encode(self.defaultEncoding)
+			paths.append(os.path.join(topDir, f))
+		if not self.referenceReader is None:
+			# the reference record file is read in the walk order
+			self.referenceRecords = self.referenceReader.getRecords([path for path in paths if type(path) == unicode])
+		records = [None] * len(entries)
+		dirs = []
+		for i in sorted(xrange(len(entries)), key=lambda i: self.getEntryInode(entries[i][1])):
+			path = paths[i]
+			entry = entries[i][1]
+			if not pathExcludeMatcher is None and pathExcludeMatcher.isExcluded(path):
+				continue
+			if self.setPath(path, continueFromPath, dirEntry=entry):
+				records[i] = self.prepareRecord(path)
+			if self.fileInfoProcessor.isDirectory() and self.isOnTopDirFileSystem():
+				dirs.append((i, path))
+		self.referenceRecords = None
+		for record in records:
+			if not record is None:
+				self.writePreparedRecord(record, writeCallback, formattingCallback)
+		return [path for i, path in sorted(dirs)]
+	
+	def walkTree(self, topDir, writeCallback, formattingCallback, pathExludeRegexes, continueFromPath=None):
+		"""
+		recursively descend the directory tree rooted at top,
+		calling the callback function for each file
+		
+		based on "example" on https://docs.python.org/2/library/stat.html
+		based on "example" on https://docs.python.org/2/library/os.html#os.walk
+		"""
+		for d in self.recordDirectory(topDir, writeCallback, formattingCallback, pathExludeRegexes, continueFromPath):
 			self.walkTree(d, writeCallback, formattingCallback, pathExludeRegexes, continueFromPath)
 	
+	def walkTreeIterative(self, topDir, writeCallback, formattingCallback, pathExludeRegexes, continueFromPath=None):
+		"""
+		descend the directory tree rooted at top like walkTree does and in the same order,
+		but use a stack of directories instead of recursion
+		"""
+		stack = [topDir]
+		while stack:
+			dirs = self.recordDirectory(stack.pop(), writeCallback, formattingCallback, pathExludeRegexes, continueFromPath)
+			dirs.reverse()
+			stack.extend(dirs)
+	
+	def walkTreeBounded(self, topDir, writeCallback, formattingCallback, pathExludeRegexes, continueFromPath=None):
+		"""
+		descend the directory tree rooted at top like walkTree does and in the same order,
+		but keep only an iterator of names of subdirectories for each level, see recordDirectoryBounded()
+		"""
+		stack = [(topDir, iter(self.recordDirectoryBounded(topDir, writeCallback, formattingCallback, pathExludeRegexes, continueFromPath)))]
+		while stack:
+			parentDir, names = stack[-1]
+			name = next(names, None)
+			if name is None:
+				stack.pop()
+				continue
+			d = self.joinPath(parentDir, name)
+			stack.append((d, iter(self.recordDirectoryBounded(d, writeCallback, formattingCallback, pathExludeRegexes, continueFromPath))))
+	
+	def walkTreeSharded(self, topDir, shardWriter, formattingCallback, pathExludeRegexes, depth):
+		"""
+		descend the directory tree rooted at top like walkTree does,
+		subtrees of directories depth levels below top are recorded by the worker processes into shards
+		that are written by shardWriter at the place where walkTree would record them
+		"""
+		for d in self.recordDirectory(topDir, shardWriter.writeLine, formattingCallback, pathExludeRegexes):
+			if depth > 1:
+				self.walkTreeSharded(d, shardWriter, formattingCallback, pathExludeRegexes, depth - 1)
+			else:
+				self.writePendingRecords(shardWriter.writeLine, formattingCallback)
+				shardPath = os.path.join(self.shardsDir, "%08d.shard" % self.numberOfShards)
+				self.numberOfShards += 1
+				shardWriter.addShard(self.shardPool.apply_async(recordShard, (d, shardPath, pathExludeRegexes)))
+	
+	def recordShard(self, subtreeDir, shardPath, pathExludeRegexes):
+		"""Called in a worker process. Record the subtree of the directory subtreeDir (without subtreeDir itself) into the file shardPath."""
+		self.hashWorkerPool = None
+		self.pendingRecords = collections.deque()
+		if not self.hashCachePath is None:
+			self.hashCache = hash_cache_sqlite.HashCacheSqlite(self.hashCachePath, self.hashCacheSize)
+		self.setTopDir(subtreeDir)
+		self.setTopDirDevice(subtreeDir)
+		formattingCallback = self.getFormattingCallback()
+		try:
+			with output_writer.OutputWriter(open(shardPath, 'wb'), encoding=self.defaultEncoding, flushInterval=float("inf")) as self.outputFile:
+				if self.maxDirectoryEntries is None:
+					self.walkTreeIterative(subtreeDir, self.writeLineToFile, formattingCallback, pathExludeRegexes)
+				else:
+					self.walkTreeBounded(subtreeDir, self.writeLineToFile, formattingCallback, pathExludeRegexes)
+				self.writePendingRecords(self.writeLineToFile, formattingCallback)
+		finally:
+			self.fileInfoProcessor.close()
+			if not self.hashWorkerPool is None:
+				self.hashWorkerPool.close()
+				self.hashWorkerPool = None
+			if not self.hashCache is None:
+				self.hashCache.close()
+				self.hashCache = None
+		return shardPath
+	
 	def recordTopDirs(self, topDirs, writeCallback, formattingCallback, doOutputAbsolutePaths, pathExludeRegexes, continueFromPath=None):
+		if not self.statistics is None:
+			writeCallback = self.statistics.createTimedCallback("write", writeCallback)
+			formattingCallback = self.statistics.createTimedCallback("format", formattingCallback)
 		writeCallback(self.startOfRecordingInfo())
 		writeCallback(self.recordingCreationInfo())
 		writeCallback(self.commandInfo())
@@ -507,20 +1281,72 @@ class RecordDirInfo():
 		writeCallback(self.recordingFinishedInfo())
 		writeCallback(self.endOfRecordingInfo())
 	
+	def getExpectedEntriesAndBytes(self, topDirs):
+		"""Return (number of entries, number of bytes) the recording of the top dirs is expected to have, for the estimate of the time to the end. None if it is not known."""
+		if not self.referenceReader is None:
+			# the reference recording of the same top dirs is the closest estimate of the number of entries
+			return self.referenceReader.countRecords([self.recordingTopDirInfo(topDir) for topDir in topDirs]), None
+		return progress_statistics.getFilesystemUsage(topDirs)
+	
 	def recordDirs(self, topDirs, outputFilePath, doOutputAbsolutePaths=False, pathExludeRegexes=None, appendToFile=None, continueFromPath=None):
 		if appendToFile is True:
 			mode = 'ab'
 		else:
 			mode = 'wb'
-		if self.doUseCustomFormat:
-			formattingCallback = self.createRecordLineCustomFormat
-		else:
-			formattingCallback = self.createRecordLine
-		if outputFilePath == "-":
-			self.recordTopDirs(topDirs, writeCallback=self.writeLineToTerminal, formattingCallback=formattingCallback, doOutputAbsolutePaths=doOutputAbsolutePaths, pathExludeRegexes=pathExludeRegexes, continueFromPath=continueFromPath)
+		formattingCallback = self.getFormattingCallback()
+		if self.numberOfJobs > 1:
+			global shardingRecordDirInfo
+			shardingRecordDirInfo = self
+			self.shardsDir = tempfile.mkdtemp(prefix="recorddirinfo_shards_")
+			self.numberOfShards = 0
+			self.shardPool = multiprocessing.Pool(self.numberOfJobs)
+		if not self.hashCachePath is None:
+			# opened after the worker processes of --jobs are forked, they open their own connection
+			self.hashCache = hash_cache_sqlite.HashCacheSqlite(self.hashCachePath, self.hashCacheSize)
+		if not self.referenceFilePath is None:
+			positions = dict(self.formattingSequencesAndPositions)
+			self.referenceKeyPositions = [positions[sequence] for sequence in (self.formatSequenceInodeNumber, self.formatSequenceSizeInBytes, self.formatSequenceLastChangeTime, self.formatSequenceLastModificationTime)]
+			self.referenceReader = reference_record_reader.ReferenceRecordReader(self.referenceFilePath, self.createRecordLineParser(), commentChars=self.commentChars, encoding=self.defaultEncoding)
+		if not self.statistics is None:
+			expectedEntries, expectedBytes = self.getExpectedEntriesAndBytes(topDirs)
+			self.statistics.start(expectedEntries, expectedBytes)
+		try:
+			if self.outputFormat == "sqlite":
+				with self.openDatabaseOutput(outputFilePath) as self.outputFile:
+					self.recordTopDirs(topDirs, writeCallback=self.writeLineToFile, formattingCallback=formattingCallback, doOutputAbsolutePaths=doOutputAbsolutePaths, pathExludeRegexes=pathExludeRegexes, continueFromPath=continueFromPath)
+			elif self.outputFormat == "columnar":
+				with self.openColumnarOutput(outputFilePath, mode) as self.outputFile:
+					self.recordTopDirs(topDirs, writeCallback=self.writeLineToFile, formattingCallback=formattingCallback, doOutputAbsolutePaths=doOutputAbsolutePaths, pathExludeRegexes=pathExludeRegexes, continueFromPath=continueFromPath)
+			elif outputFilePath == "-":
+				with self.openOutput(outputFilePath) as self.outputFile:
+					self.recordTopDirs(topDirs, writeCallback=self.writeLineToTerminal, formattingCallback=formattingCallback, doOutputAbsolutePaths=doOutputAbsolutePaths, pathExludeRegexes=pathExludeRegexes, continueFromPath=continueFromPath)
+			else:
+				with self.openOutput(outputFilePath, mode) as self.outputFile:
+					self.recordTopDirs(topDirs, writeCallback=self.writeLineToFile, formattingCallback=formattingCallback, doOutputAbsolutePaths=doOutputAbsolutePaths, pathExludeRegexes=pathExludeRegexes, continueFromPath=continueFromPath)
+		finally:
+			if not self.hashWorkerPool is None:
+				self.hashWorkerPool.close()
+				self.hashWorkerPool = None
+			if not self.statistics is None:
+				self.statistics.stop()
+			if not self.shardPool is None:
+				self.shardPool.terminate()
+				self.shardPool.join()
+				self.shardPool = None
+				shutil.rmtree(self.shardsDir, ignore_errors=True)
+			if not self.referenceReader is None:
+				self.referenceReader.close()
+				self.referenceReader = None
+			if not self.hashCache is None:
+				self.hashCache.close()
+	
+	def getFormattingCallback(self):
+		if self.outputFormat != "text":
+			return self.createOutputRow
+		elif self.doUseCustomFormat:
+			return self.createRecordLineCustomFormat
 		else:
-			with codecs.open(outputFilePath, encoding=self.defaultEncoding, mode=mode) as self.outputFile:
-				self.recordTopDirs(topDirs, writeCallback=self.writeLineToFile, formattingCallback=formattingCallback, doOutputAbsolutePaths=doOutputAbsolutePaths, pathExludeRegexes=pathExludeRegexes, continueFromPath=continueFromPath)
+			return self.createRecordLine
 	
 	# --------- section: the main function, run it
 	
@@ -528,8 +1354,19 @@ class RecordDirInfo():
 		"""Main function of the script. Parse command line arguments, check them, read input csv file correct it and write the corrected csv rows into output csv file."""
 		self.parseCommandLineArguments()
 		self.checkCommandLineArguments()
-		self.resetChangeableAttributes(doOutputAbsolutePaths=self.arguments.absolute_paths, doQuotePaths=self.arguments.quoted_paths, hashType=self.arguments.hash_type, fieldDelimiter=self.arguments.field_delimiter, customFormat=self.arguments.format, customTimeFormat=self.arguments.time_format, fileTypesToOutput=self.arguments.file_type)
+		self.resetChangeableAttributes(doOutputAbsolutePaths=self.arguments.absolute_paths, doQuotePaths=self.arguments.quoted_paths, hashType=self.arguments.hash_type, fieldDelimiter=self.arguments.field_delimiter, customFormat=self.arguments.format, customTimeFormat=self.arguments.time_format, fileTypesToOutput=self.arguments.file_type, numberOfHashWorkers=self.arguments.hash_workers, numberOfJobs=self.arguments.jobs, shardDepth=self.arguments.split_depth, doPreloadNames=self.arguments.preload_names, doWriteHardLinkReferences=self.arguments.hard_link_references, doStayOnFileSystem=self.arguments.one_file_system, doUseInodeOrder=self.arguments.inode_order, maxDirectoryEntries=self.arguments.max_directory_entries, statsInterval=self.arguments.stats_interval, statsFilePath=self.arguments.stats_file, numberOfSlowestPaths=self.arguments.slowest_paths, compressionType=self.arguments.compress, outputBufferSize=self.arguments.buffer_size, outputFlushInterval=self.arguments.flush_interval, doSyncOutputAtEnd=self.arguments.fsync, syncOutputEveryBytes=self.getSyncOutputEveryBytes(), outputFormat=self.arguments.output_format, referenceFilePath=self.arguments.reference, hashCachePath=self.arguments.hash_cache, hashCacheSize=self.arguments.hash_cache_size)
+		if (not self.statistics is None and self.statistics.filePath is None) or not self.arguments.profile is None:
+			# the statistics or the profile summary are logged into stderr
+			logging.basicConfig(format=self.loggingFormat, level=self.loggingLevel)
 		self.log("******* Script starting. *******")
-		self.recordDirs(topDirs=self.arguments.top_dir, outputFilePath=self.arguments.output_file_path, doOutputAbsolutePaths=self.arguments.absolute_paths, pathExludeRegexes=self.arguments.exclude_regex, appendToFile=self.arguments.file_append, continueFromPath=self.arguments.continue_from)
+		if self.arguments.profile is None:
+			self.recordDirs(topDirs=self.arguments.top_dir, outputFilePath=self.arguments.output_file_path, doOutputAbsolutePaths=self.arguments.absolute_paths, pathExludeRegexes=self.arguments.exclude_regex, appendToFile=self.arguments.file_append, continueFromPath=self.arguments.continue_from)
+		else:
+			profiler = record_profiler.RecordProfiler(self.arguments.profile)
+			try:
+				profiler.runcall(self.recordDirs, topDirs=self.arguments.top_dir, outputFilePath=self.arguments.output_file_path, doOutputAbsolutePaths=self.arguments.absolute_paths, pathExludeRegexes=self.arguments.exclude_regex, appendToFile=self.arguments.file_append, continueFromPath=self.arguments.continue_from)
+			finally:
+				for line in profiler.getSummaryLines():
+					self.log(line)
 		self.log("******* Script finished succesfully. *******")
 
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: record_file_diff
+   :platform: Windows, Unix, others
+   :synopsis: Class that finds differences between two record files.
+
+.. moduleauthor:: František Brožka
+
+Class that finds added, removed, modified and moved paths between two record files.
+Both record files are read as streams and joined by path in the walk order, record files not in the walk order and the candidates for moved paths are sorted by external merge sort, so the memory used does not depend on the size of the record files.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import heapq
+import io
+import os
+import re
+import shutil
+import tempfile
+
+import reference_record_reader
+
+class RecordFileDiff():
+	"""
+	Find differences between the old and the new record file and write them as lines '<change>;<info>;<record line>' where <change> is one of:
+	added .. info is '-', record line of the new record file ;
+	removed .. info is '-', record line of the old record file ;
+	modified .. info is the comma separated format sequences of the fields that differ, record line of the new record file ;
+	moved .. info is the quoted old path, record line of the new record file, the path was removed and a path with the same inode number and hash value was added.
+	"""
+	
+	def __init__(self, createRecordLineParser, formattingSequencesAndPositions, ignoredSequences=("%X",), fieldDelimiter=";", commentChars="#", quoteChars="\"\"\"", unsetValueSymbol="-", encoding='utf-8', chunkSize=200000):
+		self.createRecordLineParser = createRecordLineParser
+		self.sequencesByPosition = dict([(position, sequence) for sequence, position in formattingSequencesAndPositions])
+		self.positions = dict(formattingSequencesAndPositions)
+		self.ignoredPositions = set([self.positions[sequence] for sequence in ignoredSequences])
+		self.fieldDelimiter = fieldDelimiter
+		self.commentChars = commentChars
+		self.quoteChars = quoteChars
+		self.unsetValueSymbol = unsetValueSymbol
+		self.encoding = encoding
+		self.chunkSize = chunkSize
+		self.formatInfoStart = ''.join((commentChars, " record line format: \"\"\""))
+		# line '<path><field delimiter>same as<field delimiter><path of the first link>' written with --hard-link-references, the field delimiter of the recording is not known
+		self.hardLinkReferenceRegex = re.compile(u"^.+(.)same as\\1.+$", re.UNICODE)
+		self.tempDir = None
+		self.numberOfTempFiles = 0
+		self.statistics = {'added': 0, 'removed': 0, 'modified': 0, 'moved': 0, 'unparsable': 0}
+	
+	def readRecordLines(self, filePath, recordLineParser):
+		"""Yield the record lines of the record file, the format of the first recording is set to recordLineParser."""
+		with reference_record_reader.openRecordFile(filePath) as f:
+			for line in f:
+				line = line.rstrip('\r\n').decode(self.encoding, 'replace')
+				if line.startswith(self.commentChars):
+					if line.startswith(self.formatInfoStart):
+						recordFormat = line[len(self.formatInfoStart):-3]
+						if recordLineParser.recordFormat is None:
+							recordLineParser.setFormat(recordFormat)
+						elif recordLineParser.recordFormat != recordFormat:
+							raise Exception(''.join(("Error. The record file '", filePath, "' contains recordings of different record line formats."))) # TODO: define my own subclass of Exception ?
+					continue
+				if recordLineParser.recordFormat is None:
+					raise Exception(''.join(("Error. The record file '", filePath, "' does not contain the record line format info."))) # TODO: define my own subclass of Exception ?
+				yield line
+	
+	def readRecords(self, lines, recordLineParser):
+		"""Yield (key of path, fields, line) for the record lines, lines not matching the format are skipped (they are counted by checkRecordLines())."""
+		pathPosition = recordLineParser.pathPosition
+		for line in lines:
+			fields = recordLineParser.parse(line)
+			if not fields is None:
+				yield reference_record_reader.createPathKey(fields[pathPosition]), fields, line
+	
+	def checkRecordLines(self, filePath):
+		"""
+		Return True if the records of the record file are in the walk order.
+		Lines not matching the record line format are counted as unparsable,
+		an exception is raised if the file has record lines but none of them matches the format (e.g. the field delimiter of the lines differs from the one of the format info)
+		or if the file contains hard link references (the linked paths would be reported as removed).
+		"""
+		recordLineParser = self.createRecordLineParser()
+		pathPosition = recordLineParser.pathPosition
+		isInWalkOrder = True
+		previousKey = None
+		numberOfLines = 0
+		numberOfRecords = 0
+		for line in self.readRecordLines(filePath, recordLineParser):
+			numberOfLines += 1
+			if u"same as" in line and not self.hardLinkReferenceRegex.match(line) is None:
+				raise Exception(''.join(("Error. The record file '", filePath, "' contains hard link references (it was recorded with --hard-link-references), such record files cannot be compared."))) # TODO: define my own subclass of Exception ?
+			fields = recordLineParser.parse(line)
+			if fields is None:
+				continue
+			numberOfRecords += 1
+			key = reference_record_reader.createPathKey(fields[pathPosition])
+			if not previousKey is None and key < previousKey:
+				isInWalkOrder = False
+			previousKey = key
+		self.statistics['unparsable'] += numberOfLines - numberOfRecords
+		if numberOfLines > 0 and numberOfRecords == 0:
+			raise Exception(''.join(("Error. None of the ", str(numberOfLines), " record lines of the record file '", filePath, "' matches it's record line format info."))) # TODO: define my own subclass of Exception ?
+		return isInWalkOrder
+	
+	def iterateRecords(self, filePath, recordLineParser):
+		"""Yield (key of path, fields, line) for the records of the record file in the walk order, the records are sorted first if the record file is not in the walk order."""
+		lines = self.readRecordLines(filePath, recordLineParser)
+		if not self.checkRecordLines(filePath):
+			getKey = lambda line: reference_record_reader.createPathKey(recordLineParser.parse(line)[recordLineParser.pathPosition])
+			lines = self.sortExternally(self.readRecords(lines, recordLineParser), getKey)
+		return self.readRecords(lines, recordLineParser)
+	
+	def createTempFile(self):
+		path = os.path.join(self.tempDir, "%08d.tmp" % self.numberOfTempFiles)
+		self.numberOfTempFiles += 1
+		return path
+	
+	def writeLines(self, path, lines):
+		with io.open(path, 'wb', buffering=1048576) as f:
+			for line in lines:
+				f.write(line.encode(self.encoding))
+				f.write('\n')
+	
+	def readLines(self, path, getKey):
+		"""Yield (key, line) for the lines of the temporary file, the file is removed when read."""
+		with io.open(path, 'rb', buffering=1048576) as f:
+			for line in f:
+				line = line[:-1].decode(self.encoding)
+				yield getKey(line), line
+		os.remove(path)
+	
+	def sortExternally(self, items, getKey):
+		"""Yield lines of items (key, ..., line) sorted by key, at most chunkSize items are held in memory, getKey(line) returns the key of the line."""
+		chunkPaths = []
+		chunk = []
+		for item in items:
+			chunk.append((item[0], item[-1]))
+			if len(chunk) >= self.chunkSize:
+				chunk.sort()
+				chunkPaths.append(self.createTempFile())
+				self.writeLines(chunkPaths[-1], [line for key, line in chunk])
+				chunk = []
+		chunk.sort()
+		if not chunkPaths:
+			for key, line in chunk:
+				yield line
+			return
+		chunkPaths.append(self.createTempFile())
+		self.writeLines(chunkPaths[-1], [line for key, line in chunk])
+		chunk = []
+		for key, line in heapq.merge(*[self.readLines(path, getKey) for path in chunkPaths]):
+			yield line
+	
+	def quotePath(self, path):
+		return ''.join((self.quoteChars, path, self.quoteChars))
+	
+	def getMoveKey(self, fields):
+		"""Return inode number and hash value joined (the key of moved paths) or None if the record has no inode number or no hash value."""
+		inode = fields.get(self.positions["%i"], self.unsetValueSymbol)
+		fileHash = fields.get(self.positions["%H"], self.unsetValueSymbol)
+		if inode == self.unsetValueSymbol or fileHash == self.unsetValueSymbol:
+			return None
+		return u''.join((inode, u'\x00', fileHash))
+	
+	def writeChange(self, writeCallback, change, info, line):
+		self.statistics[change] += 1
+		writeCallback(self.fieldDelimiter.join((change, info, line)))
+	
+	def getChangedSequences(self, oldFields, newFields, comparedPositions):
+		return [self.sequencesByPosition[position] for position in comparedPositions if oldFields.get(position) != newFields.get(position)]
+	
+	def diff(self, oldFilePath, newFilePath, writeCallback):
+		"""Write the changes between the old and the new record file by calling writeCallback(line) for each change."""
+		self.tempDir = tempfile.mkdtemp(prefix="recorddirinfo_diff_")
+		try:
+			oldParser = self.createRecordLineParser()
+			newParser = self.createRecordLineParser()
+			oldRecords = self.iterateRecords(oldFilePath, oldParser)
+			newRecords = self.iterateRecords(newFilePath, newParser)
+			removedCandidates = io.open(self.createTempFile(), 'wb', buffering=1048576)
+			addedCandidates = io.open(self.createTempFile(), 'wb', buffering=1048576)
+			oldRecord = next(oldRecords, None)
+			newRecord = next(newRecords, None)
+			comparedPositions = None
+			while not oldRecord is None or not newRecord is None:
+				if newRecord is None or (not oldRecord is None and oldRecord[0] < newRecord[0]):
+					self.writeCandidate(writeCallback, removedCandidates, "removed", oldRecord)
+					oldRecord = next(oldRecords, None)
+				elif oldRecord is None or newRecord[0] < oldRecord[0]:
+					self.writeCandidate(writeCallback, addedCandidates, "added", newRecord)
+					newRecord = next(newRecords, None)
+				else:
+					if comparedPositions is None:
+						# fields recorded in both record files, the path is the key
+						comparedPositions = sorted((set(oldParser.groupPositions) & set(newParser.groupPositions)) - self.ignoredPositions - set([oldParser.pathPosition]))
+					changedSequences = self.getChangedSequences(oldRecord[1], newRecord[1], comparedPositions)
+					if changedSequences:
+						self.writeChange(writeCallback, "modified", u','.join(changedSequences), newRecord[2])
+					oldRecord = next(oldRecords, None)
+					newRecord = next(newRecords, None)
+			removedCandidates.close()
+			addedCandidates.close()
+			self.matchMovedPaths(writeCallback, removedCandidates.name, addedCandidates.name, oldParser)
+		finally:
+			shutil.rmtree(self.tempDir, ignore_errors=True)
+			self.tempDir = None
+	
+	def writeCandidate(self, writeCallback, candidates, change, record):
+		"""Write the record as the change or into the file of candidates for moved paths if it has inode number and hash value."""
+		moveKey = self.getMoveKey(record[1])
+		if moveKey is None:
+			self.writeChange(writeCallback, change, self.unsetValueSymbol, record[2])
+		else:
+			candidates.write(u''.join((moveKey, u'\x00', record[2], u'\n')).encode(self.encoding))
+	
+	def sortCandidates(self, path):
+		"""Yield (move key, line) for the candidates for moved paths sorted by the move key."""
+		getMoveKey = lambda line: line.rsplit(u'\x00', 1)[0]
+		with io.open(path, 'rb', buffering=1048576) as f:
+			items = ((getMoveKey(line), line) for line in (line[:-1].decode(self.encoding) for line in f))
+			for line in self.sortExternally(items, getMoveKey):
+				moveKey, recordLine = line.rsplit(u'\x00', 1)
+				yield moveKey, recordLine
+	
+	def matchMovedPaths(self, writeCallback, removedCandidatesPath, addedCandidatesPath, oldParser):
+		"""Join the removed and added candidates by inode number and hash value, the joined ones are moved paths."""
+		removed = self.sortCandidates(removedCandidatesPath)
+		added = self.sortCandidates(addedCandidatesPath)
+		removedCandidate = next(removed, None)
+		addedCandidate = next(added, None)
+		while not removedCandidate is None or not addedCandidate is None:
+			if addedCandidate is None or (not removedCandidate is None and removedCandidate[0] < addedCandidate[0]):
+				self.writeChange(writeCallback, "removed", self.unsetValueSymbol, removedCandidate[1])
+				removedCandidate = next(removed, None)
+			elif removedCandidate is None or addedCandidate[0] < removedCandidate[0]:
+				self.writeChange(writeCallback, "added", self.unsetValueSymbol, addedCandidate[1])
+				addedCandidate = next(added, None)
+			else:
+				oldPath = oldParser.parse(removedCandidate[1])[oldParser.pathPosition]
+				self.writeChange(writeCallback, "moved", self.quotePath(oldPath), addedCandidate[1])
+				removedCandidate = next(removed, None)
+				addedCandidate = next(added, None)
+	
+	def getStatistics(self):
+		"""Return dict of numbers of changes by the change."""
+		return self.statistics
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: record_file_reader
+   :platform: Windows, Unix, others
+   :synopsis: Class that reads record files into tuples of typed fields.
+
+.. moduleauthor:: František Brožka
+
+Class that reads record files written by RecordDirInfo into tuples of typed fields, to be used by tools processing the recordings.
+The record line format and the field delimiter are taken from the header of the recording.
+The file is read in large blocks (memory mapped if not compressed) split into lines at once, lines are split by the delimiter with str.split
+and the fields are converted by a function compiled for the format, the regular expression parser is used only for lines the delimiter does not split correctly
+(e.g. a path containing the delimiter) and for formats whose fields are not delimited by one delimiter.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import mmap
+import os
+
+import output_writer
+import reference_record_reader
+
+# format sequences in the order of positions of RecordDirInfo.formattingSequencesAndPositions
+formatSequences = ("%p", "%i", "%M", "%F", "%s", "%a", "%u", "%U", "%g", "%G", "%L", "%W", "%Z", "%Y", "%X", "%H", "%T")
+# fields converted to int
+integerSequences = ("%i", "%M", "%s", "%u", "%g", "%L")
+# fields converted to int if they are recorded as seconds since epoch (the default time format)
+timeSequences = ("%W", "%Z", "%Y", "%X")
+# middle field of the lines written by RecordDirInfo with --hard-link-references instead of records of the second and later hard links
+hardLinkReferenceField = "same as"
+# fields that are quoted if the recording was made with --quoted-paths
+quotedSequences = ("%p", "%T")
+
+class RecordFileReader():
+	"""
+	Read records of the record file as tuples of the fields of the given format sequences (all fields of the record line format by default).
+	Paths, link targets, hash values and names are byte strings (utf-8 encoded) without quotes, the integer fields are int,
+	times are int if recorded as seconds since epoch and byte strings otherwise, unset fields (and fields not recorded) are None.
+	Lines not matching the record line format (e.g. hard link references) are skipped and counted in numberOfSkippedLines,
+	an exception is raised at the end of the file if it has record lines but none of them matches the format.
+	"""
+	
+	def __init__(self, filePath, sequences=None, commentChars="#", quoteChars="\"\"\"", unsetValueSymbol="-", blockSize=16777216):
+		self.filePath = filePath
+		self.requestedSequences = sequences
+		self.commentChars = commentChars.encode('utf-8')
+		self.quoteChars = quoteChars.encode('utf-8')
+		self.unsetValueSymbol = unsetValueSymbol.encode('utf-8')
+		self.blockSize = blockSize
+		self.doSplitByDelimiter = True # if False every line is parsed by the regular expression
+		self.formatInfoStart = ''.join((commentChars, " record line format: \"\"\"")).encode('utf-8')
+		self.topDirInfoStart = ''.join((commentChars, "--- --top-dir \"\"\"")).encode('utf-8')
+		self.recordFormat = None
+		self.fieldDelimiter = None
+		self.formatFieldSequences = None
+		self.sequences = None
+		self.topDir = None
+		self.convertLines = None
+		self.numberOfRecords = 0
+		self.numberOfSkippedLines = 0
+		self.recordLineParser = reference_record_reader.RecordLineParser([(sequence, i) for i, sequence in enumerate(formatSequences)], pathPosition=formatSequences.index("%p"), linkTargetPosition=formatSequences.index("%T"), integerPositions=[formatSequences.index(sequence) for sequence in integerSequences], quoteChars=quoteChars)
+	
+	def __enter__(self):
+		return self
+	
+	def __exit__(self, excType, excValue, traceback):
+		pass
+	
+	def __iter__(self):
+		return self.iterateRecords()
+	
+	def iterateBlocks(self):
+		"""Yield blocks of the file, memory mapped if the file is not compressed."""
+		if output_writer.getCompressionTypeByExtension(self.filePath) is None:
+			with open(self.filePath, 'rb') as f:
+				if os.fstat(f.fileno()).st_size == 0:
+					return
+				data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+				try:
+					for start in xrange(0, len(data), self.blockSize):
+						yield data[start:start + self.blockSize]
+				finally:
+					data.close()
+		else:
+			with reference_record_reader.openRecordFile(self.filePath) as f:
+				while True:
+					block = f.read(self.blockSize)
+					if not block:
+						return
+					yield block
+	
+	def iterateLineBlocks(self):
+		"""Yield lists of complete lines (without line separators) of the blocks of the file."""
+		rest = ''
+		for block in self.iterateBlocks():
+			end = block.rfind('\n')
+			if end < 0:
+				rest += block
+				continue
+			lines = ''.join((rest, block[:end])).split('\n')
+			rest = block[end + 1:]
+			yield lines
+		if rest:
+			yield [rest]
+	
+	def splitFormat(self, recordFormat):
+		"""Return list of the format sequences and literal strings of the record line format."""
+		pieces = []
+		i = 0
+		while i < len(recordFormat):
+			sequence = recordFormat[i:i + 2]
+			if sequence in formatSequences:
+				pieces.append(sequence)
+				i += 2
+			elif pieces and not pieces[-1] in formatSequences:
+				pieces[-1] += recordFormat[i]
+				i += 1
+			else:
+				pieces.append(recordFormat[i])
+				i += 1
+		return pieces
+	
+	def setFormat(self, recordFormat):
+		"""Recover the field delimiter from the record line format and compile the function converting lines of the format into records."""
+		self.recordFormat = recordFormat
+		self.recordLineParser.setFormat(recordFormat)
+		pieces = self.splitFormat(recordFormat)
+		self.formatFieldSequences = [piece for piece in pieces if piece in formatSequences]
+		literals = set([piece for piece in pieces if not piece in formatSequences])
+		self.fieldDelimiter = None
+		if not self.doSplitByDelimiter:
+			pass
+		elif len(literals) == 1 and pieces[0] in formatSequences and pieces[-1] in formatSequences and len(pieces) == 2 * len(self.formatFieldSequences) - 1:
+			self.fieldDelimiter = literals.pop().encode('utf-8')
+		elif len(self.formatFieldSequences) == 1 and len(pieces) == 1:
+			self.fieldDelimiter = '\n' # one field, lines are not split
+		self.sequences = self.requestedSequences
+		if self.sequences is None:
+			self.sequences = list(self.formatFieldSequences)
+		self.convertLines = self.compileConverter()
+	
+	def compileConverter(self):
+		"""Return function converting list of lines into list of records, the function is compiled for the format so no per field calls or loops are needed."""
+		expressions = []
+		for sequence in self.sequences:
+			if not sequence in self.formatFieldSequences:
+				expressions.append("None")
+				continue
+			f = "f[%d]" % self.formatFieldSequences.index(sequence)
+			if sequence in integerSequences:
+				expressions.append("(None if %s == u else int(%s))" % (f, f))
+			elif sequence in timeSequences:
+				expressions.append("(None if %s == u else (int(%s) if %s.lstrip('-').isdigit() else %s))" % (f, f, f, f))
+			elif sequence in quotedSequences and self.quoteChars:
+				expressions.append("(None if %s == u else (%s[n:-n] if %s[:n] == q and %s[-n:] == q and len(%s) >= 2 * n else %s))" % (f, f, f, f, f, f))
+			else:
+				expressions.append("(None if %s == u else %s)" % (f, f))
+		numberOfFields = len(self.formatFieldSequences) if self.fieldDelimiter else -1
+		condition = "len(f) != numberOfFields"
+		if numberOfFields == 3:
+			# a hard link reference has three fields too
+			condition = "len(f) != numberOfFields or f[1] == h"
+		source = "\n".join((
+			"def convertLines(lines):",
+			"	records = []",
+			"	append = records.append",
+			"	for line in lines:",
+			"		f = line.split(d)",
+			"		if %s:" % condition,
+			"			f = parseSlowly(line)",
+			"			if f is None:",
+			"				continue",
+			"		try:",
+			"			append((%s,))" % ", ".join(expressions),
+			"		except ValueError:",
+			"			# a field is not an integer, the line does not match the format although it has the number of fields of it",
+			"			f = parseSlowly(line)",
+			"			if f is None:",
+			"				continue",
+			"			append((%s,))" % ", ".join(expressions),
+			"	return records",
+		))
+		namespace = {'d': self.fieldDelimiter or '\x00', 'numberOfFields': numberOfFields, 'parseSlowly': self.parseSlowly, 'u': self.unsetValueSymbol, 'q': self.quoteChars, 'n': len(self.quoteChars), 'h': hardLinkReferenceField}
+		exec source in namespace
+		return namespace['convertLines']
+	
+	def parseSlowly(self, line):
+		"""Return list of fields of the line in the order of the format or None if the line does not match the format (or is a hard link reference), the line is parsed by the regular expression of the format."""
+		fields = None
+		if self.fieldDelimiter is None or not ''.join((self.fieldDelimiter, hardLinkReferenceField, self.fieldDelimiter)) in line:
+			fields = self.recordLineParser.parse(line)
+		if fields is None:
+			self.numberOfSkippedLines += 1
+			return None
+		fields = [fields.get(formatSequences.index(sequence)) for sequence in self.formatFieldSequences]
+		if self.quoteChars:
+			# the regular expression already removed the quotes, add them back so the converter removes them
+			for i, sequence in enumerate(self.formatFieldSequences):
+				if sequence in quotedSequences and not fields[i] is None and fields[i] != self.unsetValueSymbol and not (fields[i].startswith(self.quoteChars) and fields[i].endswith(self.quoteChars)):
+					fields[i] = ''.join((self.quoteChars, fields[i], self.quoteChars))
+		return fields
+	
+	def processHeaderLine(self, line):
+		if line.startswith(self.formatInfoStart):
+			recordFormat = line[len(self.formatInfoStart):].rstrip('\r')[:-3].decode('utf-8')
+			if recordFormat != self.recordFormat:
+				self.setFormat(recordFormat)
+		elif line.startswith(self.topDirInfoStart):
+			self.topDir = line[len(self.topDirInfoStart):].rstrip('\r')[:-4]
+	
+	def iterateRecordBlocks(self):
+		"""Yield lists of records of the blocks of the file, the attribute topDir is the top dir of the last record of the list."""
+		self.numberOfRecords = 0
+		self.numberOfSkippedLines = 0
+		for records in self.convertLineBlocks():
+			self.numberOfRecords += len(records)
+			yield records
+		if self.numberOfSkippedLines > 0 and self.numberOfRecords == 0:
+			raise Exception(''.join(("Error. None of the ", str(self.numberOfSkippedLines), " record lines of the record file '", self.filePath, "' matches it's record line format info."))) # TODO: define my own subclass of Exception ?
+	
+	def convertLineBlocks(self):
+		commentLineStart = ''.join(('\n', self.commentChars))
+		for lines in self.iterateLineBlocks():
+			if lines and lines[-1].endswith('\r'):
+				lines = [line.rstrip('\r') for line in lines]
+			if self.convertLines is None or lines[0].startswith(self.commentChars) or commentLineStart in '\n'.join(lines):
+				# the block contains header lines, they have to be processed in order with the records
+				records = []
+				start = 0
+				for i, line in enumerate(lines):
+					if line.startswith(self.commentChars):
+						if start < i and not self.convertLines is None:
+							records.extend(self.convertLines([l for l in lines[start:i] if l]))
+						start = i + 1
+						self.processHeaderLine(line)
+				if not self.convertLines is None:
+					records.extend(self.convertLines([l for l in lines[start:] if l]))
+				yield records
+			else:
+				yield self.convertLines([l for l in lines if l] if not lines[-1] else lines)
+	
+	def iterateRecords(self):
+		"""Yield records of the file one by one."""
+		for records in self.iterateRecordBlocks():
+			for record in records:
+				yield record
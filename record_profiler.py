@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: record_profiler
+   :platform: Windows, Unix, others
+   :synopsis: Class that profiles a recording with cProfile and summarizes the time spent in the file info accessors and providers.
+
+.. moduleauthor:: František Brožka
+
+Class that runs a recording under cProfile, dumps the profile (to be read by pstats, snakeviz etc.) and returns a summary table of the cumulative time spent in the functions
+of the file info processors (FileInfo accessors), the providers of hash values, creation times and link targets, the record creation and the formatting and writing callbacks,
+so it can be told at once which of them makes a recording slow.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import cProfile
+import os
+import pstats
+import time
+
+# modules all functions of which are summarized: the file info processors and the providers of hash values, creation times and link targets
+summarizedModules = ("file_info.py", "file_info_unix.py", "file_info_windows.py", "hash_file_unix.py", "hash_file_hashlib.py", "crtime_ext4_inode_unix_utility1.py", "crtime_ext4_path_unix_utility1.py", "crtime_statx_unix.py", "link_target_unix_utility1.py", "link_target_os.py")
+# functions of other modules that are summarized: the record creation, the formatting and writing callbacks and the walk
+summarizedFunctions = (
+	("record_dir_info.py", "setPath"),
+	("record_dir_info.py", "createInfo"),
+	("record_dir_info.py", "createRecordLine"),
+	("record_dir_info.py", "createRecordLineCustomFormat"),
+	("record_dir_info.py", "createOutputRow"),
+	("record_dir_info.py", "writeLineToFile"),
+	("record_dir_info.py", "writeLineToTerminal"),
+	("record_dir_info.py", "listDirectory"),
+	("record_dir_info.py", "listDirEntries"),
+	("record_dir_info.py", "listDirectoryBounded"),
+	("hash_worker_pool.py", "getFileHash"),
+)
+# substrings of names of built-in functions that are summarized (system calls and name service lookups)
+summarizedBuiltins = ("lstat", "listdir", "scandir", "readlink", "getpwuid", "getgrgid", "communicate")
+
+class RecordProfiler():
+	"""
+	Profile a call with cProfile (only the calling thread is profiled, time of hash worker threads shows as waiting for the hash values),
+	dump the profile into the file and summarize it as lines of a table.
+	"""
+	
+	def __init__(self, profilePath, maxSummaryRows=40):
+		self.profilePath = profilePath
+		self.maxSummaryRows = maxSummaryRows
+		self.profile = None
+		self.elapsed = None
+	
+	def runcall(self, function, *args, **kwargs):
+		"""Return function(*args, **kwargs) run under the profiler, the profile is dumped even if the function raises an exception."""
+		self.profile = cProfile.Profile()
+		startTime = time.time()
+		try:
+			return self.profile.runcall(function, *args, **kwargs)
+		finally:
+			self.elapsed = time.time() - startTime
+			self.profile.dump_stats(self.profilePath)
+	
+	def isSummarized(self, fileName, functionName):
+		if fileName == "~":
+			return any([name in functionName for name in summarizedBuiltins])
+		moduleName = os.path.basename(fileName)
+		return moduleName in summarizedModules or (moduleName, functionName) in summarizedFunctions
+	
+	def getSummary(self):
+		"""Return list of (function label, number of calls, total time, cumulative time) of the summarized functions sorted by the cumulative time, the longest first."""
+		rows = []
+		for (fileName, lineNumber, functionName), (primitiveCalls, calls, totalTime, cumulativeTime, callers) in pstats.Stats(self.profile).stats.iteritems():
+			if not self.isSummarized(fileName, functionName):
+				continue
+			if fileName == "~":
+				label = functionName
+			else:
+				label = "%s:%d(%s)" % (os.path.basename(fileName), lineNumber, functionName)
+			rows.append((label, calls, totalTime, cumulativeTime))
+		rows.sort(key=lambda row: row[3], reverse=True)
+		return rows[:self.maxSummaryRows]
+	
+	def getSummaryLines(self):
+		"""Return the summary as lines of a table, the percentage is of the elapsed time of the profiled call."""
+		lines = ["profile dumped into '%s', %.1f seconds elapsed, cumulative time of the file info accessors, providers and callbacks:" % (self.profilePath, self.elapsed)]
+		lines.append("%12s %12s %12s %7s  %s" % ("calls", "tottime", "cumtime", "cum%", "function"))
+		for label, calls, totalTime, cumulativeTime in self.getSummary():
+			percentage = 100.0 * cumulativeTime / self.elapsed if self.elapsed > 0 else 0.0
+			lines.append("%12d %12.3f %12.3f %6.1f%%  %s" % (calls, totalTime, cumulativeTime, percentage, label))
+		return lines
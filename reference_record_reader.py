@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+u"""
+.. module:: reference_record_reader
+   :platform: Windows, Unix, others
+   :synopsis: Classes that parse record lines and look up records of a previous recording in the order the directory tree is walked.
+
+.. moduleauthor:: František Brožka
+
+Class that parses record lines of any record line format and class that looks up records of a previous recording (reference record file) in the order the directory tree is walked.
+The reference record file is read line by line together with the walk (merge-join), so only one record is held in memory.
+
+"""
+
+u"""
+    Copyright 2016 František Brožka
+
+    This file is part of RecordDirInfo.
+
+    RecordDirInfo is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    RecordDirInfo is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with RecordDirInfo.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+
+import bz2
+import gzip
+import io
+import os
+import re
+
+import output_writer
+
+def openRecordFile(filePath):
+	"""Open the record file for reading in binary mode, decompress it if it's name ends with .gz, .bz2 or .xz."""
+	compressionType = output_writer.getCompressionTypeByExtension(filePath)
+	if compressionType == "gzip":
+		return io.BufferedReader(gzip.open(filePath, 'rb'), 1048576)
+	elif compressionType == "bz2":
+		return bz2.BZ2File(filePath, 'rb', 1048576)
+	elif compressionType == "xz":
+		if output_writer.lzma is None:
+			raise Exception(''.join(("Error. Reading the file '", filePath, "' needs python module lzma (on python 2.7 install the package backports.lzma)."))) # TODO: define my own subclass of Exception ?
+		return output_writer.lzma.LZMAFile(filePath, 'rb')
+	else:
+		return io.open(filePath, 'rb', buffering=1048576)
+
+def readRecordFormat(filePath, commentChars="#", encoding='utf-8'):
+	"""Return the record line format of the first recording in the record file or None if the file contains no format info."""
+	formatInfoStart = ''.join((commentChars, " record line format: \"\"\"")).encode(encoding)
+	with openRecordFile(filePath) as f:
+		for line in f:
+			if line.startswith(formatInfoStart):
+				return line[len(formatInfoStart):].rstrip('\r\n')[:-3].decode(encoding)
+			if not line.startswith(commentChars.encode(encoding)):
+				return None
+	return None
+
+def createPathKey(path):
+	"""Return key of the path, keys of paths compare in the order the paths are recorded by RecordDirInfo."""
+	components = path.split(os.sep)
+	return (components[:-1], components[-1])
+
+class RecordLineParser():
+	"""Parse record lines of the record line format into dict of fields by position (see RecordDirInfo.formattingSequencesAndPositions)."""
+	
+	def __init__(self, formattingSequencesAndPositions, pathPosition, linkTargetPosition=None, integerPositions=(), quoteChars="\"\"\""):
+		self.sequences = dict(formattingSequencesAndPositions)
+		self.pathPosition = pathPosition
+		self.linkTargetPosition = linkTargetPosition
+		self.integerPositions = integerPositions
+		self.quoteChars = quoteChars
+		self.recordFormat = None
+		self.recordRegex = None
+		self.groupPositions = None
+	
+	def setFormat(self, recordFormat):
+		self.recordFormat = recordFormat
+		self.recordRegex, self.groupPositions = self.compileRecordRegex(recordFormat)
+	
+	def compileRecordRegex(self, recordFormat):
+		"""Return regular expression matching the record lines of the format and list of the positions of fields in the order of the groups of the regex."""
+		pieces = []
+		positions = []
+		i = 0
+		while i < len(recordFormat):
+			sequence = recordFormat[i:i + 2]
+			if sequence in self.sequences:
+				pieces.append(sequence)
+				i += 2
+			else:
+				if pieces and not pieces[-1] in self.sequences:
+					pieces[-1] += recordFormat[i]
+				else:
+					pieces.append(recordFormat[i])
+				i += 1
+		regex = ['^']
+		for j, piece in enumerate(pieces):
+			if not piece in self.sequences:
+				regex.append(re.escape(piece))
+				continue
+			position = self.sequences[piece]
+			positions.append(position)
+			nextPiece = None
+			if j + 1 < len(pieces):
+				nextPiece = pieces[j + 1]
+			if position == self.pathPosition:
+				# the path can contain the delimiter so it takes as much as possible,
+				# the integer fields make sure a link target containing the delimiter is not taken as a part of the path
+				fieldRegex = '(.*)'
+			elif position in self.integerPositions:
+				fieldRegex = '(-|[0-9]+)'
+			elif nextPiece is None or nextPiece in self.sequences:
+				fieldRegex = '(.*)'
+			else:
+				# the other fields are delimited by the next literal
+				fieldRegex = ''.join(('([^', re.escape(nextPiece[0]), ']*)'))
+			if self.quoteChars and position in (self.pathPosition, self.linkTargetPosition):
+				# a quoted path or link target ends with the first quote chars followed by the rest of the record
+				positions.append(position)
+				fieldRegex = ''.join(('(?:', re.escape(self.quoteChars), '(.*?)', re.escape(self.quoteChars), '|', fieldRegex, ')'))
+			regex.append(fieldRegex)
+		regex.append('$')
+		return re.compile(''.join(regex), re.UNICODE), positions
+	
+	def parse(self, line):
+		"""Return dict of fields of the record line (unicode without line separator) or None if the line does not match the format."""
+		match = self.recordRegex.match(line)
+		if match is None:
+			return None
+		return dict([(position, value) for position, value in zip(self.groupPositions, match.groups()) if not value is None])
+
+class ReferenceRecordReader():
+	"""
+	Look up records of the reference record file in the walk order.
+	
+	Records are looked up by path and the paths have to be looked up in the order they are recorded by RecordDirInfo,
+	i.e. entries of a directory sorted by name are followed by the subtrees of it's subdirectories sorted by name.
+	Records of a top dir are read from the section of the reference file that starts with the given top dir info line.
+	"""
+	
+	def __init__(self, filePath, recordLineParser, commentChars="#", encoding='utf-8'):
+		self.filePath = filePath
+		self.recordLineParser = recordLineParser
+		self.pathPosition = recordLineParser.pathPosition
+		self.commentChars = commentChars.encode(encoding)
+		self.encoding = encoding
+		self.formatInfoStart = ''.join((commentChars, " record line format: \"\"\"")).encode(encoding)
+		self.sectionStart = ''.join((commentChars, "--- ")).encode(encoding)
+		self.recordingStart = ''.join((commentChars, " --- --- ")).encode(encoding)
+		self.file = None
+		self.record = None
+	
+	def startTopDir(self, topDirInfo):
+		"""Position the reader at the first record of the section that starts with the line topDirInfo, if there is no such section no record will be found."""
+		self.close()
+		self.file = openRecordFile(self.filePath)
+		topDirInfo = topDirInfo.encode(self.encoding)
+		for line in self.file:
+			if line.startswith(self.formatInfoStart):
+				self.recordLineParser.setFormat(line[len(self.formatInfoStart):].rstrip('\r\n')[:-3].decode(self.encoding))
+			elif line.rstrip('\r\n') == topDirInfo and not self.recordLineParser.recordFormat is None:
+				self.readRecord()
+				return
+		self.close()
+	
+	def countRecords(self, topDirInfos):
+		"""Return number of record lines in the sections that start with the lines topDirInfos (the first section of each of them, as startTopDir finds it)."""
+		topDirInfos = set([info.encode(self.encoding) if type(info) == unicode else info for info in topDirInfos])
+		numberOfRecords = 0
+		isCounting = False
+		with openRecordFile(self.filePath) as f:
+			for line in f:
+				if line.startswith(self.commentChars):
+					if line.startswith(self.sectionStart) or line.startswith(self.recordingStart):
+						isCounting = line.rstrip('\r\n') in topDirInfos
+						topDirInfos.discard(line.rstrip('\r\n'))
+				elif isCounting:
+					numberOfRecords += 1
+		return numberOfRecords
+	
+	def readRecord(self):
+		"""Read next record of the current section into self.record as (key, dict of fields by position) or set it to None at the end of the section."""
+		self.record = None
+		if self.file is None:
+			return
+		for line in self.file:
+			if line.startswith(self.commentChars):
+				if line.startswith(self.sectionStart) or line.startswith(self.recordingStart):
+					break
+				continue
+			fields = self.recordLineParser.parse(line.rstrip('\r\n').decode(self.encoding, 'replace'))
+			if fields is None:
+				continue
+			self.record = (createPathKey(fields[self.pathPosition]), fields)
+			return
+		self.close()
+	
+	def getRecord(self, path):
+		"""Return dict of fields (by position) of the record of the path (unquoted unicode) or None if the reference section has no record of the path. Paths have to be looked up in the walk order."""
+		key = createPathKey(path)
+		while not self.record is None and self.record[0] < key:
+			self.readRecord()
+		if self.record is None or self.record[0] != key:
+			return None
+		return self.record[1]
+	
+	def getRecords(self, paths):
+		"""Return dict of records (see getRecord()) of the paths that have a record, the paths have to be in the walk order."""
+		records = {}
+		for path in paths:
+			record = self.getRecord(path)
+			if not record is None:
+				records[path] = record
+		return records
+	
+	def close(self):
+		if not self.file is None:
+			self.file.close()
+			self.file = None
+		self.record = None